@@ -1,6 +1,7 @@
 """Хранилище конфигов."""
 import logging
 import os
+import tempfile
 from urllib import parse
 
 
@@ -30,6 +31,8 @@ try:
         """Настройки отвечающие за бизнес логику."""
 
         test_token = os.environ.get("TEST_TOKEN", None)
+        # роль, которой доступны служебные роуты (/admin)
+        admin_role = os.environ.get("ADMIN_ROLE", "admin")
 
         token_alive_hours = int(os.environ.get("TOKEN_ALIVE_HOURS", 4))
         refresh_token_alive_hours = int(os.environ.get("REFRESH_TOKEN_ALIVE_HOURS", 24 * 7))
@@ -70,6 +73,39 @@ try:
         db_conn_str = f"postgresql://{db_user}:{parse.quote(db_password)}@{db_host}:{db_port}/{db_name}"
         async_db_conn_str = f"postgresql+asyncpg://{db_user}:{parse.quote(db_password)}@{db_host}:{db_port}/{db_name}"
 
+        # пул соединений воркера, 0 - без пула (соединение на каждую сессию, например за PgBouncer)
+        db_pool_size = int(os.environ.get("DB_POOL_SIZE", 10))
+        db_max_overflow = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+        db_pool_timeout = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+        db_pool_recycle = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+        db_pool_pre_ping = os.environ.get("DB_POOL_PRE_PING", "False").lower() == "true"
+        # соединений, открываемых при старте воркера до приёма запросов
+        db_pool_warmup = int(os.environ.get("DB_POOL_WARMUP", 4))
+        # кэш подготовленных запросов на соединение, 0 - без кэша
+        db_statement_cache_size = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", 100))
+        # PgBouncer в режиме transaction: без кэша подготовленных запросов и с уникальными именами запросов
+        db_pgbouncer = os.environ.get("DB_PGBOUNCER", "False").lower() == "true"
+        # statement_timeout соединения (мс), 0 - настройка сервера
+        db_statement_timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT", 0))
+        db_application_name = os.environ.get("DB_APPLICATION_NAME", "freelance-portal")
+        # логирование всех SQL запросов
+        db_echo = os.environ.get("DB_ECHO", "False").lower() == "true"
+
+
+    class ServerConfig(ConfigAbstract):
+        """Параметры запуска uvicorn (см. ``run.py``)."""
+
+        server_workers = int(os.environ.get("SERVER_WORKERS", 1))
+        # auto - uvloop и httptools, если установлены
+        server_loop = os.environ.get("SERVER_LOOP", "auto")
+        server_http = os.environ.get("SERVER_HTTP", "auto")
+        server_backlog = int(os.environ.get("SERVER_BACKLOG", 2048))
+        server_keep_alive = int(os.environ.get("SERVER_KEEP_ALIVE", 5))
+        # время на завершение выполняющихся запросов после SIGTERM (секунды)
+        server_graceful_timeout = int(os.environ.get("SERVER_GRACEFUL_TIMEOUT", 30))
+        server_forwarded_allow_ips = os.environ.get("SERVER_FORWARDED_ALLOW_IPS", "*")
+        server_access_log = os.environ.get("SERVER_ACCESS_LOG", "True").lower() == "true"
+
 
     class NotificationServiceConfig(ConfigAbstract):
         """Конфигурация для сервиса уведомлений."""
@@ -77,17 +113,212 @@ try:
         notification_service_url = os.environ.get("NOTIFICATION_SERVICE_URL")
         notification_service_token = os.environ.get("NOTIFICATION_SERVICE_TOKEN")
 
+        # количество событий из outbox, отправляемых одним запросом
+        notification_batch_size = int(os.environ.get("NOTIFICATION_BATCH_SIZE", 200))
+        notification_poll_interval = float(os.environ.get("NOTIFICATION_POLL_INTERVAL", 1))
+        notification_max_attempts = int(os.environ.get("NOTIFICATION_MAX_ATTEMPTS", 10))
+        # отправленные и проваленные уведомления удаляются из outbox через это время (секунды)
+        notification_retention = int(os.environ.get("NOTIFICATION_RETENTION", 7 * 24 * 60 * 60))
+        notification_timeout = float(os.environ.get("NOTIFICATION_TIMEOUT", 10))
+        notification_max_connections = int(os.environ.get("NOTIFICATION_MAX_CONNECTIONS", 4))
+
+
+    class ImageConfig(ConfigAbstract):
+        """Параметры обработки загружаемых изображений."""
+
+        # количество процессов для перекодирования изображений
+        image_workers = int(os.environ.get("IMAGE_WORKERS", 2))
+        # максимальное количество задач, одновременно ожидающих свободный процесс
+        image_max_pending = int(os.environ.get("IMAGE_MAX_PENDING", 32))
+        # формат производных изображений: webp или jpeg
+        image_variant_format = os.environ.get("IMAGE_VARIANT_FORMAT", "webp").lower()
+        image_variant_quality = int(os.environ.get("IMAGE_VARIANT_QUALITY", 80))
+        # максимальная сторона (в пикселях) для каждого варианта
+        image_thumbnail_size = int(os.environ.get("IMAGE_THUMBNAIL_SIZE", 256))
+        image_preview_size = int(os.environ.get("IMAGE_PREVIEW_SIZE", 1280))
+        # ограничение на размер изображения, запрашиваемого через /files/{file_id}/image
+        image_resize_max_size = int(os.environ.get("IMAGE_RESIZE_MAX_SIZE", 2560))
+        # дисковый кэш изображений, изменённых по запросу
+        image_cache_directory = os.environ.get(
+            "IMAGE_CACHE_DIRECTORY", os.path.join(tempfile.gettempdir(), "freelance_portal_image_cache")
+        )
+        image_cache_max_bytes = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+    class JobsConfig(ConfigAbstract):
+        """Параметры фоновой очереди задач."""
+
+        # очереди и ограничение одновременно выполняемых задач в каждой: "default:4,images:2"
+        jobs_queues = {
+            name.strip(): int(limit)
+            for name, limit in (
+                queue.split(":") for queue in os.environ.get("JOBS_QUEUES", "default:4").split(",") if queue
+            )
+        }
+        jobs_batch_size = int(os.environ.get("JOBS_BATCH_SIZE", 10))
+        # пауза между опросами, если задач в очередях нет (секунды)
+        jobs_poll_interval = float(os.environ.get("JOBS_POLL_INTERVAL", 1))
+        jobs_max_attempts = int(os.environ.get("JOBS_MAX_ATTEMPTS", 5))
+        # экспоненциальная задержка повторов: base * 2 ** (attempt - 1), но не больше max (секунды)
+        jobs_retry_base = float(os.environ.get("JOBS_RETRY_BASE", 5))
+        jobs_retry_max = float(os.environ.get("JOBS_RETRY_MAX", 60 * 60))
+        # задача в статусе running дольше этого времени считается потерянной (упавший воркер)
+        jobs_stale_timeout = int(os.environ.get("JOBS_STALE_TIMEOUT", 15 * 60))
+        # выполненные задачи удаляются из таблицы через это время (секунды)
+        jobs_retention = int(os.environ.get("JOBS_RETENTION", 7 * 24 * 60 * 60))
+
+
+    class MetricsConfig(ConfigAbstract):
+        """Параметры сбора метрик."""
+
+        metrics_enabled = os.environ.get("METRICS_ENABLED", "True").lower() == "true"
+        # общая директория воркеров для объединения метрик при запуске нескольких воркеров
+        metrics_multiproc_dir = os.environ.get("METRICS_MULTIPROC_DIR", "")
+        metrics_snapshot_interval = float(os.environ.get("METRICS_SNAPSHOT_INTERVAL", 5))
+        # период замера задержки event loop'а (секунды)
+        loop_lag_interval = float(os.environ.get("LOOP_LAG_INTERVAL", 0.5))
+        # блокировка event loop'а дольше порога (секунды) логируется со стеком, 0 - отключено
+        loop_block_threshold = float(os.environ.get("LOOP_BLOCK_THRESHOLD", 0.25))
+        # подсчёт запросов к БД на каждый HTTP запрос (заголовок Server-Timing, поиск N+1)
+        query_stats_enabled = os.environ.get("QUERY_STATS_ENABLED", "True").lower() == "true"
+        # одинаковый запрос, повторённый столько раз за HTTP запрос, считается N+1
+        query_repeat_threshold = int(os.environ.get("QUERY_REPEAT_THRESHOLD", 5))
+        # ограничения профилирования воркера через /admin/profile
+        profiler_max_duration = float(os.environ.get("PROFILER_MAX_DURATION", 60))
+        profiler_max_hz = int(os.environ.get("PROFILER_MAX_HZ", 250))
+        profiler_default_hz = int(os.environ.get("PROFILER_DEFAULT_HZ", 100))
+
+
+    class TracingConfig(ConfigAbstract):
+        """Параметры трассировки сервисного слоя."""
+
+        sentry_url = os.environ.get("SENTRY_URL", "")
+        sentry_environment = os.environ.get("SENTRY_ENVIRONMENT", "TEST_LOCAL")
+        # файл для локального экспорта спанов (JSON lines), используется если Sentry не настроен
+        tracing_span_log = os.environ.get("TRACING_SPAN_LOG", "")
+        # желаемое количество трасс каждого роута за окно выборки
+        tracing_samples_per_route = int(os.environ.get("TRACING_SAMPLES_PER_ROUTE", 10))
+        tracing_sample_window = float(os.environ.get("TRACING_SAMPLE_WINDOW", 60))
+        tracing_min_sample_rate = float(os.environ.get("TRACING_MIN_SAMPLE_RATE", 0.001))
+
+
+    class AdmissionConfig(ConfigAbstract):
+        """Ограничения конкурентности дорогих роутов."""
+
+        # "METHOD /route=concurrency:queue:deadline;..." - deadline - максимальное ожидание в очереди (секунды)
+        admission_limits = {
+            route.strip(): tuple(float(value) for value in limit.split(":"))
+            for route, limit in (
+                item.rsplit("=", 1)
+                for item in os.environ.get(
+                    "ADMISSION_LIMITS",
+                    "POST /user/login=8:32:1;POST /files/create=4:16:5;POST /chats/get_my_chats=16:64:2",
+                ).split(";")
+                if item.strip()
+            )
+        }
+        admission_reject_status = int(os.environ.get("ADMISSION_REJECT_STATUS", 503))
+
+
+    class QueryDeadlineConfig(ConfigAbstract):
+        """Ограничение времени запросов к БД по роутам (см. ``utils.query_deadline``)."""
+
+        # "METHOD /route=timeout_ms;..." - statement_timeout транзакций запроса роута
+        db_route_timeouts = {
+            route.strip(): int(timeout)
+            for route, timeout in (
+                item.rsplit("=", 1)
+                for item in os.environ.get(
+                    "DB_ROUTE_TIMEOUTS",
+                    "GET /orders/active=3000;GET /orders/orders=3000;GET /reviews/user/{user_id}=3000;"
+                    "POST /chats/get_my_chats=2000",
+                ).split(";")
+                if item.strip()
+            )
+        }
+        # отмена запроса к БД при отключении клиента (для роутов из DB_ROUTE_TIMEOUTS)
+        db_cancel_on_disconnect = os.environ.get("DB_CANCEL_ON_DISCONNECT", "True").lower() == "true"
+
+
+    class RateLimitConfig(ConfigAbstract):
+        """Ограничения частоты запросов (см. ``utils.rate_limit``)."""
+
+        # "name=count/period@key+key;..." - count запросов за period секунд по каждому из ключей (ip, user, login)
+        rate_limits = {
+            name.strip(): (int(count), float(period), tuple(keys.split("+")))
+            for name, count, period, keys in (
+                (item.split("=")[0], *item.split("=")[1].replace("@", "/").split("/"))
+                for item in os.environ.get(
+                    "RATE_LIMITS",
+                    "login=10/60@ip+login;message_create=30/10@user;file_upload=20/60@user",
+                ).split(";")
+                if item.strip()
+            )
+        }
+        # memory - отдельно в каждом воркере, postgres - общий лимит для всех воркеров
+        rate_limit_backend = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+        rate_limit_shards = int(os.environ.get("RATE_LIMIT_SHARDS", 16))
+        rate_limit_max_keys_per_shard = int(os.environ.get("RATE_LIMIT_MAX_KEYS_PER_SHARD", 10_000))
+
+
+    class ReadCacheConfig(ConfigAbstract):
+        """Кэширование чтения: объединение конкурентных чтений (``utils.singleflight``) и HTTP кэш."""
+
+        # время хранения прочитанных заказов, пользователей и отзывов (секунды), 0 - без хранения
+        singleflight_ttl = float(os.environ.get("SINGLEFLIGHT_TTL", 0.5))
+        singleflight_max_entries = int(os.environ.get("SINGLEFLIGHT_MAX_ENTRIES", 4096))
+        # Cache-Control публичных списков (лента заказов, отзывы о пользователе)
+        cache_control_lists = os.environ.get("CACHE_CONTROL_LISTS", "public, max-age=5, stale-while-revalidate=30")
+        # Cache-Control отдельных заказов и отзывов - всегда перепроверять по ETag
+        cache_control_items = os.environ.get("CACHE_CONTROL_ITEMS", "no-cache")
+        # Cache-Control данных, доступных только по токену (профили)
+        cache_control_private = os.environ.get("CACHE_CONTROL_PRIVATE", "private, no-cache")
+
+
+    class CompressionConfig(ConfigAbstract):
+        """Сжатие ответов (см. ``utils.compression``)."""
+
+        compression_enabled = os.environ.get("COMPRESSION_ENABLED", "True").lower() == "true"
+        # кодировки в порядке предпочтения, zstd и br используются при установленных zstandard и brotli
+        compression_encodings = [
+            name.strip() for name in os.environ.get("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if name.strip()
+        ]
+        # ответы меньше порога (байт) не сжимаются
+        compression_min_size = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024))
+        compression_gzip_level = int(os.environ.get("COMPRESSION_GZIP_LEVEL", 5))
+        compression_brotli_quality = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", 4))
+        compression_zstd_level = int(os.environ.get("COMPRESSION_ZSTD_LEVEL", 3))
+        # количество хранимых между запросами контекстов zstd
+        compression_pool_size = int(os.environ.get("COMPRESSION_POOL_SIZE", 32))
+
 
     class Auth(ConfigAbstract):
         SECRET_KEY = os.environ.get("SECRET")
         ALGORITHM = "HS256"
         ACCESS_TOKEN_EXPIRE_MINUTES = 30
+        # пул потоков для хэширования паролей (pbkdf2 отпускает GIL)
+        PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 4))
+        PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 64))
+        # полная перезагрузка отозванных токенов в воркере (секунды), между перезагрузками - по NOTIFY
+        BLOCKED_JWT_REFRESH_INTERVAL = float(os.environ.get("BLOCKED_JWT_REFRESH_INTERVAL", 300))
+        # подключение для LISTEN, если основное идёт через PgBouncer в режиме transaction (там LISTEN не работает)
+        BLOCKED_JWT_DSN = os.environ.get("BLOCKED_JWT_DSN")
 
 
     class Config(  # noqa: D101
         AppSettings,
         AppConfig,
+        ServerConfig,
         DBConfig,
+        ImageConfig,
+        JobsConfig,
+        MetricsConfig,
+        TracingConfig,
+        AdmissionConfig,
+        QueryDeadlineConfig,
+        RateLimitConfig,
+        ReadCacheConfig,
+        CompressionConfig,
         Auth,
 
     ):
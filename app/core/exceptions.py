@@ -8,3 +8,7 @@
 
 class NotAuthorized(Exception):  # noqa: N818
     """Пользователь не авторизован в системе."""
+
+
+class NoPermission(Exception):  # noqa: N818
+    """У пользователя нет прав на действие."""
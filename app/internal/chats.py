@@ -1,12 +1,18 @@
 import fastapi
-from sqlalchemy import insert, select
+from sqlalchemy import insert, lambda_stmt, select, union
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models import Chat, ChatUserAssociation, User, File, Message
-from schemas.chats import ChatCreate, AssociationsCreate, MessageCreate, GetAllChats
+from schemas.chats import ChatCreate, AssociationsCreate, MessageCreate, GetAllChats, MessageRow
+from utils.notifications.outbox import add_notifications_from_select
+from utils.rows import columns, fetch_rows
+from utils.tracing import traced
 
+MESSAGE_ROW_COLUMNS = columns(MessageRow, Message)
 
+
+@traced("db")
 async def create_chat(
         chat_info: ChatCreate,
         session: AsyncSession,
@@ -32,16 +38,14 @@ async def create_chat(
         raise ValueError("Failed to create chat") from e
 
 
+@traced("db")
 async def get_chat(session: AsyncSession, chat_id: int) -> Chat:
-    query = (
-        select(Chat)
-        .where(Chat.id == chat_id)
-        .order_by(Chat.deleted_at.desc())
-    )
+    query = lambda_stmt(lambda: select(Chat).where(Chat.id == chat_id).order_by(Chat.deleted_at.desc()))
     chat = (await session.execute(query)).scalars().all()
     return chat
 
 
+@traced("db")
 async def create_associations(
         session: AsyncSession,
         associations_info: AssociationsCreate
@@ -65,9 +69,9 @@ async def create_associations(
         )
 
     # Проверка существования ассоциации для этого чата
+    chat_id = associations_info.chat_id
     existing_association = await session.execute(
-        select(ChatUserAssociation)
-        .where(ChatUserAssociation.chat_id == associations_info.chat_id)
+        lambda_stmt(lambda: select(ChatUserAssociation).where(ChatUserAssociation.chat_id == chat_id))
     )
 
     if existing_association.scalar_one_or_none() is not None:
@@ -108,9 +112,10 @@ async def create_associations(
         )
 
 
+@traced("db")
 async def get_associations(session: AsyncSession, chat_id: int) -> ChatUserAssociation:
-    query = (
-        select(ChatUserAssociation)
+    query = lambda_stmt(
+        lambda: select(ChatUserAssociation)
         .where(ChatUserAssociation.chat_id == chat_id)
         .order_by(ChatUserAssociation.deleted_at.desc())
     )
@@ -118,6 +123,7 @@ async def get_associations(session: AsyncSession, chat_id: int) -> ChatUserAssoc
     return associations
 
 
+@traced("db")
 async def create_message(session: AsyncSession, message_info: MessageCreate) -> Message:
     client_exists = await session.get(User, message_info.author_id)
     chat_exists = await session.get(Chat, message_info.chat_id)
@@ -149,7 +155,9 @@ async def create_message(session: AsyncSession, message_info: MessageCreate) ->
 
     try:
         result = await session.execute(new_message)
-        return result.scalar_one()
+        message = result.scalar_one()
+        await notify_chat_participants(session, message_info)
+        return message
     except IntegrityError as e:
         await session.rollback()
         if "duplicate key" in str(e):
@@ -169,17 +177,39 @@ async def create_message(session: AsyncSession, message_info: MessageCreate) ->
         )
 
 
-async def get_message(session: AsyncSession, message_id: int) -> Message:
-    query = (
-        select(Message)
-        .where(Message.id == message_id)
-        .order_by(Message.deleted_at.desc())
+@traced("db")
+async def notify_chat_participants(session: AsyncSession, message_info: MessageCreate) -> None:
+    """Уведомление участников чата (кроме автора) о новом сообщении, в транзакции создания сообщения."""
+    participants = union(
+        select(ChatUserAssociation.client_id.label("user_id"))
+        .where(ChatUserAssociation.chat_id == message_info.chat_id),
+        select(ChatUserAssociation.executor_id)
+        .where(ChatUserAssociation.chat_id == message_info.chat_id),
+    ).subquery()
+    recipients = select(participants.c.user_id).where(participants.c.user_id != message_info.author_id)
+
+    await add_notifications_from_select(
+        session,
+        recipients,
+        "message.created",
+        {
+            "chat_id": message_info.chat_id,
+            "author_id": message_info.author_id,
+            "text": (message_info.text or "")[:200],
+            "file_id": message_info.file_id,
+        },
     )
+
+
+@traced("db")
+async def get_message(session: AsyncSession, message_id: int) -> Message:
+    query = lambda_stmt(lambda: select(Message).where(Message.id == message_id).order_by(Message.deleted_at.desc()))
     message = (await session.execute(query)).scalars().all()
     return message
 
 
-async def all_message_chat(session: AsyncSession, associations_info: AssociationsCreate):
+@traced("db")
+async def all_message_chat(session: AsyncSession, associations_info: AssociationsCreate) -> list[MessageRow]:
     client_exists = await session.get(User, associations_info.client_id)
     executor_exists = await session.get(User, associations_info.executor_id)
     chat_exists = await session.get(Chat, associations_info.chat_id)
@@ -195,16 +225,13 @@ async def all_message_chat(session: AsyncSession, associations_info: Association
     except:
         association = await create_associations(session, associations_info)
 
-    query = (
-        select(Message)
-        .where(Message.chat_id == associations_info.chat_id)
-        .order_by(Message.deleted_at.desc())
-    )
+    chat_id = associations_info.chat_id
+    query = select(*MESSAGE_ROW_COLUMNS).where(Message.chat_id == chat_id).order_by(Message.deleted_at.desc())
 
-    messsages_list = (await session.execute(query)).scalars().all()
-    return messsages_list
+    return await fetch_rows(session, MessageRow, query)
 
 
+@traced("db")
 async def get_last_message(session: AsyncSession, chat_id) -> Message:
     chat_exists = await session.get(Chat, chat_id)
 
@@ -214,15 +241,14 @@ async def get_last_message(session: AsyncSession, chat_id) -> Message:
             detail="Chat not found"
         )
 
-    query = (
-        select(Message)
-        .where(Message.chat_id == chat_id)
-        .order_by(Message.created_at.desc())
+    query = lambda_stmt(
+        lambda: select(Message).where(Message.chat_id == chat_id).order_by(Message.created_at.desc()).limit(1)
     )
     message_last = (await session.execute(query)).scalars().first()
     return message_last
 
 
+@traced("db")
 async def get_my_chats(session: AsyncSession, user_id) -> [GetAllChats, ...]:
     user_exists = await session.get(User, user_id)
     if user_exists is None:
@@ -230,8 +256,8 @@ async def get_my_chats(session: AsyncSession, user_id) -> [GetAllChats, ...]:
             status_code=401,
             detail="User not found"
         )
-    query = (
-        select(ChatUserAssociation)
+    query = lambda_stmt(
+        lambda: select(ChatUserAssociation)
         .where(ChatUserAssociation.client_id == user_id)
         .order_by(ChatUserAssociation.deleted_at.desc())
     )
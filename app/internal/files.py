@@ -1,17 +1,53 @@
+import logging
 import os
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
 from uuid import uuid4
 
 import aiofiles
 from fastapi import UploadFile
 from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import File
+from core.config import Config
+from models import File, FileVariant
+from utils.database_connection import db_async_session_manager
+from utils.disk_cache import DiskLRUCache
+from utils.executors import process_pool
+from utils.images import make_variants, resize_image
+from utils.jobs.worker import job_task
+from utils.mime import DEFAULT_MIME_TYPE, SNIFF_SIZE, sniff_mime
+from utils.tracing import traced
 
+logger = logging.getLogger(__name__)
 
+# пул процессов для перекодирования изображений, общий для всего воркера
+image_executor = process_pool(Config.image_workers, Config.image_max_pending)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# задача очереди (``utils.jobs``) генерации уменьшенных копий загруженного изображения
+IMAGE_VARIANTS_TASK = "files.image_variants"
+
+VARIANT_SIZES = {
+    "thumbnail": Config.image_thumbnail_size,
+    "preview": Config.image_preview_size,
+}
+
+_image_cache: Optional[DiskLRUCache] = None
+
+
+def get_image_cache() -> DiskLRUCache:
+    """Дисковый кэш изображений, изменённых по запросу (создаётся при первом обращении)."""
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = DiskLRUCache(Config.image_cache_directory, Config.image_cache_max_bytes)
+    return _image_cache
+
+
+@traced("file")
 async def save_file(
         file_data: bytes,
         upload_dir: str,
@@ -61,48 +97,100 @@ async def save_file(
     return str(file_path)
 
 
+class SavedFile(NamedTuple):
+    path: str
+    mime_type: str
+    size: int
+
+
+@traced("file")
 async def save_upload_file(
         upload_file: UploadFile,
         upload_dir: str,
-        **kwargs
-) -> str:
+        *,
+        filename: Optional[str] = None,
+        allowed_extensions: Optional[list[str]] = None,
+        max_size: int = 10 * 1024 * 1024  # 10MB по умолчанию
+) -> SavedFile:
     """
     Сохраняет файл из FastAPI UploadFile.
 
+    Файл записывается на диск частями по ``UPLOAD_CHUNK_SIZE`` байт, тип содержимого
+    определяется по сигнатуре в первой части (см. ``utils.mime``).
+
     Args:
         upload_file: Объект UploadFile из FastAPI
         upload_dir: Директория для сохранения
-        **kwargs: Доп. параметры (см. save_file)
+        filename: Имя файла (если None - берётся из upload_file)
+        allowed_extensions: Разрешенные расширения (['.jpg', '.png'])
+        max_size: Максимальный размер файла в байтах
 
     Returns:
-        Полный путь к сохраненному файлу
+        Путь к сохраненному файлу, mime тип и размер файла
+
+    Raises:
+        ValueError: При нарушении проверок
+        IOError: При ошибках записи
     """
-    file_data = await upload_file.read()
+    filename = filename or upload_file.filename
+
+    if allowed_extensions:
+        file_ext = Path(filename).suffix.lower()
+        if file_ext not in allowed_extensions:
+            raise ValueError(f"Недопустимое расширение файла. Разрешены: {', '.join(allowed_extensions)}")
+
+    Path(upload_dir).mkdir(parents=True, exist_ok=True)
+    file_path = Path(upload_dir) / filename
 
-    if 'filename' not in kwargs:
-        kwargs['filename'] = upload_file.filename
+    chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+    mime_type = sniff_mime(chunk[:SNIFF_SIZE])
+    size = 0
 
-    return await save_file(file_data, upload_dir, **kwargs)
+    try:
+        async with aiofiles.open(file_path, 'wb') as f:
+            while chunk:
+                size += len(chunk)
+                if size > max_size:
+                    raise ValueError(f"Файл слишком большой. Максимальный размер: {max_size} байт")
+                await f.write(chunk)
+                chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+    except ValueError:
+        file_path.unlink(missing_ok=True)
+        raise
+    except Exception as e:
+        file_path.unlink(missing_ok=True)
+        raise IOError(f"Ошибка при сохранении файла: {str(e)}")
 
+    return SavedFile(str(file_path), mime_type, size)
 
+
+@traced("db")
 async def save_file_db(
         session: AsyncSession,
         path: str,
         file: UploadFile,
-        is_image: bool = True,
+        is_image: Optional[bool] = None,
+        mime_type: str = DEFAULT_MIME_TYPE,
 ) -> File:
+    """
+    Сохраняет информацию о файле в БД.
+
+    Если ``is_image`` не указан, он определяется по ``mime_type``.
+    """
+    values = dict(name=file.filename, path=path, mime_type=mime_type)
+    if is_image is not None:
+        values["is_image"] = is_image
+
     file_insert = (
         insert(File)
-        .values(
-            name=file.filename,
-            path=path,
-            is_image=is_image,
-        )
+        .values(**values)
         .returning(File)
     )
+    # в 1.4 insert().returning(File) возвращает строки Core, объект модели - через from_statement
+    file_query = select(File).from_statement(file_insert)
 
     try:
-        result = await session.execute(file_insert)
+        result = await session.execute(file_query)
         return result.scalar_one()
     except IntegrityError as e:
         await session.rollback()
@@ -112,6 +200,7 @@ async def save_file_db(
         raise ValueError("Failed to create file") from e
 
 
+@traced("db")
 async def get_file(session: AsyncSession, file_id: int) -> File:
     query = (
         select(File)
@@ -120,3 +209,56 @@ async def get_file(session: AsyncSession, file_id: int) -> File:
     )
     file = (await session.execute(query)).scalars().all()
     return file
+
+
+@traced("db")
+async def get_file_variant(session: AsyncSession, file_id: int, kind: str) -> Optional[FileVariant]:
+    query = (
+        select(FileVariant)
+        .where(FileVariant.file_id == file_id, FileVariant.kind == kind)
+    )
+    return (await session.execute(query)).scalar_one_or_none()
+
+
+@traced("image")
+async def generate_image_variants(file_id: int, path: str) -> None:
+    """
+    Генерирует уменьшенные копии изображения и сохраняет их в БД.
+
+    Выполняется воркером очереди задач (задача ``IMAGE_VARIANTS_TASK``, ставится при загрузке
+    файла), поэтому время перекодирования не влияет на время загрузки, а ошибка или перезапуск
+    приводят к повтору задачи. Перекодирование выполняется в пуле процессов, запись в БД -
+    в отдельной сессии; уже сохранённые при прошлой попытке копии не дублируются.
+    """
+    variants = await image_executor.run(
+        make_variants, path, VARIANT_SIZES, Config.image_variant_format, Config.image_variant_quality
+    )
+
+    async with db_async_session_manager() as session:
+        await session.execute(
+            pg_insert(FileVariant).on_conflict_do_nothing(index_elements=["file_id", "kind"]),
+            [{"file_id": file_id, **variant} for variant in variants],
+        )
+
+
+@job_task(IMAGE_VARIANTS_TASK)
+async def image_variants_job(payload: dict) -> None:
+    await generate_image_variants(payload["file_id"], payload["path"])
+
+
+@traced("image")
+async def get_resized_image(file: File, width: Optional[int], height: Optional[int], fmt: str) -> Path:
+    """
+    Возвращает путь к изображению, вписанному в ``width`` x ``height``.
+
+    Результат кэшируется на диске, конкурентные запросы одного варианта
+    перекодируются в пуле процессов один раз.
+    """
+    quality = Config.image_variant_quality
+    # путь исходного файла уникален (uuid), updated_at сбрасывает кэш при замене файла
+    key = f"{file.path}:{file.updated_at}:{width}x{height}:q{quality}.{fmt}"
+
+    async def create(target_path: str) -> None:
+        await image_executor.run(resize_image, file.path, target_path, width, height, fmt, quality)
+
+    return await get_image_cache().get_or_create(key, create)
@@ -2,13 +2,20 @@ from typing import Optional
 
 import fastapi
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import func, or_, select, insert
+from sqlalchemy import func, insert, lambda_stmt, or_, select
 from sqlalchemy.exc import IntegrityError
+from core.config import Config
 from models import User, Role
-from schemas.users import RegisterUserIn
-from utils.auth.passwwords import generate_password_hash
+from schemas.users import RegisterUserIn, UserCredentials
+from utils.auth.passwwords import generate_password_hash_async
+from utils.database_connection import db_async_session_manager
+from utils.singleflight import SingleFlight
+from utils.tracing import traced
 
+user_reads = SingleFlight("user", Config.singleflight_ttl, Config.singleflight_max_entries)
 
+
+@traced("db")
 async def user_exists(
         session: AsyncSession,
         login: str,
@@ -27,6 +34,7 @@ async def user_exists(
     return users[0] if len(users) > 0 else None
 
 
+@traced("db")
 async def users_exists(
         session: AsyncSession,
         login: str,
@@ -37,26 +45,55 @@ async def users_exists(
 ) -> list[User]:
     """Извращённая проверка на существование нескольких пользователей с указанными данными."""
 
-    query = (
-        select(User)
-        .where(or_(func.lower(User.login) == func.lower(login), func.lower(User.email) == func.lower(email)))
-        .order_by(User.deleted_at.desc())
-    )
-
-    if user_id:
-        query = query.where(User.id != user_id)
-
-    if not include_deleted:
-        query = query.where(User.deleted_at.is_(None))
-
     if options:
-        query = query.options(*options)
+        # опции загрузки не кэшируются в lambda выражениях - запрос собирается обычным способом
+        query = (
+            select(User)
+            .where(or_(User.login_lower == func.lower(login), User.email_lower == func.lower(email)))
+            .order_by(User.deleted_at.desc())
+            .options(*options)
+        )
+        if user_id:
+            query = query.where(User.id != user_id)
+        if not include_deleted:
+            query = query.where(User.deleted_at.is_(None))
+    else:
+        # lambda_stmt: запрос компилируется один раз для каждого набора условий, значения передаются параметрами
+        query = lambda_stmt(
+            lambda: select(User)
+            .where(or_(User.login_lower == func.lower(login), User.email_lower == func.lower(email)))
+            .order_by(User.deleted_at.desc())
+        )
+        if user_id:
+            query += lambda s: s.where(User.id != user_id)
+        if not include_deleted:
+            query += lambda s: s.where(User.deleted_at.is_(None))
 
     users = (await session.execute(query)).scalars().all()
 
     return users
 
 
+@traced("db")
+async def get_login_credentials(session: AsyncSession, login: str) -> Optional[UserCredentials]:
+    """
+    Данные для входа неудалённого пользователя по логину или почте (без учёта регистра).
+
+    Один запрос по уникальным частичным индексам ``login_lower``/``email_lower``, загружаются
+    только id, логин и хэш пароля. Совпадение по логину приоритетнее совпадения по почте.
+    """
+    query = lambda_stmt(
+        lambda: select(User.id, User.login, User.password)
+        .where(or_(User.login_lower == func.lower(login), User.email_lower == func.lower(login)))
+        .where(User.deleted_at.is_(None))
+        .order_by(User.login_lower != func.lower(login))
+        .limit(1)
+    )
+    row = (await session.execute(query)).first()
+    return UserCredentials(*row) if row is not None else None
+
+
+@traced("db")
 async def check_credentials(session: AsyncSession, login: str, email: str, user_id: int = None) -> None:  # noqa: C901
     """
     Проверка данных для регистрации или создания нового пользователя.
@@ -83,12 +120,14 @@ async def check_credentials(session: AsyncSession, login: str, email: str, user_
     await session.flush()
 
 
+@traced("db")
 async def user_create(
         session: AsyncSession,
         user_data: RegisterUserIn,
         options: list | None = None
 ) -> User:
-    role_check_query = select(Role).where(Role.id == user_data.role_id)
+    role_id = user_data.role_id
+    role_check_query = lambda_stmt(lambda: select(Role).where(Role.id == role_id))
     if not (await session.execute(role_check_query)).scalar_one_or_none():
         raise fastapi.HTTPException(
             400,
@@ -101,7 +140,7 @@ async def user_create(
         insert(User)
         .values(
             login=user_data.login,
-            password=generate_password_hash(user_data.password),
+            password=await generate_password_hash_async(user_data.password),
             email=user_data.email,
             last_name=user_data.last_name,
             first_name=user_data.first_name,
@@ -109,13 +148,18 @@ async def user_create(
         )
         .returning(User)
     )
-
+    # в 1.4 insert().returning(User) возвращает строки Core, объект модели - через from_statement
+    user_query = select(User).from_statement(user_insert)
     if options:
-        user_insert = user_insert.options(*options)
+        user_query = user_query.options(*options)
 
     try:
-        result = await session.execute(user_insert)
-        return result.scalar_one()
+        result = await session.execute(user_query)
+        user = result.scalar_one()
+        await session.commit()
+        # id мог быть запрошен до создания, отсутствие пользователя не должно остаться в кэше
+        user_reads.invalidate(user.id)
+        return user
     except IntegrityError as e:
         await session.rollback()
         raise ValueError("Database integrity error occurred") from e
@@ -124,11 +168,23 @@ async def user_create(
         raise ValueError("Failed to create user") from e
 
 
+@traced("db")
 async def get_user(session: AsyncSession, user_id: int) -> User:
-    query = (
-        select(User)
-        .where(User.id == user_id)
-        .order_by(User.deleted_at.desc())
-    )
+    query = lambda_stmt(lambda: select(User).where(User.id == user_id).order_by(User.deleted_at.desc()))
     user = (await session.execute(query)).scalar_one_or_none()
     return user
+
+
+async def get_user_shared(user_id: int) -> Optional[User]:
+    """
+    Пользователь для чтения.
+
+    Конкурентные запросы одного пользователя в воркере выполняют один запрос к БД,
+    результат общий и не привязан к сессии (см. ``utils.singleflight``).
+    """
+
+    async def load() -> Optional[User]:
+        async with db_async_session_manager() as session:
+            return await get_user(session, user_id)
+
+    return await user_reads.do(user_id, load)
@@ -1,27 +1,18 @@
-import pathlib
-
-import fastapi
-
-from starlette.middleware.cors import CORSMiddleware
+"""
+Фабрика приложения.
 
+Роуты, middleware, движок БД и интеграции (Sentry) импортируются и создаются в ``create_app``,
+а не при импорте модуля: импорт ``main`` дешёвый, приложение создаётся при первом обращении
+к ``main.app`` (``uvicorn main:app``) или явным вызовом ``create_app()`` (``uvicorn --factory main:create_app``).
+"""
+import contextlib
 from typing import TYPE_CHECKING
 
-from routes.account import auth
-from routes.chat.chat_associations import associations
-from routes.chat.chats import chats
-from routes.reviews import reviews
-from routes.orders import orders
-from routes.chat.messages import message
+if TYPE_CHECKING:
+    import fastapi
 
-from routes.files import files
-from utils.log_config import set_logging
-
-from core.config import Config
-from routes.exceptions import add_exception_handlers
-
-# if TYPE_CHECKING:
-#     from utils.auth.blocked_jwt import BlockedJWTStorage
-#     from utils.auth.user_info import UserInfoFetcher
+    # from utils.auth.blocked_jwt import BlockedJWTStorage
+    # from utils.auth.user_info import UserInfoFetcher
 
 
 description = """
@@ -38,29 +29,10 @@ description = """
 tags_metadata = [
     {"name": "User", "description": "Роуты для работы с пользователями"},
     {"name": "Files", "description": "Роуты для работы с файлами"},
-    {"name": "Chats", "description": "Роуты для работы с чатами"}
+    {"name": "Chats", "description": "Роуты для работы с чатами"},
+    {"name": "Admin", "description": "Служебные роуты (профилирование воркера)"},
 ]
 
-app = fastapi.FastAPI(
-    title="Портал фриланс биржа",
-    description=description,
-    version="0.0.1",
-    openapi_tags=tags_metadata,
-    swagger_ui_parameters={
-        "docExpansion": "none",
-        "displayRequestDuration": "true",
-        "syntaxHighlight.theme": "obsidian",
-        "tryItOutEnabled": "true",
-        "requestSnippetsEnabled": "true",
-    },
-)
-
-set_logging(
-    level=Config.log_level,
-    enable_additional_debug=Config.additional_debug,
-    app=app,
-)
-
 default_errors = {
     401: {"description": "Unauthorized"},
     403: {"description": "No permission"},
@@ -69,38 +41,186 @@ default_errors = {
     410: {"description": "Already Expired"},
 }
 
-add_exception_handlers(app)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-    expose_headers=["Content-Disposition"],
-    allow_credentials=True,
-)
-
-
-# @app.on_event("shutdown")
-# async def shutdown():
-#     if user_fetcher := getattr(app.state, "user_fetcher", None):
-#         user_fetcher: UserInfoFetcher
-#         await user_fetcher.close()
-#
-#     if blocked_jwt := getattr(app.state, "blocked_jwt", None):
-#         blocked_jwt: BlockedJWTStorage
-#         await blocked_jwt.close()
-
-@app.get("/")
-async def home():
-    return {"data": "Hello World"}
-
-
-app.include_router(auth, prefix="/user", tags=["User"])
-app.include_router(files, prefix="/files", tags=["Files"])
-app.include_router(chats, prefix="/chats", tags=["Chats"])
-app.include_router(associations, prefix="/chats", tags=["Chats"])
-app.include_router(message, prefix="/chats", tags=["Chats"])
-
-app.include_router(reviews, prefix="/reviews", tags=["reviews"])
-app.include_router(orders, prefix="/orders", tags=["orders"])
+
+def create_app() -> "fastapi.FastAPI":  # noqa: C901
+    import fastapi
+    from starlette.middleware.cors import CORSMiddleware
+
+    from core.config import Config
+    from internal.files import image_executor
+    from routes.account import auth
+    from routes.admin import admin
+    from routes.chat.chat_associations import associations
+    from routes.chat.chats import chats
+    from routes.chat.messages import message
+    from routes.exceptions import add_exception_handlers
+    from routes.files import files
+    from routes.metrics import metrics
+    from routes.orders import orders
+    from routes.reviews import reviews
+    from utils.admission import AdmissionMiddleware, RouteLimit
+    from utils.auth.blocked_jwt import BlockedJWTStorage
+    from utils.auth.passwwords import hash_executor
+    from utils.compression import CompressionMiddleware, available_encoders
+    from utils.database_connection import get_async_engine
+    from utils.factory import warmup_async_engine
+    from utils.instrumentation import MetricsMiddleware, instrument_engine, instrument_executor
+    from utils.log_config import set_logging
+    from utils.loop_monitor import LoopLagMonitor
+    from utils.metrics import enable_multiprocess
+    from utils.query_deadline import QueryDeadlineMiddleware, instrument_statement_timeout
+    from utils.query_stats import QueryStatsMiddleware, instrument_query_stats
+    from utils.tracing import AdaptiveSampler, TracingMiddleware, configure_tracing, sentry_traces_sampler, tracer
+
+    loop_lag_monitor = LoopLagMonitor(Config.loop_lag_interval, Config.loop_block_threshold)
+    metrics_collector = enable_multiprocess(
+        Config.metrics_multiproc_dir, Config.metrics_snapshot_interval
+    ) if Config.metrics_multiproc_dir else None
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: fastapi.FastAPI):
+        # соединения с БД открываются до приёма запросов: воркер начинает слушать порт уже прогретым
+        if Config.db_pool_size > 0 and Config.db_pool_warmup > 0:
+            await warmup_async_engine(get_async_engine(), min(Config.db_pool_warmup, Config.db_pool_size))
+        # отозванные токены загружаются до приёма запросов, дальше обновляются по NOTIFY
+        app.state.blocked_jwt = BlockedJWTStorage(
+            Config.BLOCKED_JWT_DSN or Config.db_conn_str, Config.BLOCKED_JWT_REFRESH_INTERVAL
+        )
+        await app.state.blocked_jwt.start()
+        if Config.metrics_enabled:
+            loop_lag_monitor.start()
+            if metrics_collector:
+                metrics_collector.start()
+
+        yield
+
+        # к этому моменту uvicorn дождался завершения выполняющихся запросов (graceful shutdown)
+        if user_fetcher := getattr(app.state, "user_fetcher", None):
+            await user_fetcher.close()
+
+        if blocked_jwt := getattr(app.state, "blocked_jwt", None):
+            await blocked_jwt.close()
+
+        loop_lag_monitor.stop()
+        if metrics_collector:
+            metrics_collector.stop()
+        image_executor.shutdown(wait=False)
+        hash_executor.shutdown(wait=False)
+        if tracer.exporter is not None:
+            tracer.exporter.close()
+        await get_async_engine().dispose()
+
+    app = fastapi.FastAPI(
+        lifespan=lifespan,
+        title="Портал фриланс биржа",
+        description=description,
+        version="0.0.1",
+        openapi_tags=tags_metadata,
+        swagger_ui_parameters={
+            "docExpansion": "none",
+            "displayRequestDuration": "true",
+            "syntaxHighlight.theme": "obsidian",
+            "tryItOutEnabled": "true",
+            "requestSnippetsEnabled": "true",
+        },
+    )
+
+    configure_tracing(
+        AdaptiveSampler(
+            Config.tracing_samples_per_route, Config.tracing_sample_window, Config.tracing_min_sample_rate
+        ),
+        span_log=None if Config.sentry_url else Config.tracing_span_log,
+        sentry=bool(Config.sentry_url),
+    )
+
+    set_logging(
+        level=Config.log_level,
+        enable_additional_debug=Config.additional_debug,
+        sentry_url=Config.sentry_url,
+        environment=Config.sentry_environment,
+        app=app,
+        traces_sampler=sentry_traces_sampler(app.router),
+    )
+
+    add_exception_handlers(app)
+
+    # внутри CORS, чтобы отклонённые запросы тоже получали CORS заголовки
+    app.add_middleware(
+        AdmissionMiddleware,
+        router=app.router,
+        limits={
+            route: RouteLimit(int(concurrency), int(queue), deadline)
+            for route, (concurrency, queue, deadline) in Config.admission_limits.items()
+        },
+        reject_status=Config.admission_reject_status,
+    )
+    # снаружи admission: отключившийся клиент освобождает и место в очереди роута
+    app.add_middleware(
+        QueryDeadlineMiddleware,
+        router=app.router,
+        timeouts=Config.db_route_timeouts,
+        cancel_on_disconnect=Config.db_cancel_on_disconnect,
+    )
+    instrument_statement_timeout()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["Content-Disposition"],
+        allow_credentials=True,
+    )
+
+    if Config.compression_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            encoders=available_encoders(
+                Config.compression_encodings,
+                gzip_level=Config.compression_gzip_level,
+                brotli_quality=Config.compression_brotli_quality,
+                zstd_level=Config.compression_zstd_level,
+                pool_size=Config.compression_pool_size,
+            ),
+            min_size=Config.compression_min_size,
+        )
+
+    if Config.metrics_enabled:
+        app.add_middleware(MetricsMiddleware, router=app.router)
+        instrument_engine(get_async_engine())
+        instrument_executor("image", image_executor)
+        instrument_executor("password_hash", hash_executor)
+
+    if Config.query_stats_enabled:
+        app.add_middleware(
+            QueryStatsMiddleware, router=app.router, repeat_threshold=Config.query_repeat_threshold
+        )
+        instrument_query_stats(get_async_engine())
+
+    if tracer.exporter is not None:
+        app.add_middleware(TracingMiddleware, router=app.router)
+
+    @app.get("/")
+    async def home():
+        return {"data": "Hello World"}
+
+    app.include_router(metrics)
+    app.include_router(admin, prefix="/admin", tags=["Admin"])
+    app.include_router(auth, prefix="/user", tags=["User"])
+    app.include_router(files, prefix="/files", tags=["Files"])
+    app.include_router(chats, prefix="/chats", tags=["Chats"])
+    app.include_router(associations, prefix="/chats", tags=["Chats"])
+    app.include_router(message, prefix="/chats", tags=["Chats"])
+
+    app.include_router(reviews, prefix="/reviews", tags=["reviews"])
+    app.include_router(orders, prefix="/orders", tags=["orders"])
+
+    return app
+
+
+def __getattr__(name: str):
+    # ``uvicorn main:app`` и ``from main import app``: приложение создаётся при первом обращении
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,24 +1,21 @@
 from typing import Any
-import os
-import imghdr
 
 from sqlalchemy import (
-    Column, DateTime, Integer, String, Boolean, Text, ForeignKey,
-    Index, CheckConstraint, Numeric, Table
+    Column, Computed, DateTime, Integer, String, Boolean, Text, ForeignKey,
+    Index, CheckConstraint, Numeric, Table, BigInteger, Float, text
 )
-from sqlalchemy.orm import relationship, validates
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import deferred, relationship, validates
 from sqlalchemy.sql import func
 from pydantic import EmailStr
 
 from models.core import Base, TimestampMixin, fresh_timestamp
+from utils.mime import DEFAULT_MIME_TYPE, is_image_mime
 
 
 def attachment_is_image_default(context: Any) -> bool:
-    return is_image(context.get_current_parameters()["path"])
-
-
-def is_image(path: os.PathLike) -> bool:
-    return imghdr.what(path) is not None
+    """Признак изображения по mime типу, определённому при загрузке (без чтения файла с диска)."""
+    return is_image_mime(context.get_current_parameters().get("mime_type"))
 
 
 # user_skill_association = Table(
@@ -41,6 +38,9 @@ class User(TimestampMixin, Base):
     __table_args__ = (
         CheckConstraint("email ~* '^[A-Za-z0-9._%-]+@[A-Za-z0-9.-]+[.][A-Za-z]+$'",
                         name="valid_email"),
+        # логин и почта уникальны без учёта регистра среди неудалённых пользователей
+        Index("uq_users_login_lower", "login_lower", unique=True, postgresql_where=text("deleted_at IS NULL")),
+        Index("uq_users_email_lower", "email_lower", unique=True, postgresql_where=text("deleted_at IS NULL")),
     )
 
     id = Column(Integer, primary_key=True)
@@ -51,6 +51,9 @@ class User(TimestampMixin, Base):
     first_name = Column(String(50), nullable=False)
     description = Column(Text)
     password = Column(String(256))
+    # нормализованные логин и почта для поиска по индексу (вычисляются БД, в объекты не загружаются)
+    login_lower = deferred(Column(String(128), Computed("lower(login)", persisted=True)))
+    email_lower = deferred(Column(String(220), Computed("lower(email)", persisted=True)))
 
     role = relationship("Role", back_populates="users")
     # Связи для чатов где пользователь клиент
@@ -167,6 +170,7 @@ class File(TimestampMixin, Base):
     id = Column(Integer, primary_key=True)
     name = Column(Text, nullable=False)
     path = Column(Text, nullable=False)
+    mime_type = Column(String(255), nullable=False, server_default=DEFAULT_MIME_TYPE)
     is_image = Column(
         Boolean,
         nullable=False,
@@ -175,7 +179,27 @@ class File(TimestampMixin, Base):
     )
 
     reviews = relationship("Review", back_populates="file")
+    variants = relationship("FileVariant", back_populates="file", cascade="all, delete-orphan")
+
+
+class FileVariant(TimestampMixin, Base):
+    """Производное (уменьшенное) изображение для файла."""
 
+    __tablename__ = "file_variants"
+    __table_args__ = (
+        Index("ix_file_variants_file_id_kind", "file_id", "kind", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(String(32), nullable=False)  # thumbnail, preview
+    format = Column(String(16), nullable=False)
+    path = Column(Text, nullable=False)
+    width = Column(Integer, nullable=False)
+    height = Column(Integer, nullable=False)
+    size = Column(Integer, nullable=False)
+
+    file = relationship("File", back_populates="variants")
 
 
 # class RolePermission(TimestampMixin, Base):
@@ -238,6 +262,94 @@ class Review(TimestampMixin, Base):
     reviewed = relationship("User", foreign_keys=[reviewed_id], back_populates="reviews_as_reviewed")
 #   order = relationship("Order", back_populates="reviews")
 
+
+class Job(TimestampMixin, Base):
+    """Задача фоновой очереди (см. ``utils.jobs``)."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # индекс только по ожидающим задачам, чтобы выборка воркеров не деградировала от истории
+        Index(
+            "ix_jobs_queue_pending",
+            "queue", text("priority DESC"), "run_at", "id",
+            postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    queue = Column(String(64), nullable=False, server_default="default")
+    task = Column(String(128), nullable=False)
+    payload = Column(JSONB, nullable=False, server_default="{}")
+    priority = Column(Integer, nullable=False, server_default="0")
+    status = Column(String(16), nullable=False, server_default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, server_default="0")
+    max_attempts = Column(Integer, nullable=False, server_default="5")
+    run_at = Column(DateTime, nullable=False, default=fresh_timestamp())
+    locked_at = Column(DateTime)
+    locked_by = Column(String(128))
+    last_error = Column(Text)
+
+
+class NotificationOutbox(TimestampMixin, Base):
+    """
+    Уведомления, ожидающие отправки в сервис уведомлений (transactional outbox).
+
+    Записываются в одной транзакции с бизнес-изменением, отправляются диспетчером
+    (см. ``utils.notifications.dispatcher``). Уведомление, не отправленное за
+    ``NOTIFICATION_MAX_ATTEMPTS`` попыток, помечается ``failed_at``; отправленные и
+    проваленные удаляются через ``NOTIFICATION_RETENTION``.
+    """
+
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index(
+            "ix_notification_outbox_pending",
+            "next_attempt_at", "id",
+            postgresql_where=text("dispatched_at IS NULL AND failed_at IS NULL"),
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True)
+    recipient_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    event_type = Column(String(64), nullable=False)
+    payload = Column(JSONB, nullable=False, server_default="{}")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=False, default=fresh_timestamp())
+    dispatched_at = Column(DateTime)
+    failed_at = Column(DateTime)
+    last_error = Column(Text)
+
+
+class RateLimitBucket(Base):
+    """
+    Состояние token bucket'а для общего между воркерами ограничения частоты запросов
+    (см. ``utils.rate_limit``).
+
+    Таблица нежурналируемая: после сбоя БД счётчики просто начинаются заново.
+    """
+
+    __tablename__ = "rate_limit_buckets"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(Text, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+
+class RevokedToken(Base):
+    """
+    Отозванный JWT (``jti``) или сессия входа целиком (``fam``) (см. ``utils.auth.blocked_jwt``).
+
+    Строка нужна, пока не истекли токены, которые она отзывает, после ``expires_at`` удаляется.
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=fresh_timestamp())
+
+
 # class Notification(Base):
 #     __tablename__ = "notifications"
 
@@ -1,20 +1,56 @@
+import contextlib
+from datetime import datetime, timedelta
+
 import fastapi
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.config import Config
 from core.exceptions import NotAuthorized
-from internal.users.users import user_exists, user_create, get_user
+from internal.users.users import get_login_credentials, user_exists, user_create, get_user_shared
 from models.general import User
 from schemas.users import RegisterUserIn
-from utils.auth.passwwords import verify_password, create_access_token, get_token
+from utils.auth.blocked_jwt import revoke_tokens, utc_timestamp
+from utils.auth.passwwords import create_token_pair, decode_token, get_token, verify_password_async
 from utils.database_connection import db_async_session
+from utils.http_cache import Fingerprint, conditional
+from utils.rate_limit import rate_limit
 
 auth = fastapi.APIRouter()
 
+# refresh токен отправляется только в роуты /user (обновление и выход)
+REFRESH_COOKIE_PATH = "/user"
+
+
+def set_token_cookies(response: fastapi.Response, access_token: str, refresh_token: str) -> None:
+    response.set_cookie(key="access_token", value=access_token, httponly=True)
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token,
+        httponly=True,
+        path=REFRESH_COOKIE_PATH,
+        max_age=Config.refresh_token_alive_hours * 3600,
+    )
+
+
+async def revoke(request: fastapi.Request, session: AsyncSession, token_ids: list[str], expires_at: datetime) -> bool:
+    """
+    Отзыв токенов с commit; в своём воркере отзыв действует сразу, не дожидаясь NOTIFY
+
+    :return: был ли отозван хотя бы один ещё не отозванный токен
+    """
+    revoked = await revoke_tokens(session, token_ids, expires_at)
+    await session.commit()
+    if blocked_jwt := getattr(request.app.state, "blocked_jwt", None):
+        for token_id in revoked:
+            blocked_jwt.add(token_id, utc_timestamp(expires_at))
+    return bool(revoked)
+
 
 @auth.post(
     "/login",
     status_code=201,
+    dependencies=[Depends(rate_limit("login"))],
     responses={409: {"description": "User with specified login or email already exists"}},
 )
 async def login(response: fastapi.Response,
@@ -28,20 +64,52 @@ async def login(response: fastapi.Response,
 
     incorrect_data_exception = NotAuthorized("Неверный логин или пароль")
 
-    user: User = await user_exists(session, login, login, include_deleted=True)
+    # удалённые пользователи не находятся: для них та же ошибка, что и для неверного пароля
+    user = await get_login_credentials(session, login)
 
-    if not user:
+    if (not user) or (not await verify_password_async(password, user.password)):
         raise incorrect_data_exception
+    else:
+        access_token, refresh_token = create_token_pair(user.id, user.login)
+        set_token_cookies(response, access_token, refresh_token)
 
-    user = await user_exists(session, login, login)
+    # без хэша пароля
+    return {"id": user.id, "login": user.login}, access_token
 
-    if (not user) or (not verify_password(password, user.password)):
-        raise incorrect_data_exception
-    else:
-        access_token = create_access_token(data={"login": user.login, "id": user.id})
-        response.set_cookie(key="access_token", value=access_token, httponly=True)
 
-    return user, access_token
+@auth.post("/refresh", status_code=201)
+async def refresh(
+        request: fastapi.Request,
+        response: fastapi.Response,
+        session: AsyncSession = fastapi.Depends(db_async_session),
+):
+    """
+    Новая пара токенов по refresh токену без ввода пароля. Использованный refresh токен отзывается.
+    """
+    token = request.cookies.get("refresh_token")
+    if not token:
+        raise NotAuthorized("Токен не найден")
+    payload = decode_token(token)
+    if payload.get("type") != "refresh":
+        raise NotAuthorized("Недействительный токен")
+
+    # в памяти проверяется только сессия входа: отозванный jti - это повторное использование,
+    # его определяет запись в БД ниже
+    blocked_jwt = getattr(request.app.state, "blocked_jwt", None)
+    if blocked_jwt is not None and blocked_jwt.is_blocked({"fam": payload.get("fam")}):
+        raise NotAuthorized("Токен отозван")
+
+    # проверка по БД: из одновременных обновлений одним токеном проходит одно
+    if not await revoke(request, session, [payload["jti"]], datetime.utcfromtimestamp(payload["exp"])):
+        # повторное использование уже обменянного токена - он мог быть похищен, сессия входа отзывается целиком
+        await revoke(
+            request, session, [payload["fam"]], datetime.utcnow() + timedelta(hours=Config.refresh_token_alive_hours)
+        )
+        raise NotAuthorized("Токен отозван")
+
+    access_token, refresh_token = create_token_pair(payload["id"], payload.get("login"), payload["fam"])
+    set_token_cookies(response, access_token, refresh_token)
+    return {"id": payload["id"], "login": payload.get("login")}, access_token
 
 
 @auth.post(
@@ -73,14 +141,15 @@ async def register(
     responses={409: {"description": "User with specified login or email already exists"}}
 )
 async def user_info(
+        request: fastapi.Request,
+        response: fastapi.Response,
         token: str = Depends(get_token),
-        session: AsyncSession = fastapi.Depends(db_async_session),
         user_id: int = fastapi.Path(..., ge=1),
 ):
     """
     Регистрация в системе.
     """
-    user: User = await get_user(session, user_id)
+    user: User = await get_user_shared(user_id)
 
     if not user:
         raise fastapi.HTTPException(
@@ -89,10 +158,36 @@ async def user_info(
                 "user_id": user_id,
                 "message": "Такой пользователь не найден"},
         )
+    if not_modified := conditional(
+        request, response, Fingerprint.of(user), Config.cache_control_private, resource="user"
+    ):
+        return not_modified
     return user
 
 
 @auth.post("/logout")
-async def logout_user(response: fastapi.Response):
+async def logout_user(
+        request: fastapi.Request,
+        response: fastapi.Response,
+        session: AsyncSession = fastapi.Depends(db_async_session),
+):
+    """
+    Выход: отзываются все токены сессии входа (access и refresh)
+    """
+    sessions = set()
+    for cookie in ("access_token", "refresh_token"):
+        if token := request.cookies.get(cookie):
+            with contextlib.suppress(NotAuthorized):
+                payload = decode_token(token)
+                sessions.add(payload.get("fam") or payload.get("jti"))
+    sessions.discard(None)
+
+    if sessions:
+        # токены сессии, выданные до отзыва, истекают не позже этого времени
+        await revoke(
+            request, session, sorted(sessions), datetime.utcnow() + timedelta(hours=Config.refresh_token_alive_hours)
+        )
+
     response.delete_cookie(key="access_token")
+    response.delete_cookie(key="refresh_token", path=REFRESH_COOKIE_PATH)
     return {'message': 'Пользователь успешно вышел из системы'}
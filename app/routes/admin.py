@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import fastapi
+import orjson
+from fastapi import Depends
+
+from core.config import Config
+from utils.auth.permissions import require_admin
+from utils.profiler import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+admin = fastapi.APIRouter(dependencies=[Depends(require_admin)])
+
+# одновременно в воркере выполняется только одно профилирование
+profile_lock = asyncio.Lock()
+
+
+@admin.get(
+    "/profile",
+    responses={
+        200: {"description": "Collapsed stacks (text/plain) or speedscope profile (application/json)"},
+        409: {"description": "Profiling is already running on this worker"},
+    },
+)
+async def profile_worker(
+        seconds: float = fastapi.Query(10, gt=0, le=Config.profiler_max_duration),
+        hz: int = fastapi.Query(Config.profiler_default_hz, ge=1, le=Config.profiler_max_hz),
+        fmt: str = fastapi.Query("collapsed", enum=["collapsed", "speedscope"]),
+        all_threads: bool = fastapi.Query(False, description="Профилировать все потоки, а не только event loop"),
+):
+    """
+    Профилирование воркера, обработавшего запрос, в течение ``seconds`` секунд.
+
+    Стеки снимаются отдельным потоком с частотой ``hz``, в заголовках ответа возвращается
+    фактическая частота и доля времени, затраченная на сэмплирование.
+    Результат ``collapsed`` открывается в flamegraph.pl и speedscope, ``speedscope`` - в https://www.speedscope.app
+    """
+    if profile_lock.locked():
+        raise fastapi.HTTPException(409, detail="Profiling is already running on this worker")
+
+    async with profile_lock:
+        thread_ids = None if all_threads else {threading.get_ident()}
+        profiler = SamplingProfiler(hz, thread_ids)
+        profile = await asyncio.to_thread(profiler.run, seconds)
+
+    logger.info(
+        "Profiled worker %s for %.1fs: %d samples at %.1f Hz, overhead %.2f%%",
+        os.getpid(), profile.duration, profile.samples, profile.effective_hz, profile.overhead * 100,
+    )
+    headers = {
+        "X-Profile-Pid": str(os.getpid()),
+        "X-Profile-Samples": str(profile.samples),
+        "X-Profile-Hz": f"{profile.effective_hz:.1f}",
+        "X-Profile-Overhead": f"{profile.overhead:.4f}",
+    }
+
+    if fmt == "speedscope":
+        filename = f"profile-{os.getpid()}-{int(time.time())}.speedscope.json"
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        content = orjson.dumps(profile.speedscope(name=f"worker {os.getpid()}"))
+        return fastapi.Response(content, media_type="application/json", headers=headers)
+
+    return fastapi.responses.PlainTextResponse(profile.collapsed(), headers=headers)
@@ -1,14 +1,12 @@
 import fastapi
-import jwt
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core import Config
 from internal.chats import create_chat, get_chat, get_my_chats
 
 from schemas.chats import ChatCreate
 
-from utils.auth.passwwords import get_token
+from utils.auth.passwwords import decode_token, get_token
 from utils.database_connection import db_async_session
 
 chats = fastapi.APIRouter()
@@ -65,6 +63,6 @@ async def get_chat_route(
         token: str = Depends(get_token),
         session: AsyncSession = fastapi.Depends(db_async_session),
 ):
-    token = jwt.decode(token, Config.SECRET_KEY, Config.ALGORITHM)
+    token = decode_token(token)
     res = await get_my_chats(session, token["id"])
     return res
@@ -8,6 +8,7 @@ from schemas.chats import MessageCreate, AssociationsCreate
 
 from utils.auth.passwwords import get_token
 from utils.database_connection import db_async_session
+from utils.rate_limit import rate_limit
 
 message = fastapi.APIRouter()
 
@@ -15,6 +16,7 @@ message = fastapi.APIRouter()
 @message.post(
     "/message/create",
     status_code=201,
+    dependencies=[Depends(rate_limit("message_create"))],
     responses={409: {"description": "User with specified login or email already exists"}}
 )
 async def message_create_route(
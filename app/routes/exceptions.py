@@ -5,12 +5,14 @@ from urllib.request import Request
 import fastapi as fastapi
 
 from fastapi import FastAPI
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from starlette.responses import JSONResponse
 
 from core.config import Config, ConfigError
-from core.exceptions import NotAuthorized
+from core.exceptions import NoPermission, NotAuthorized
 from schemas.core import ErrorSchema
+from utils.query_deadline import QUERY_CANCELLED, is_query_cancelled
+from utils.routing import UNMATCHED_ROUTE
 
 
 def add_exception_handlers(app: FastAPI):
@@ -28,6 +30,13 @@ def add_exception_handlers(app: FastAPI):
         """
         return JSONResponse(ErrorSchema(detail=str(e)).dict(), status_code=401)
 
+    @app.exception_handler(NoPermission)
+    async def no_permission_exception(request: Request, e: NoPermission):
+        """
+        Обработчик для ошибок прав доступа
+        """
+        return JSONResponse(ErrorSchema(detail=str(e)).dict(), status_code=403)
+
     @app.exception_handler(IntegrityError)
     async def exists_exception(request: Request, e: IntegrityError):
         """
@@ -37,6 +46,20 @@ def add_exception_handlers(app: FastAPI):
         logger.error(f"db error {msg}", exc_info=True)
         return fastapi.Response("Internal Server Error", status_code=500)
 
+    @app.exception_handler(DBAPIError)
+    async def query_cancelled_exception(request: Request, e: DBAPIError):
+        """
+        Запрос прерван БД по statement_timeout (SQLSTATE 57014) - 504, остальные ошибки БД - 500
+        """
+        if not is_query_cancelled(e):
+            return await internal_exception(request, e)
+        route = request.scope.get("route")
+        QUERY_CANCELLED.labels(
+            f"{request.method} {route.path if route else UNMATCHED_ROUTE}", "timeout"
+        ).inc()
+        logger.warning(f"db statement timeout {request.method} {request.url.path}")
+        return JSONResponse(ErrorSchema(detail="Database query timed out").dict(), status_code=504)
+
     @app.exception_handler(ConfigError)
     async def config_error_exception(request: Request, e: ConfigError):
         """
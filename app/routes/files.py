@@ -1,16 +1,23 @@
+from typing import Optional
 from uuid import uuid4
 
 import fastapi
 from fastapi import Depends
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from core.exceptions import NotAuthorized
-from internal.files import save_upload_file, save_file_db, get_file
+from core.config import Config
+from internal.files import save_upload_file, save_file_db, get_file, get_file_variant, IMAGE_VARIANTS_TASK, \
+    get_resized_image, get_image_cache, VARIANT_SIZES
+from utils.images import VARIANT_FORMATS
 from internal.users.users import user_exists, user_create, get_user
-from models.general import User
+from models.general import User, File
 from schemas.users import RegisterUserIn
 from utils.auth.passwwords import verify_password, create_access_token, get_token
 from utils.database_connection import db_async_session
+from utils.jobs.queue import enqueue
+from utils.rate_limit import rate_limit
 
 files = fastapi.APIRouter()
 
@@ -18,27 +25,32 @@ files = fastapi.APIRouter()
 @files.post(
     "/create",
     status_code=201,
+    dependencies=[Depends(rate_limit("file_upload"))],
     responses={409: {"description": "User with specified login or email already exists"}}
 )
 async def file_create(
         token: str = Depends(get_token),
         path: str = fastapi.Query('/src', ),
-        is_image: bool = fastapi.Query(True, ),
+        is_image: Optional[bool] = fastapi.Query(None, description="По умолчанию определяется по содержимому"),
         file: fastapi.UploadFile = fastapi.File(..., title="multipart файл"),
         session: AsyncSession = fastapi.Depends(db_async_session),
 ):
     """
     Загружает файл на сервер.
 
-    После загрузки файла его можно получить по id файла
+    После загрузки файла его можно получить по id файла.
+    Для изображений воркер очереди задач создаёт уменьшенные копии (см. ``/files/{file_id}/content?size=``)
     """
 
     if path is None:
         path = "/src"
     path = "/" + path
     file.filename = uuid4().hex
-    path = await save_upload_file(file, path)
-    file = await save_file_db(session, path, file, is_image)
+    saved = await save_upload_file(file, path)
+    file = await save_file_db(session, saved.path, file, is_image, saved.mime_type)
+    if file.is_image:
+        # задача сохраняется в той же транзакции, что и файл
+        await enqueue(session, IMAGE_VARIANTS_TASK, {"file_id": file.id, "path": file.path})
     return file
 
 
@@ -56,3 +68,68 @@ async def get_file_all(
     """
     file = await get_file(session, file_id)
     return file
+
+
+@files.get(
+    "/{file_id}/content",
+    responses={404: {"description": "File or requested size not found"}},
+)
+async def get_file_content(
+        file_id: int = fastapi.Path(..., ge=1),
+        size: str = fastapi.Query("original", enum=["original", *VARIANT_SIZES]),
+        session: AsyncSession = fastapi.Depends(db_async_session),
+):
+    """
+    Скачать файл.
+
+    Для изображений можно запросить уменьшенную копию (``thumbnail``, ``preview``),
+    если она ещё не готова - возвращается 404 и клиент может запросить ``original``.
+    """
+    file = await session.get(File, file_id)
+    if file is None:
+        raise fastapi.HTTPException(404, detail="File not found")
+
+    if size == "original":
+        return FileResponse(file.path, filename=file.name, media_type=file.mime_type)
+
+    variant = await get_file_variant(session, file_id, size)
+    if variant is None:
+        raise fastapi.HTTPException(404, detail="Variant not found")
+    return FileResponse(variant.path, media_type=f"image/{variant.format}")
+
+
+@files.get(
+    "/{file_id}/image",
+    responses={
+        400: {"description": "File is not an image"},
+        404: {"description": "File not found"},
+    },
+)
+async def get_file_image(
+        file_id: int = fastapi.Path(..., ge=1),
+        w: Optional[int] = fastapi.Query(None, ge=1, le=Config.image_resize_max_size),
+        h: Optional[int] = fastapi.Query(None, ge=1, le=Config.image_resize_max_size),
+        fmt: str = fastapi.Query(Config.image_variant_format, enum=list(VARIANT_FORMATS)),
+        session: AsyncSession = fastapi.Depends(db_async_session),
+):
+    """
+    Получить изображение, вписанное в ``w`` x ``h`` (с сохранением пропорций).
+
+    Результаты кэшируются на диске, статистика кэша доступна по ``/files/image-cache/stats``
+    """
+    file = await session.get(File, file_id)
+    if file is None:
+        raise fastapi.HTTPException(404, detail="File not found")
+    if not file.is_image:
+        raise fastapi.HTTPException(400, detail="File is not an image")
+
+    path = await get_resized_image(file, w, h, fmt)
+    return FileResponse(path, media_type=f"image/{fmt}")
+
+
+@files.get("/image-cache/stats")
+async def get_image_cache_stats(token: str = Depends(get_token)):
+    """
+    Статистика дискового кэша изображений текущего воркера.
+    """
+    return get_image_cache().stats()
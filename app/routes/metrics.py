@@ -0,0 +1,13 @@
+import fastapi
+
+from utils.metrics import CONTENT_TYPE, collect
+
+metrics = fastapi.APIRouter()
+
+
+@metrics.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Метрики сервиса в формате Prometheus.
+    """
+    return fastapi.Response(collect(), media_type=CONTENT_TYPE)
@@ -1,11 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 from typing import Optional
 
-from utils.orders import create_order, get_order, get_orders, delete_order, update_order, get_active_orders, get_orders_by_author
+from core.config import Config
+from utils.orders import (
+    create_order,
+    get_order_shared,
+    get_orders,
+    get_orders_fingerprint,
+    delete_order,
+    update_order,
+    get_active_orders,
+    get_active_orders_fingerprint,
+    get_orders_by_author,
+    get_orders_by_author_fingerprint,
+)
 from schemas.order import OrderModel, OrderUpdate
 from utils.database_connection import db_async_session
+from utils.http_cache import Fingerprint, conditional
+from utils.rows import RowsResponse
 
 orders = APIRouter()
 
@@ -17,22 +31,33 @@ async def order_create(
     return await create_order(session=session, order=order)
 
 @orders.get("/by-order/{order_id}")
-async def order_get(
-        order_id: int,
-        session: AsyncSession = Depends(db_async_session)
-    ):
-    return await get_order(session=session, order_id=order_id)
+async def order_get(request: Request, response: Response, order_id: int):
+    order = await get_order_shared(order_id=order_id)
+    if order is not None and (not_modified := conditional(
+        request, response, Fingerprint.of(order), Config.cache_control_items, resource="order"
+    )):
+        return not_modified
+    return order
 
 @orders.get("/orders")
 async def get_order_list(
+        request: Request,
+        response: Response,
         session: AsyncSession = Depends(db_async_session),
         skip: int = 0,
         limit: int = 10
     ):
-    return await get_orders(session=session, skip=skip, limit=limit)
+    if not_modified := conditional(
+        request, response, await get_orders_fingerprint(session), Config.cache_control_lists,
+        skip, limit, resource="orders",
+    ):
+        return not_modified
+    return RowsResponse(await get_orders(session=session, skip=skip, limit=limit), headers=response.headers)
 
 @orders.get("/active")
 async def get_active_orders_route(
+    request: Request,
+    response: Response,
     category_id: Optional[int] = None,
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
@@ -42,22 +67,34 @@ async def get_active_orders_route(
     limit: int = Query(10, le=100),
     session: AsyncSession = Depends(db_async_session)
 ):
-    return await get_active_orders(
-        session=session,
+    filters = dict(
         category_id=category_id,
         min_price=min_price,
         max_price=max_price,
         deadline_from=deadline_from,
         deadline_to=deadline_to,
-        skip=skip,
-        limit=limit
+    )
+    if not_modified := conditional(
+        request, response, await get_active_orders_fingerprint(session, **filters), Config.cache_control_lists,
+        *filters.values(), skip, limit, resource="active_orders",
+    ):
+        return not_modified
+    return RowsResponse(
+        await get_active_orders(session=session, **filters, skip=skip, limit=limit), headers=response.headers
     )
 
 @orders.get("/by-author/{author_id}")
 async def get_order_list_active(
+        request: Request,
+        response: Response,
         author_id: int,
         session: AsyncSession = Depends(db_async_session),
     ):
+    author_fingerprint = await get_orders_by_author_fingerprint(session, author_id)
+    if author_fingerprint.count and (not_modified := conditional(
+        request, response, author_fingerprint, Config.cache_control_lists, resource="orders_by_author"
+    )):
+        return not_modified
     orders = await get_orders_by_author(session, author_id)
     if not orders:
         raise HTTPException(
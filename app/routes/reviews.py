@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core.config import Config
 from schemas.review import ReviewModel, ReviewBase
 from utils.review import ( 
     create_review, 
     get_review, 
+    get_review_shared,
     get_reviews_by_reviewed_user,
+    get_reviews_by_reviewed_user_fingerprint,
     update_review as update_review_db,
     delete_review as delete_review_db
 )
 from utils.database_connection import db_async_session
+from utils.http_cache import Fingerprint, conditional
+from utils.rows import RowsResponse
 
 reviews = APIRouter()
 
@@ -21,23 +26,33 @@ async def review_create(
     return await create_review(session=session, review=review)
 
 @reviews.get("/{review_id}")
-async def read_review(
-    review_id: int,
-    session: AsyncSession = Depends(db_async_session)
-):
-    session_review = await get_review(session, review_id=review_id)
+async def read_review(request: Request, response: Response, review_id: int):
+    session_review = await get_review_shared(review_id=review_id)
     if session_review is None:
         raise HTTPException(status_code=404, detail="Review not found")
+    if not_modified := conditional(
+        request, response, Fingerprint.of(session_review), Config.cache_control_items, resource="review"
+    ):
+        return not_modified
     return session_review
 
 @reviews.get("/user/{user_id}")
 async def read_reviews_for_user(
+    request: Request,
+    response: Response,
     user_id: int,
     session: AsyncSession = Depends(db_async_session),
     skip: int = 0,
     limit: int = 10
 ):
-    return await get_reviews_by_reviewed_user(session, user_id=user_id, skip=skip, limit=limit)
+    if not_modified := conditional(
+        request, response, await get_reviews_by_reviewed_user_fingerprint(session, user_id),
+        Config.cache_control_lists, skip, limit, resource="user_reviews",
+    ):
+        return not_modified
+    return RowsResponse(
+        await get_reviews_by_reviewed_user(session, user_id=user_id, skip=skip, limit=limit), headers=response.headers
+    )
 
 @reviews.put("/{review_id}")
 async def update_review(
@@ -1,4 +1,49 @@
+"""
+Запуск API.
+
+Параметры сервера (количество воркеров, event loop, backlog, keep-alive, время на завершение
+запросов после SIGTERM) берутся из ``ServerConfig``. В режиме отладки (``DEBUG_MODE``) запускается
+один воркер с перезагрузкой при изменении кода.
+"""
+import logging
+
 import uvicorn
 
+from core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    options = dict(
+        host=Config.host,
+        port=Config.port,
+        proxy_headers=True,
+        forwarded_allow_ips=Config.server_forwarded_allow_ips,
+        access_log=Config.server_access_log,
+    )
+
+    if Config.debug_mode:
+        uvicorn.run("main:create_app", factory=True, reload=True, **options)
+        return
+
+    if Config.server_workers > 1 and not Config.metrics_multiproc_dir:
+        logger.warning("METRICS_MULTIPROC_DIR is not set, /metrics will show a single worker")
+
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        workers=Config.server_workers,
+        loop=Config.server_loop,
+        http=Config.server_http,
+        backlog=Config.server_backlog,
+        timeout_keep_alive=Config.server_keep_alive,
+        # после SIGTERM uvicorn перестаёт принимать соединения, закрывает простаивающие keep-alive
+        # соединения и ждёт выполняющиеся запросы, после чего выполняется shutdown lifespan'а
+        timeout_graceful_shutdown=Config.server_graceful_timeout,
+        **options,
+    )
+
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    main()
@@ -0,0 +1,32 @@
+import asyncio
+import signal
+
+import internal.files  # noqa: F401 - регистрация задач
+from core.config import Config, NotificationServiceConfig
+from utils.jobs.worker import JobWorker
+from utils.log_config import set_logging
+from utils.notifications.dispatcher import NotificationDispatcher
+
+
+async def main():
+    services = [JobWorker()]
+    if NotificationServiceConfig.notification_service_url:
+        services.append(NotificationDispatcher())
+
+    def stop():
+        for service in services:
+            service.stop()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop)
+
+    try:
+        await asyncio.gather(*(service.run() for service in services))
+    finally:
+        internal.files.image_executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    set_logging(level=Config.log_level, enable_additional_debug=Config.additional_debug)
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 import datetime
+from dataclasses import dataclass
 from typing import Optional
 
 import pydantic
@@ -42,3 +43,18 @@ class MessageCreate(Model):
 class GetAllChats(Model):
     last_message: dict
     chat_association: dict
+
+
+@dataclass(slots=True)
+class MessageRow:
+    """
+    Сообщение в истории чата (чтение без ORM, см. ``utils.rows``)
+    """
+    id: int
+    author_id: int
+    chat_id: int
+    text: Optional[str]
+    file_id: Optional[int]
+    created_at: Optional[datetime.datetime]
+    updated_at: Optional[datetime.datetime]
+    deleted_at: Optional[datetime.datetime]
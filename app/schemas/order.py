@@ -1,3 +1,6 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
 from schemas.core import Model
 from typing import Optional
 from datetime import datetime
@@ -22,4 +25,23 @@ class OrderUpdate(Model):
     description: Optional[str] = None
     start_price: Optional[float] = None
     category_id: Optional[int] = None
-    status_id: Optional[int] = None
\ No newline at end of file
+    status_id: Optional[int] = None
+
+
+@dataclass(slots=True)
+class OrderRow:
+    """
+    Заказ в списках (чтение без ORM, см. ``utils.rows``)
+    """
+    id: int
+    name: str
+    description: Optional[str]
+    author_id: int
+    category_id: int
+    start_price: Optional[Decimal]
+    expected_price: Optional[Decimal]
+    status_id: int
+    deadline: Optional[datetime]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    deleted_at: Optional[datetime]
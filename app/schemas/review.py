@@ -1,3 +1,5 @@
+from dataclasses import dataclass
+
 from schemas.core import Model
 from datetime import datetime
 from typing import Optional
@@ -12,4 +14,20 @@ class ReviewModel(ReviewBase):
     rating: int
     reviewer_id: int
     reviewed_id: int
-    created_at: datetime
\ No newline at end of file
+    created_at: datetime
+
+
+@dataclass(slots=True)
+class ReviewRow:
+    """
+    Отзыв в списках (чтение без ORM, см. ``utils.rows``)
+    """
+    id: int
+    rating: int
+    file_id: Optional[int]
+    comment: Optional[str]
+    reviewer_id: int
+    reviewed_id: int
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    deleted_at: Optional[datetime]
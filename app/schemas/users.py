@@ -1,3 +1,5 @@
+from typing import NamedTuple, Optional
+
 import pydantic
 
 from schemas.core import Model
@@ -12,4 +14,10 @@ class RegisterUserIn(Model):
     role_id: int
 
 
-
+class UserCredentials(NamedTuple):
+    """
+    Данные неудалённого пользователя для проверки пароля при входе
+    """
+    id: int
+    login: Optional[str]
+    password: Optional[str]
@@ -0,0 +1,174 @@
+"""
+Ограничение одновременно выполняемых запросов к дорогим роутам (admission control).
+
+Для каждого ограниченного роута задаются: количество одновременно выполняемых запросов,
+размер очереди ожидания и максимальное время ожидания в очереди. Запрос отклоняется сразу
+(без ожидания), если очередь заполнена или если по среднему времени обработки роута ожидание
+заведомо превысит допустимое. Так дорогие роуты при всплеске нагрузки не занимают все соединения
+с БД и воркеры, а дешёвые продолжают отвечать быстро.
+"""
+import asyncio
+import math
+from collections import deque
+from typing import NamedTuple, Optional
+
+from starlette.responses import JSONResponse
+from starlette.routing import Router
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.metrics import Counter, Gauge, Histogram
+from utils.routing import RouteResolver
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total", "Requests rejected by admission control", ("route", "reason")
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queued_requests", "Requests waiting for a free route slot", ("route",)
+)
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds",
+    "Time spent waiting for a free route slot",
+    ("route",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# вес нового замера в скользящем среднем времени обработки
+SERVICE_TIME_ALPHA = 0.2
+
+
+class RouteLimit(NamedTuple):
+    """
+    :param concurrency: одновременно выполняемых запросов
+    :param max_queue: запросов, ожидающих свободного места
+    :param deadline: максимальное время ожидания в очереди (секунды)
+    """
+
+    concurrency: int
+    max_queue: int
+    deadline: float
+
+
+class Rejected(Exception):  # noqa: N818
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteLimiter:
+    """Семафор с ограниченной очередью ожидания и оценкой времени ожидания."""
+
+    def __init__(self, limit: RouteLimit):
+        self.limit = limit
+        self.active = 0
+        self.service_time: Optional[float] = None
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self) -> float:
+        """Ожидаемое время ожидания нового запроса по среднему времени обработки."""
+        if self.service_time is None:
+            return 0.0
+        return (self.queued + 1) * self.service_time / self.limit.concurrency
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(min(self.estimated_wait(), self.limit.deadline)))
+
+    async def acquire(self) -> None:
+        if self.active < self.limit.concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        if self.queued >= self.limit.max_queue:
+            raise Rejected("queue_full", self.retry_after())
+        if self.estimated_wait() > self.limit.deadline:
+            raise Rejected("deadline", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, self.limit.deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # место уже было передано этому запросу - возвращаем его следующему
+                self.release()
+            else:
+                self._remove_waiter(future)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise Rejected("timeout", self.retry_after()) from None
+
+    def _remove_waiter(self, future: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def release(self, service_time: Optional[float] = None) -> None:
+        if service_time is not None:
+            self.service_time = service_time if self.service_time is None else (
+                SERVICE_TIME_ALPHA * service_time + (1 - SERVICE_TIME_ALPHA) * self.service_time
+            )
+
+        self.active -= 1
+        # место передаётся первому ожидающему напрямую, новые запросы не могут его перехватить
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+                break
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware с ограничением конкурентности по роутам.
+
+    :param limits: ограничения по роутам, ключ - ``"METHOD /path/{template}"``
+    :param reject_status: код ответа для отклонённых запросов (503 или 429)
+    """
+
+    def __init__(self, app: ASGIApp, router: Router, limits: dict[str, RouteLimit], reject_status: int = 503):
+        self.app = app
+        self.resolve_route = RouteResolver(router)
+        self.limiters = {route: RouteLimiter(limit) for route, limit in limits.items()}
+        self.reject_status = reject_status
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.limiters:
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {self.resolve_route(scope)}"
+        limiter = self.limiters.get(route)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        queued = ADMISSION_QUEUED.labels(route)
+        started = loop.time()
+        queued.inc()
+        try:
+            await limiter.acquire()
+        except Rejected as e:
+            ADMISSION_REJECTED.labels(route, e.reason).inc()
+            response = JSONResponse(
+                {"detail": "Service is overloaded, retry later"},
+                status_code=self.reject_status,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        finally:
+            queued.dec()
+
+        admitted = loop.time()
+        ADMISSION_WAIT.labels(route).observe(admitted - started)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(loop.time() - admitted)
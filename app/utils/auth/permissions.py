@@ -0,0 +1,33 @@
+import hmac
+
+import fastapi
+from sqlalchemy import select
+
+from core import Config
+from core.exceptions import NoPermission
+from models import Role, User
+from utils.auth.passwwords import decode_token, get_token
+from utils.database_connection import db_async_session_manager
+
+
+async def require_admin(token: str = fastapi.Depends(get_token)) -> None:
+    """
+    Зависимость для служебных роутов: пропускает только пользователей с ролью ``admin_role``
+    или запросы со служебным токеном ``test_token``
+
+    Сессия открывается только на время проверки роли и не удерживает соединение,
+    пока выполняется роут (например, профилирование).
+    """
+    if Config.test_token and hmac.compare_digest(token, Config.test_token):
+        return
+
+    payload = decode_token(token)
+    query = (
+        select(Role.name)
+        .join(User, User.role_id == Role.id)
+        .where(User.id == payload.get("id"), User.deleted_at.is_(None))
+    )
+    async with db_async_session_manager() as session:
+        role = (await session.execute(query)).scalar_one_or_none()
+    if role != Config.admin_role:
+        raise NoPermission("Недостаточно прав")
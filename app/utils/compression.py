@@ -0,0 +1,343 @@
+"""
+Сжатие ответов с выбором кодировки по ``Accept-Encoding`` (zstd, brotli, gzip).
+
+Сжимаются только текстовые ответы (JSON, текст, XML) не меньше ``min_size`` байт. Файлы картинок,
+архивов и документов уже сжаты - повторное сжатие тратит CPU без выигрыша в размере.
+Потоковые ответы (``StreamingResponse``) сжимаются по частям: каждая часть сбрасывается
+кодировщиком сразу, клиент получает данные без задержки до конца ответа.
+
+zstd и brotli - необязательные зависимости (``zstandard``, ``brotli``), при их отсутствии
+кодировка не предлагается. Контексты zstd переиспользуются через ограниченный пул:
+создание контекста дороже сжатия типичного JSON ответа.
+"""
+import gzip
+import zlib
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Optional, Protocol
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.metrics import Counter
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total", "Response bytes before and after compression", ("encoding", "stage")
+)
+
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+})
+# ответы без тела или с частью тела
+UNCOMPRESSED_STATUSES = frozenset({204, 206, 304})
+
+
+class StreamCompressor(Protocol):
+    def compress(self, data: bytes) -> bytes:
+        """Сжатие части ответа со сбросом буфера кодировщика."""
+
+    def finish(self) -> bytes:
+        """Завершение потока."""
+
+
+class Encoder(Protocol):
+    name: str
+
+    def compress(self, data: bytes) -> bytes:
+        """Сжатие ответа целиком."""
+
+    def stream(self) -> StreamCompressor:
+        """Кодировщик потокового ответа."""
+
+
+class CompressorPool:
+    """
+    Ограниченный пул переиспользуемых кодировщиков.
+
+    Пустой пул создаёт новый кодировщик, лишние при возврате отбрасываются - пул не ограничивает
+    конкурентность, только количество хранимых между запросами объектов.
+    """
+
+    def __init__(self, factory: Callable[[], object], size: int):
+        self.factory = factory
+        self.size = size
+        self._idle: deque = deque()
+
+    def acquire(self) -> object:
+        try:
+            return self._idle.pop()
+        except IndexError:
+            return self.factory()
+
+    def release(self, compressor: object) -> None:
+        if len(self._idle) < self.size:
+            self._idle.append(compressor)
+
+
+class _GzipStream:
+    __slots__ = ("_compressor",)
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int = 5):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return gzip.compress(data, self.level, mtime=0)
+
+    def stream(self) -> _GzipStream:
+        return _GzipStream(self.level)
+
+
+class _BrotliStream:
+    __slots__ = ("_compressor",)
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int = 4):
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self) -> _BrotliStream:
+        return _BrotliStream(self.quality)
+
+
+class _ZstdStream:
+    __slots__ = ("_pool", "_context", "_compressor")
+
+    def __init__(self, pool: CompressorPool):
+        self._pool = pool
+        self._context = pool.acquire()
+        self._compressor = self._context.compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        data = self._compressor.flush()
+        # незавершённый поток (разрыв соединения) контекст в пул не возвращает
+        self._pool.release(self._context)
+        return data
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level: int = 3, pool_size: int = 32):
+        self.pool = CompressorPool(lambda: zstandard.ZstdCompressor(level=level), pool_size)
+
+    def compress(self, data: bytes) -> bytes:
+        context = self.pool.acquire()
+        try:
+            return context.compress(data)
+        finally:
+            self.pool.release(context)
+
+    def stream(self) -> _ZstdStream:
+        return _ZstdStream(self.pool)
+
+
+def available_encoders(
+        names: list[str], gzip_level: int = 5, brotli_quality: int = 4, zstd_level: int = 3, pool_size: int = 32
+) -> list[Encoder]:
+    """Кодировщики в порядке предпочтения, необязательные зависимости которых установлены."""
+    encoders = []
+    for name in names:
+        if name == "zstd" and zstandard is not None:
+            encoders.append(ZstdEncoder(zstd_level, pool_size))
+        elif name == "br" and brotli is not None:
+            encoders.append(BrotliEncoder(brotli_quality))
+        elif name == "gzip":
+            encoders.append(GzipEncoder(gzip_level))
+    return encoders
+
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str, preference: tuple[str, ...]) -> Optional[str]:
+    """
+    Кодировка для ``Accept-Encoding`` клиента.
+
+    Выбирается кодировка с наибольшим ``q``, при равных - первая в порядке предпочтения сервера.
+    """
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    default = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for name in preference:
+        weight = weights.get(name, default)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class _Responder:
+    """Обработка сообщений одного ответа."""
+
+    def __init__(self, send: Send, encoder: Optional[Encoder], min_size: int):
+        self.send = send
+        self.encoder = encoder
+        self.min_size = min_size
+        self.start: Optional[Message] = None
+        self.stream: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message) -> None:
+        if self.passthrough:
+            await self.send(message)
+        elif message["type"] == "http.response.start":
+            # заголовки отправляются вместе с первой частью тела, когда известен её размер
+            self.start = message
+        elif message["type"] != "http.response.body":
+            self.passthrough = True
+            if self.start is not None:
+                await self.send(self.start)
+            await self.send(message)
+        elif self.start is not None:
+            await self.first_body(self.start, message)
+            self.start = None
+        else:
+            await self.next_body(message)
+
+    def should_compress(self, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if self.encoder is None or "content-encoding" in headers:
+            return False
+        if more_body:
+            content_length = headers.get("content-length")
+            return content_length is None or int(content_length) >= self.min_size
+        return len(body) >= self.min_size
+
+    async def first_body(self, start: Message, message: Message) -> None:
+        headers = MutableHeaders(scope=start)
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        compressible = (
+            start["status"] not in UNCOMPRESSED_STATUSES and is_compressible(headers.get("content-type", ""))
+        )
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        if not compressible or not self.should_compress(headers, body, more_body):
+            self.passthrough = True
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers["Content-Encoding"] = self.encoder.name
+        # сжатый ответ побайтно отличается от исходного
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+        if more_body:
+            self.stream = self.encoder.stream()
+            if "content-length" in headers:
+                del headers["content-length"]
+            data = self.stream.compress(body)
+        else:
+            data = self.encoder.compress(body)
+            headers["Content-Length"] = str(len(data))
+
+        self.count(body, data)
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def next_body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        data = self.stream.compress(body) if body else b""
+        if not more_body:
+            data += self.stream.finish()
+        self.count(body, data)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def count(self, body: bytes, data: bytes) -> None:
+        COMPRESSION_BYTES.labels(self.encoder.name, "in").inc(len(body))
+        COMPRESSION_BYTES.labels(self.encoder.name, "out").inc(len(data))
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware сжатия ответов.
+
+    :param encoders: кодировщики в порядке предпочтения сервера
+    :param min_size: ответы меньше этого размера (байт) не сжимаются
+    """
+
+    def __init__(self, app: ASGIApp, encoders: list[Encoder], min_size: int = 1024):
+        self.app = app
+        self.encoders = {encoder.name: encoder for encoder in encoders}
+        self.preference = tuple(self.encoders)
+        self.min_size = min_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"accept-encoding"), ""
+        )
+        encoding = negotiate(accept_encoding, self.preference) if accept_encoding else None
+        # Vary проставляется и без сжатия, поэтому ответ обрабатывается даже без подходящей кодировки
+        responder = _Responder(send, self.encoders.get(encoding), self.min_size)
+        await self.app(scope, receive, responder)
@@ -1,10 +1,41 @@
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
 from core.config import Config
 
-from utils.factory import async_session_factory
+from utils.factory import asyncpg_connect_args, lazy_async_session_factory
 from utils.json_serialization import dumps
 
-engine_params = dict(json_serializer=dumps)
+engine_params = dict(
+    json_serializer=dumps,
+    echo=Config.db_echo,
+    connect_args=asyncpg_connect_args(
+        statement_cache_size=Config.db_statement_cache_size,
+        pgbouncer=Config.db_pgbouncer,
+        statement_timeout=Config.db_statement_timeout,
+        application_name=Config.db_application_name,
+    ),
+)
+
+if Config.db_pool_size > 0:
+    engine_params.update(
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=Config.db_pool_size,
+        max_overflow=Config.db_max_overflow,
+        pool_timeout=Config.db_pool_timeout,
+        pool_recycle=Config.db_pool_recycle,
+        pool_pre_ping=Config.db_pool_pre_ping,
+    )
+else:
+    engine_params.update(poolclass=NullPool)
 
-db_async_session, db_async_session_manager, async_engine = async_session_factory(
-    Config.async_db_conn_str, **engine_params, echo=True
+# движок создаётся при первой сессии или вызове get_async_engine(), а не при импорте модуля
+db_async_session, db_async_session_manager, get_async_engine = lazy_async_session_factory(
+    Config.async_db_conn_str, **engine_params
 )
+
+
+def __getattr__(name: str):
+    # совместимость с ``from utils.database_connection import async_engine``
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
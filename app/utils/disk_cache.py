@@ -0,0 +1,164 @@
+"""
+Дисковый кэш с ограничением по размеру и вытеснением давно неиспользуемых (LRU) записей.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+
+class _LeaderCancelled(Exception):
+    """Запрос, вычислявший значение, отменён: ожидающий повторяет попытку сам."""
+
+
+class DiskLRUCache:
+    """
+    Кэш файлов в директории с ограничением суммарного размера.
+
+    Индекс (ключ -> размер) и ограничение размера действуют в рамках одного воркера,
+    поэтому при нескольких воркерах стоит выделять каждому свою директорию.
+    Индекс хранится в памяти в порядке последнего обращения и
+    восстанавливается из директории при создании (по времени модификации файлов).
+    Конкурентные запросы одного и того же ключа дедуплицируются (single-flight):
+    значение вычисляется один раз, остальные ожидают его результат.
+
+    Временные файлы (``*.tmp``) могут остаться от прерванных записей, например когда процесс
+    пула дописывает файл после отмены запроса. Файлы старше ``tmp_max_age`` секунд удаляются
+    при создании кэша и при вытеснении (не чаще раза в ``tmp_max_age``).
+    """
+
+    def __init__(self, directory: str, max_bytes: int, tmp_max_age: float = 600.0):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.tmp_max_age = tmp_max_age
+        self._swept_at = 0.0
+        self.current_bytes = 0
+        self._index: OrderedDict[str, int] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+        self._load()
+
+    def _load(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._sweep_tmp()
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith(".tmp")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            size = entry.stat().st_size
+            self._index[entry.name] = size
+            self.current_bytes += size
+        self._evict()
+
+    @staticmethod
+    def _file_name(key: str) -> str:
+        suffix = Path(key).suffix
+        return hashlib.sha1(key.encode()).hexdigest() + suffix
+
+    def _path(self, name: str) -> Path:
+        return self.directory / name
+
+    def _sweep_tmp(self) -> None:
+        now = time.time()
+        self._swept_at = now
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".tmp"):
+                continue
+            try:
+                if now - entry.stat().st_mtime > self.tmp_max_age:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        # последнюю (только что добавленную) запись не вытесняем, даже если она больше лимита
+        evicted = False
+        while self.current_bytes > self.max_bytes and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+            self.evicted_bytes += size
+            self._path(name).unlink(missing_ok=True)
+            evicted = True
+        if evicted and time.time() - self._swept_at > self.tmp_max_age:
+            self._sweep_tmp()
+
+    async def get_or_create(self, key: str, create: Callable[[str], Awaitable[None]]) -> Path:
+        """
+        Возвращает путь к закэшированному файлу, создавая его при необходимости.
+
+        :param key: ключ записи, расширение ключа сохраняется в имени файла
+        :param create: корутина, записывающая значение по переданному (временному) пути
+        """
+        name = self._file_name(key)
+        path = self._path(name)
+
+        while True:
+            if name in self._index:
+                if path.exists():
+                    self.hits += 1
+                    self._index.move_to_end(name)
+                    return path
+                self.current_bytes -= self._index.pop(name)
+
+            future = self._in_flight.get(name)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _LeaderCancelled:
+                # вычислявший запрос отменён, значение вычисляет один из ожидающих
+                self.coalesced -= 1
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[name] = future
+        tmp_path = path.with_name(f"{name}.{os.getpid()}.tmp")
+        try:
+            await create(str(tmp_path))
+            os.replace(tmp_path, path)
+            size = path.stat().st_size
+            self._index[name] = size
+            self.current_bytes += size
+            self._evict()
+            future.set_result(path)
+            return path
+        except asyncio.CancelledError:
+            tmp_path.unlink(missing_ok=True)
+            # отмена относится только к этому запросу, ожидающие не отменяются
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            future.set_exception(e)
+            # исключение уже передано ожидающим, повторно не логируем его как "never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[name]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._index),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+        }
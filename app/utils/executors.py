@@ -0,0 +1,65 @@
+"""
+Пулы для выполнения тяжёлой синхронной работы вне event loop'а.
+"""
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+class BoundedExecutor:
+    """
+    Обёртка над ``concurrent.futures`` пулом с ограничением очереди.
+
+    Пул создаётся лениво при первой задаче (процессы не порождаются при импорте модуля),
+    а количество задач, ожидающих выполнения, ограничено ``max_pending`` - при переполнении
+    новые задачи ждут на семафоре, а не копятся в памяти пула.
+    """
+
+    def __init__(self, executor_factory: Callable[[int], Executor], max_workers: int, max_pending: int):
+        self._executor_factory = executor_factory
+        self._executor: Optional[Executor] = None
+        self.max_workers = max_workers
+        self._max_pending = max_pending
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.pending = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = self._executor_factory(self.max_workers)
+        return self._executor
+
+    @property
+    def queued(self) -> int:
+        """Количество задач, ожидающих свободного исполнителя."""
+        return max(0, self.pending - self.max_workers)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет ``fn(*args)`` в пуле и дожидается результата."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_pending)
+
+        self.pending += 1
+        try:
+            async with self._semaphore:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает пул; следующая задача создаст новый (в том числе в другом event loop)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+        # семафор привязан к event loop, в котором использовался
+        self._semaphore = None
+
+
+def process_pool(max_workers: int, max_pending: int) -> BoundedExecutor:
+    """Ограниченный пул процессов для CPU-bound задач."""
+    return BoundedExecutor(ProcessPoolExecutor, max_workers, max_pending)
+
+
+def thread_pool(max_workers: int, max_pending: int) -> BoundedExecutor:
+    """Ограниченный пул потоков для задач, отпускающих GIL (хэширование, сжатие и т.п.)."""
+    return BoundedExecutor(ThreadPoolExecutor, max_workers, max_pending)
@@ -1,13 +1,20 @@
+import asyncio
 import contextlib
+import functools
+import inspect
+import logging
+import uuid
 from contextvars import ContextVar
 from typing import Tuple, Callable, ContextManager, Generator, AsyncGenerator, AsyncContextManager, Union
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import NullPool
 
+logger = logging.getLogger(__name__)
+
 session_context: ContextVar[Union[AsyncSession, Session]] = ContextVar("session_context")
 
 async_engine_default_params = {"poolclass": NullPool}
@@ -24,16 +31,41 @@ def async_session_factory(
     :return: генератор для использования в fastapi.Depends, контекстный менеджер
              бд для использования в любом ином месте, AsyncEngine для низкоуровнего взаимодействия
     """
+    get_async_session, session_manager, get_engine = lazy_async_session_factory(
+        async_connection_string, **engine_params
+    )
+    return get_async_session, session_manager, get_engine()
+
+
+def lazy_async_session_factory(
+    async_connection_string, **engine_params
+) -> Tuple[
+    AsyncGenerator[AsyncSession, None], Callable[[], AsyncContextManager[AsyncSession]], Callable[[], AsyncEngine]
+]:
+    """
+    То же, что ``async_session_factory``, но AsyncEngine (вместе с импортом драйвера БД) создаётся
+    при первой сессии или первом вызове возвращаемой функции, а не при создании фабрики
+
+    :return: генератор для использования в fastapi.Depends, контекстный менеджер
+             бд для использования в любом ином месте, функция, возвращающая AsyncEngine
+    """
     params = async_engine_default_params.copy()
     params.update(engine_params)
+    state = {}
 
-    engine = create_async_engine(async_connection_string, **params)
-    # noinspection PyTypeChecker
-    maker = sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+    def get_engine() -> AsyncEngine:
+        if "engine" not in state:
+            engine = create_async_engine(async_connection_string, **params)
+            # noinspection PyTypeChecker
+            state["maker"] = sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession)
+            state["engine"] = engine
+        return state["engine"]
 
     async def get_async_session() -> AsyncSession:
+        if "maker" not in state:
+            get_engine()
         try:
-            sess: AsyncSession = maker()
+            sess: AsyncSession = state["maker"]()
             session_context.set(sess)
             yield sess
         except Exception as e:
@@ -43,7 +75,89 @@ def async_session_factory(
             await sess.commit()
             await sess.close()
 
-    return get_async_session, contextlib.asynccontextmanager(get_async_session), engine
+    return get_async_session, contextlib.asynccontextmanager(get_async_session), get_engine
+
+
+def asyncpg_supports_statement_names() -> bool:
+    """Поддерживает ли asyncpg диалект SQLAlchemy ``prepared_statement_name_func`` (добавлен в 2.0)."""
+    from sqlalchemy.dialects.postgresql.asyncpg import AsyncAdapt_asyncpg_connection
+
+    return "prepared_statement_name_func" in inspect.signature(AsyncAdapt_asyncpg_connection.__init__).parameters
+
+
+@functools.cache
+def pgbouncer_connection_class() -> type:
+    """
+    Соединение asyncpg с уникальными (uuid) именами подготовленных запросов.
+
+    asyncpg именует запросы счётчиком процесса (``__asyncpg_stmt_1__``), поэтому за PgBouncer
+    в режиме transaction запросы разных воркеров на одном соединении сервера получают
+    одинаковые имена ("prepared statement already exists"). Используется, если диалект
+    SQLAlchemy не поддерживает ``prepared_statement_name_func`` (1.4).
+    """
+    import asyncpg
+
+    class PgBouncerConnection(asyncpg.Connection):
+        def _get_unique_id(self, prefix: str) -> str:
+            return f"__asyncpg_{prefix}_{uuid.uuid4()}__"
+
+    return PgBouncerConnection
+
+
+def asyncpg_connect_args(
+    statement_cache_size: int = 100,
+    pgbouncer: bool = False,
+    statement_timeout: int = 0,
+    application_name: str = "",
+) -> dict:
+    """
+    ``connect_args`` для движка с драйвером asyncpg.
+
+    :param statement_cache_size: размер кэша подготовленных запросов на соединение (SQLAlchemy и asyncpg)
+    :param pgbouncer: режим для PgBouncer в режиме transaction: без кэша подготовленных запросов
+        и с уникальными именами запросов, т.к. соседние транзакции клиента попадают на разные
+        соединения сервера
+    :param statement_timeout: ``statement_timeout`` сессии (мс), 0 - настройка сервера
+    :param application_name: имя приложения в ``pg_stat_activity``
+    """
+    server_settings = {}
+    if application_name:
+        server_settings["application_name"] = application_name
+    if statement_timeout:
+        if pgbouncer:
+            # PgBouncer отклоняет параметры запуска, не перечисленные в ignore_startup_parameters
+            logger.warning("statement_timeout is not sent as a startup parameter in PgBouncer mode")
+        else:
+            server_settings["statement_timeout"] = str(statement_timeout)
+
+    connect_args = {
+        "server_settings": server_settings,
+        "prepared_statement_cache_size": statement_cache_size,
+        "statement_cache_size": statement_cache_size,
+    }
+    if pgbouncer:
+        connect_args["prepared_statement_cache_size"] = 0
+        connect_args["statement_cache_size"] = 0
+        if asyncpg_supports_statement_names():
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+        else:
+            connect_args["connection_class"] = pgbouncer_connection_class()
+    return connect_args
+
+
+async def warmup_async_engine(engine: AsyncEngine, connections: int) -> None:
+    """
+    Открывает ``connections`` соединений пула одновременно и проверяет их запросом.
+
+    Соединения возвращаются в пул, поэтому первые запросы после старта не ждут установки
+    соединений (TCP, TLS, аутентификация), а недоступная БД обнаруживается до приёма запросов.
+    """
+
+    async def ping() -> None:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
 
 
 def session_factory(
@@ -0,0 +1,132 @@
+"""
+Условные HTTP запросы (ETag / Last-Modified).
+
+Для списков отпечаток данных считается одним агрегатным запросом (количество строк, максимальный id,
+время последнего изменения) по тем же условиям, что и сам список, но без загрузки строк. Для
+отдельных объектов отпечаток берётся из самого объекта. Если отпечаток совпал с ``If-None-Match``
+клиента, возвращается 304 без загрузки и сериализации строк.
+
+ETag слабый (``W/"..."``): ответ сравнивается по смыслу, а не побайтно, поэтому он остаётся
+корректным и после сжатия ответа.
+"""
+import datetime
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, NamedTuple, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.metrics import Counter
+
+HTTP_NOT_MODIFIED = Counter(
+    "http_not_modified_total", "Conditional requests answered with 304", ("resource",)
+)
+
+
+class Fingerprint(NamedTuple):
+    """
+    :param single: отпечаток одного объекта. Удаление строки из списка не меняет время последнего
+        изменения, поэтому ``Last-Modified`` отдаётся и проверяется только для отдельных объектов,
+        списки проверяются только по ETag (в нём учтено количество строк)
+    """
+
+    count: int
+    max_id: Optional[int]
+    last_modified: Optional[datetime.datetime]
+    single: bool = False
+
+    @classmethod
+    def of(cls, obj: Any) -> "Fingerprint":
+        """Отпечаток одного объекта модели с ``TimestampMixin``."""
+        return cls(1, obj.id, obj.updated_at or obj.created_at, single=True)
+
+    def etag(self, *extra: Any) -> str:
+        """
+        :param extra: параметры, влияющие на содержимое ответа помимо данных (например, страница)
+        """
+        last_modified = self.last_modified.isoformat() if self.last_modified else ""
+        raw = "|".join(map(str, (self.count, self.max_id, last_modified, *extra)))
+        return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+
+async def fingerprint(session: AsyncSession, model: Any, *where: Any) -> Fingerprint:
+    """Отпечаток строк ``model``, удовлетворяющих условиям ``where``, одним агрегатным запросом."""
+    query = select(
+        func.count(),
+        func.max(model.id),
+        func.max(func.coalesce(model.updated_at, model.created_at)),
+    ).select_from(model)
+    if where:
+        query = query.where(*where)
+    count, max_id, last_modified = (await session.execute(query)).one()
+    return Fingerprint(count, max_id, last_modified)
+
+
+def http_date(value: datetime.datetime) -> str:
+    # время в БД хранится в UTC без часового пояса
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return format_datetime(value.astimezone(datetime.timezone.utc), usegmt=True)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение ETag (RFC 9110, 13.1.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    tag = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
+
+
+def not_modified_since(if_modified_since: str, last_modified: datetime.datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=datetime.timezone.utc)
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    # в HTTP дате нет долей секунды
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional(
+        request: Request,
+        response: Response,
+        fingerprint: Fingerprint,
+        cache_control: str,
+        *extra: Any,
+        resource: str,
+) -> Optional[Response]:
+    """
+    Проставляет ``ETag``, ``Last-Modified`` и ``Cache-Control`` в ответ роута.
+
+    :param extra: параметры запроса, влияющие на содержимое ответа (фильтры, страница)
+    :param resource: имя ресурса для метрик
+
+    :return: ответ 304, если данные клиента актуальны, иначе ``None`` - роут формирует ответ как обычно
+    """
+    headers = {"ETag": fingerprint.etag(*extra), "Cache-Control": cache_control}
+    last_modified = fingerprint.last_modified if fingerprint.single else None
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, headers["ETag"])
+    else:
+        # If-Modified-Since учитывается только при отсутствии If-None-Match
+        if_modified_since = request.headers.get("if-modified-since")
+        fresh = (
+            if_modified_since is not None
+            and last_modified is not None
+            and not_modified_since(if_modified_since, last_modified)
+        )
+
+    if not fresh:
+        return None
+    HTTP_NOT_MODIFIED.labels(resource).inc()
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,94 @@
+"""
+Перекодирование изображений.
+
+Функции модуля выполняются в отдельных процессах (см. ``utils.executors``),
+поэтому принимают и возвращают только простые сериализуемые значения.
+"""
+from pathlib import Path
+from typing import Optional
+
+# форматы, которые Pillow открывает без плагинов: только такие файлы считаются изображениями
+# (HEIC/AVIF распознаются по сигнатуре, но без pillow-heif/pillow-avif не декодируются)
+DECODABLE_MIME_TYPES = frozenset({
+    "image/jpeg",
+    "image/png",
+    "image/gif",
+    "image/bmp",
+    "image/tiff",
+    "image/webp",
+    "image/vnd.microsoft.icon",
+})
+
+# расширение файла и формат Pillow для поддерживаемых форматов вариантов
+VARIANT_FORMATS = {
+    "webp": "WEBP",
+    "jpeg": "JPEG",
+}
+
+
+def variant_path(original_path: str, kind: str, fmt: str) -> str:
+    """Путь для производного изображения рядом с оригиналом."""
+    original = Path(original_path)
+    return str(original.with_name(f"{original.name}.{kind}.{fmt}"))
+
+
+def _save(image, path: str, fmt: str, quality: int) -> None:  # noqa: ANN001
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    image.save(path, VARIANT_FORMATS[fmt], quality=quality, optimize=True)
+
+
+def make_variants(original_path: str, sizes: dict[str, int], fmt: str, quality: int) -> list[dict]:
+    """
+    Создаёт уменьшенные копии изображения.
+
+    :param original_path: путь к исходному файлу
+    :param sizes: вид варианта -> максимальная сторона в пикселях, например ``{"thumbnail": 256}``
+    :param fmt: формат вариантов (``webp`` или ``jpeg``)
+    :param quality: качество сжатия
+    :return: описание созданных вариантов (kind, format, path, width, height, size)
+    """
+    from PIL import Image, ImageOps
+
+    variants = []
+    with Image.open(original_path) as source:
+        source = ImageOps.exif_transpose(source)
+        # от большего к меньшему, чтобы каждый следующий вариант уменьшался из предыдущего
+        for kind, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+            image = source.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            path = variant_path(original_path, kind, fmt)
+            _save(image, path, fmt, quality)
+            variants.append({
+                "kind": kind,
+                "format": fmt,
+                "path": path,
+                "width": image.width,
+                "height": image.height,
+                "size": Path(path).stat().st_size,
+            })
+            source = image
+    return variants
+
+
+def resize_image(
+        original_path: str,
+        target_path: str,
+        width: Optional[int],
+        height: Optional[int],
+        fmt: str,
+        quality: int,
+) -> int:
+    """
+    Вписывает изображение в прямоугольник ``width`` x ``height`` с сохранением пропорций.
+
+    Не заданная сторона не ограничивается, изображение не увеличивается.
+    :return: размер созданного файла в байтах
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(original_path) as source:
+        image = ImageOps.exif_transpose(source)
+        image.thumbnail((width or image.width, height or image.height), Image.LANCZOS)
+        _save(image, target_path, fmt, quality)
+    return Path(target_path).stat().st_size
@@ -0,0 +1,189 @@
+"""
+Сбор метрик HTTP запросов, БД и пулов исполнителей.
+"""
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.executors import BoundedExecutor
+from utils.loop_monitor import track_route
+from utils.metrics import Counter, Gauge, Histogram, registry
+from utils.routing import RouteResolver
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being processed", ("method", "route")
+)
+
+DB_STATEMENTS = Counter(
+    "db_statements_total", "Executed SQL statements", ("operation",)
+)
+DB_STATEMENT_LATENCY = Histogram(
+    "db_statement_duration_seconds",
+    "SQL statement execution time",
+    ("operation",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+DB_ERRORS = Counter(
+    "db_errors_total", "Failed SQL statements", ("operation",)
+)
+DB_COMPILED_CACHE = Counter(
+    "db_compiled_cache_total",
+    "SQL compilation cache lookups: hit, miss, no_cache_key (statement is not cacheable), disabled",
+    ("result",),
+)
+DB_CONNECTIONS_CHECKED_OUT = Gauge(
+    "db_pool_connections_checked_out", "Database connections currently in use"
+)
+DB_CONNECTIONS_OPENED = Counter(
+    "db_pool_connections_opened_total", "New database connections opened"
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware с замером латентности и количества выполняемых запросов по роутам.
+
+    Роут определяется по шаблону пути (``/orders/by-order/{order_id}``), чтобы количество
+    рядов метрики не зависело от идентификаторов в URL.
+    """
+
+    def __init__(self, app: ASGIApp, router: Router):
+        self.app = app
+        self.resolve_route = RouteResolver(router)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self.resolve_route(scope)
+        track_route(f"{method} {route}")
+        status = 500
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+
+
+_CACHE_RESULTS = {
+    "CACHE_HIT": "hit",
+    "CACHE_MISS": "miss",
+    "NO_CACHE_KEY": "no_cache_key",
+    "CACHING_DISABLED": "disabled",
+    "NO_DIALECT_SUPPORT": "disabled",
+}
+
+
+def compiled_cache_result(context) -> str:  # noqa: ANN001
+    """Результат обращения к кэшу компиляции SQLAlchemy для выполненного запроса."""
+    # cache_hit - symbol SQLAlchemy, str() которого "symbol('CACHE_HIT')", поэтому сравнение по имени
+    cache_hit = getattr(context, "cache_hit", None)
+    return _CACHE_RESULTS.get(getattr(cache_hit, "name", None), "disabled")
+
+
+def _operation(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = _operation(statement)
+    DB_STATEMENTS.labels(operation).inc()
+    DB_STATEMENT_LATENCY.labels(operation).observe(elapsed)
+    if context is not None:
+        DB_COMPILED_CACHE.labels(compiled_cache_result(context)).inc()
+
+
+def _handle_error(context):  # noqa: ANN001
+    connection = context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+    DB_ERRORS.labels(_operation(context.statement or "")).inc()
+
+
+def _connect(dbapi_connection, connection_record):  # noqa: ANN001
+    DB_CONNECTIONS_OPENED.inc()
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):  # noqa: ANN001
+    DB_CONNECTIONS_CHECKED_OUT.inc()
+
+
+def _checkin(dbapi_connection, connection_record):  # noqa: ANN001
+    DB_CONNECTIONS_CHECKED_OUT.dec()
+
+
+def _listen_once(target, identifier: str, fn) -> None:  # noqa: ANN001
+    if not event.contains(target, identifier, fn):
+        event.listen(target, identifier, fn)
+
+
+def _function_gauge(name: str, documentation: str, function) -> None:  # noqa: ANN001
+    gauge = registry.metrics.get(name)
+    if gauge is None:
+        Gauge(name, documentation, function=function)
+    else:
+        # повторное подключение (приложение создано заново в том же процессе): метрика читает новый объект
+        gauge.function = function
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Подписывается на события движка для подсчёта запросов, их длительности и занятых соединений.
+
+    Повторный вызов для того же движка ничего не добавляет, для другого - переключает на него метрики пула.
+    """
+    sync_engine = engine.sync_engine
+
+    _listen_once(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    _listen_once(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    _listen_once(sync_engine, "handle_error", _handle_error)
+    # слушатели пула переносятся в новый пул при engine.dispose()
+    _listen_once(sync_engine.pool, "connect", _connect)
+    _listen_once(sync_engine.pool, "checkout", _checkout)
+    _listen_once(sync_engine.pool, "checkin", _checkin)
+
+    if sync_engine._compiled_cache is not None:
+        _function_gauge(
+            "db_compiled_cache_size", "Compiled statements in the engine cache",
+            lambda: len(sync_engine._compiled_cache),
+        )
+
+    # размер есть только у пулов с ограничением (QueuePool), у NullPool его нет
+    if hasattr(sync_engine.pool, "size"):
+        _function_gauge("db_pool_size", "Configured database pool size", lambda: sync_engine.pool.size())
+        _function_gauge(
+            "db_pool_overflow", "Database connections opened over the pool size", lambda: sync_engine.pool.overflow()
+        )
+
+
+def instrument_executor(name: str, executor: BoundedExecutor) -> None:
+    """Метрики очереди пула исполнителей."""
+    _function_gauge(f"{name}_executor_pending", f"Tasks submitted to {name} executor", lambda: executor.pending)
+    _function_gauge(f"{name}_executor_queued", f"Tasks waiting for a free {name} worker", lambda: executor.queued)
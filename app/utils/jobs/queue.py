@@ -0,0 +1,188 @@
+"""
+Очередь фоновых задач поверх таблицы ``jobs``.
+
+Задачи добавляются в той же транзакции, что и бизнес-изменения (``enqueue``),
+и выбираются воркерами пачками через ``FOR UPDATE SKIP LOCKED``, поэтому несколько
+воркеров не блокируют друг друга и не получают одну задачу дважды.
+"""
+import datetime
+import random
+from typing import Optional
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import Config
+from models import Job
+from models.core import fresh_timestamp
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def seconds_from_now(seconds: float):  # noqa: ANN201
+    """Выражение ``now() + seconds`` в UTC, временем управляет БД, а не часы воркера."""
+    return fresh_timestamp() + func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+
+def retry_delay(attempt: int, base: float = Config.jobs_retry_base, cap: float = Config.jobs_retry_max) -> float:
+    """Экспоненциальная задержка перед повтором с джиттером, чтобы повторы не приходили волной."""
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+async def enqueue(
+        session: AsyncSession,
+        task: str,
+        payload: Optional[dict] = None,
+        *,
+        queue: str = "default",
+        priority: int = 0,
+        run_at: Optional[datetime.datetime] = None,
+        delay: Optional[float] = None,
+        max_attempts: int = Config.jobs_max_attempts,
+) -> int:
+    """
+    Добавляет задачу в очередь.
+
+    Не коммитит транзакцию: задача станет видна воркерам вместе с остальными изменениями сессии.
+
+    :param task: имя обработчика (см. ``utils.jobs.worker.job_task``)
+    :param payload: json-сериализуемые параметры задачи
+    :param priority: задачи с большим приоритетом выбираются раньше
+    :param run_at: время запуска (UTC), по умолчанию - сразу
+    :param delay: отложить запуск на указанное количество секунд
+    :return: id задачи
+    """
+    if run_at is None:
+        run_at = seconds_from_now(delay) if delay else fresh_timestamp()
+
+    job_insert = (
+        insert(Job)
+        .values(
+            queue=queue,
+            task=task,
+            payload=payload or {},
+            priority=priority,
+            run_at=run_at,
+            max_attempts=max_attempts,
+        )
+        .returning(Job.id)
+    )
+    return (await session.execute(job_insert)).scalar_one()
+
+
+async def claim_jobs(session: AsyncSession, queue: str, limit: int, worker_id: str) -> list[Row]:
+    """
+    Забирает до ``limit`` готовых к выполнению задач очереди и помечает их как выполняемые.
+
+    Заблокированные другими воркерами строки пропускаются (``SKIP LOCKED``).
+    Вызывающий должен сразу закоммитить транзакцию, чтобы не держать блокировки во время выполнения.
+    """
+    pending = (
+        select(Job.id)
+        .where(Job.queue == queue, Job.status == JOB_QUEUED, Job.run_at <= fresh_timestamp())
+        .order_by(Job.priority.desc(), Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    claim = (
+        update(Job)
+        .where(Job.id.in_(pending))
+        .values(
+            status=JOB_RUNNING,
+            attempts=Job.attempts + 1,
+            locked_at=fresh_timestamp(),
+            locked_by=worker_id,
+        )
+        .returning(Job.id, Job.task, Job.payload, Job.attempts, Job.max_attempts)
+        .execution_options(synchronize_session=False)
+    )
+    return (await session.execute(claim)).all()
+
+
+def _owned(job_id: int, worker_id: str):  # noqa: ANN202
+    # задачу, возвращённую в очередь как зависшую, мог забрать другой воркер - её статус не трогаем
+    return update(Job).where(Job.id == job_id, Job.locked_by == worker_id, Job.status == JOB_RUNNING)
+
+
+async def complete_job(session: AsyncSession, job_id: int, worker_id: str) -> bool:
+    """
+    Помечает задачу выполненной.
+
+    :return: False, если задача уже не принадлежит воркеру ``worker_id``
+    """
+    result = await session.execute(
+        _owned(job_id, worker_id)
+        .values(status=JOB_DONE, locked_at=None, locked_by=None, last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def fail_job(session: AsyncSession, job: Row, error: str, worker_id: str) -> bool:
+    """
+    Возвращает задачу в очередь с задержкой, либо помечает её проваленной, если попытки исчерпаны.
+
+    :return: False, если задача уже не принадлежит воркеру ``worker_id``
+    """
+    values = dict(locked_at=None, locked_by=None, last_error=error)
+    if job.attempts >= job.max_attempts:
+        values.update(status=JOB_FAILED)
+    else:
+        values.update(status=JOB_QUEUED, run_at=seconds_from_now(retry_delay(job.attempts)))
+
+    result = await session.execute(
+        _owned(job.id, worker_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def renew_job_leases(session: AsyncSession, job_ids: list[int], worker_id: str) -> int:
+    """Продлевает блокировку выполняемых задач, чтобы долгие задачи не считались зависшими."""
+    if not job_ids:
+        return 0
+    result = await session.execute(
+        update(Job)
+        .where(Job.id.in_(job_ids), Job.locked_by == worker_id, Job.status == JOB_RUNNING)
+        .values(locked_at=fresh_timestamp())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def requeue_stale_jobs(session: AsyncSession, timeout: int = Config.jobs_stale_timeout) -> int:
+    """
+    Возвращает в очередь задачи, зависшие в статусе running (например, после падения воркера).
+
+    Задачи с исчерпанными попытками помечаются проваленными: задача, которая роняет воркер,
+    не должна перезапускаться бесконечно.
+    """
+    result = await session.execute(
+        update(Job)
+        .where(Job.status == JOB_RUNNING, Job.locked_at < seconds_from_now(-timeout))
+        .values(
+            status=case((Job.attempts >= Job.max_attempts, JOB_FAILED), else_=JOB_QUEUED),
+            locked_at=None,
+            locked_by=None,
+            last_error="stale job requeued",
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def purge_finished_jobs(session: AsyncSession, older_than: int) -> int:
+    """Удаляет выполненные задачи старше ``older_than`` секунд."""
+    result = await session.execute(
+        delete(Job)
+        .where(Job.status == JOB_DONE, Job.updated_at < seconds_from_now(-older_than))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
@@ -0,0 +1,180 @@
+"""
+Воркер фоновой очереди задач.
+
+Обработчики регистрируются декоратором ``job_task`` и получают ``payload`` задачи::
+
+    @job_task("notifications.send")
+    async def send_notification(payload: dict) -> None:
+        ...
+
+Запуск воркера: ``python run_worker.py``
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.engine import Row
+
+from core.config import Config
+from utils.database_connection import db_async_session_manager
+from utils.jobs.queue import (
+    claim_jobs,
+    complete_job,
+    fail_job,
+    purge_finished_jobs,
+    renew_job_leases,
+    requeue_stale_jobs,
+)
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[None]]
+
+_tasks: dict[str, JobHandler] = {}
+
+
+def job_task(name: str) -> Callable[[JobHandler], JobHandler]:
+    """Регистрирует обработчик задач с именем ``name``."""
+
+    def decorator(handler: JobHandler) -> JobHandler:
+        if name in _tasks:
+            raise ValueError(f"Task {name} already registered")
+        _tasks[name] = handler
+        return handler
+
+    return decorator
+
+
+class JobWorker:
+    """
+    Выполняет задачи из очередей ``queues`` (имя очереди -> максимум одновременно выполняемых задач).
+
+    Задачи забираются пачками и только в количестве свободных слотов очереди,
+    поэтому воркер не держит задачи, которые не может сразу начать выполнять.
+
+    Периодически (раз в треть ``jobs_stale_timeout``) воркер продлевает блокировку своих
+    выполняемых задач, возвращает в очередь зависшие задачи других воркеров и удаляет
+    выполненные задачи старше ``jobs_retention``.
+    """
+
+    def __init__(
+            self,
+            queues: Optional[dict[str, int]] = None,
+            *,
+            batch_size: int = Config.jobs_batch_size,
+            poll_interval: float = Config.jobs_poll_interval,
+            session_manager=db_async_session_manager,  # noqa: ANN001
+            worker_id: Optional[str] = None,
+    ):
+        self.queues = queues or Config.jobs_queues
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.session_manager = session_manager
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+
+        self.processed = 0
+        self.failed = 0
+
+        self._running: dict[str, set[asyncio.Task]] = {queue: set() for queue in self.queues}
+        # id выполняемых задач, блокировку которых нужно продлевать
+        self._leased: set[int] = set()
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._last_maintenance = float("-inf")
+
+    async def run(self) -> None:
+        """Основной цикл, работает до вызова ``stop``, после чего дожидается выполняемых задач."""
+        self._wakeup = asyncio.Event()
+        logger.info("Job worker %s started, queues: %s", self.worker_id, self.queues)
+
+        while not self._stopping:
+            self._wakeup.clear()
+            await self._maintain()
+
+            claimed = 0
+            for queue, limit in self.queues.items():
+                free = limit - len(self._running[queue])
+                if free > 0:
+                    claimed += await self._claim(queue, min(free, self.batch_size))
+
+            if not claimed:
+                # ждём освобождения слота или новых задач
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        await self.drain()
+        logger.info("Job worker %s stopped", self.worker_id)
+
+    def stop(self) -> None:
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def drain(self) -> None:
+        running = [task for tasks in self._running.values() for task in tasks]
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _maintain(self) -> None:
+        now = time.monotonic()
+        if now - self._last_maintenance < Config.jobs_stale_timeout / 3:
+            return
+        self._last_maintenance = now
+        try:
+            async with self.session_manager() as session:
+                await renew_job_leases(session, list(self._leased), self.worker_id)
+                if requeued := await requeue_stale_jobs(session):
+                    logger.warning("Requeued %s stale jobs", requeued)
+                if purged := await purge_finished_jobs(session, Config.jobs_retention):
+                    logger.info("Purged %s finished jobs", purged)
+        except Exception:
+            logger.error("Unable to maintain job leases", exc_info=True)
+
+    async def _claim(self, queue: str, limit: int) -> int:
+        try:
+            async with self.session_manager() as session:
+                jobs = await claim_jobs(session, queue, limit, self.worker_id)
+        except Exception:
+            logger.error("Unable to claim jobs from queue %s", queue, exc_info=True)
+            return 0
+
+        for job in jobs:
+            self._leased.add(job.id)
+            task = asyncio.create_task(self._execute(job))
+            self._running[queue].add(task)
+            task.add_done_callback(lambda t, q=queue: self._on_done(q, t))
+        return len(jobs)
+
+    def _on_done(self, queue: str, task: asyncio.Task) -> None:
+        self._running[queue].discard(task)
+        self._wakeup.set()
+
+    async def _execute(self, job: Row) -> None:
+        handler = _tasks.get(job.task)
+        try:
+            if handler is None:
+                raise LookupError(f"Task {job.task} is not registered")
+            await handler(job.payload)
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Job %s (%s) failed on attempt %s", job.id, job.task, job.attempts, exc_info=True)
+            await self._finish(job, fail_job, job, repr(e))
+        else:
+            self.processed += 1
+            await self._finish(job, complete_job, job.id)
+        finally:
+            self._leased.discard(job.id)
+
+    async def _finish(self, job: Row, update: Callable[..., Awaitable[bool]], *args) -> None:  # noqa: ANN002
+        # задача, статус которой не удалось записать, вернётся в очередь через requeue_stale_jobs
+        try:
+            async with self.session_manager() as session:
+                if not await update(session, *args, self.worker_id):
+                    logger.warning("Job %s (%s) was requeued as stale, status not saved", job.id, job.task)
+        except Exception:
+            logger.error("Unable to save status of job %s (%s)", job.id, job.task, exc_info=True)
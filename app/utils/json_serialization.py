@@ -6,7 +6,10 @@ from typing import Any
 import orjson
 from pydantic import BaseModel
 
+from utils.tracing import traced
 
+
+@traced("serialization")
 def dumps(data: Any, default=None, raw: bool = False) -> str | bytes:
     if isinstance(data, BaseModel):
         data = data.dict()
@@ -1,15 +1,15 @@
 import logging
 import warnings
 from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable
 
-import sentry_sdk
-from fastapi import FastAPI
-
-
-from sentry_sdk.integrations.logging import LoggingIntegration
-from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 from sqlalchemy import exc
 
+# sentry_sdk с интеграциями импортируется только при настроенном Sentry (долгий импорт)
+if TYPE_CHECKING:
+    import sentry_sdk
+    from fastapi import FastAPI
+
 
 def configure_logging(enable_additional_debug=True):
     """
@@ -41,35 +41,43 @@ def set_logging(
     enable_additional_debug: bool = True,
     sentry_url: str = None,
     environment: str = "TEST_LOCAL",
-    app: FastAPI = None,
+    app: "FastAPI" = None,
+    traces_sampler: Callable[[dict], float] = None,
 ):
     """
     Устанавливает конфигурацию для логирования.
 
     Необходимо вызывать как можно раньше
     :param level: уровень выводимых логов
+    :param traces_sampler: функция выборки трасс для Sentry (без неё трассы не отправляются)
     """
     configure_logging(enable_additional_debug=enable_additional_debug)
     logging.basicConfig(level=level, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", force=True)
 
     if sentry_url:
+        import sentry_sdk
+        from sentry_sdk.integrations.logging import LoggingIntegration
+        from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+
         sentry_logging = LoggingIntegration(level=level, event_level=logging.ERROR)
 
         sentry_sdk.init(
             sentry_url,
-            traces_sample_rate=1.0,
+            traces_sampler=traces_sampler,
             environment=environment,
             integrations=[sentry_logging, SqlalchemyIntegration()],
         )
 
 
 @contextmanager
-def nested_transaction(name: str) -> sentry_sdk.hub.Transaction:
+def nested_transaction(name: str) -> "sentry_sdk.tracing.Transaction":
     """
     Контекстный менеджер для мониторинга производительности
     :param name: имя контекса для отслеживания
     :return:
     """
+    import sentry_sdk
+
     transaction = sentry_sdk.Hub.current.scope.transaction
     if transaction is None:
         with sentry_sdk.start_transaction(name=name) as transaction:
@@ -0,0 +1,110 @@
+"""
+Замер задержки event loop'а и обнаружение его блокировок.
+
+Фоновая задача (heartbeat) периодически засыпает на ``interval`` и измеряет, насколько позже она проснулась.
+Задержка показывает, сколько времени loop был занят синхронной работой и не обслуживал запросы.
+
+Если задан ``block_threshold``, отдельный поток следит за heartbeat'ом и, когда тот не срабатывает
+дольше порога, снимает стек потока event loop'а - то есть ровно тот код, который его блокирует,
+и пишет его в лог вместе с роутом выполняемого запроса.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from typing import Optional
+
+from utils.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = Gauge(
+    "event_loop_lag_seconds", "Last measured event loop lag", multiprocess_mode="max"
+)
+LOOP_LAG_HISTOGRAM = Histogram(
+    "event_loop_lag_distribution_seconds",
+    "Event loop lag distribution",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_BLOCKS = Counter(
+    "event_loop_blocks_total", "Event loop blocked longer than the threshold", ("route",)
+)
+
+UNKNOWN_ROUTE = "<unknown>"
+
+# роут, обрабатываемый задачей; читается потоком watchdog'а, пока loop заблокирован
+_task_routes: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+_current_tasks: dict = getattr(asyncio.tasks, "_current_tasks", {})
+
+
+def track_route(route: str) -> None:
+    """Запоминает роут текущей задачи для отчётов о блокировках."""
+    if task := asyncio.current_task():
+        _task_routes[task] = route
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float, block_threshold: float = 0):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._reported_beat = 0.0
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self._last_beat = time.monotonic()
+            LOOP_LAG.set(lag)
+            LOOP_LAG_HISTOGRAM.observe(lag)
+
+    def _watch(self) -> None:
+        check_interval = max(0.01, self.block_threshold / 4)
+        while not self._stopping.wait(check_interval):
+            last_beat = self._last_beat
+            blocked = time.monotonic() - last_beat - self.interval
+            # об одной блокировке сообщаем один раз, до следующего heartbeat'а
+            if blocked > self.block_threshold and self._reported_beat != last_beat:
+                self._reported_beat = last_beat
+                self._report(blocked)
+
+    def _report(self, blocked: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else "<no frame>"
+        task = _current_tasks.get(self._loop)
+        route = _task_routes.get(task, UNKNOWN_ROUTE) if task is not None else UNKNOWN_ROUTE
+
+        LOOP_BLOCKS.labels(route).inc()
+        logger.warning(
+            "Event loop blocked for %.3fs (threshold %.3fs) in route %s, task %s\n%s",
+            blocked, self.block_threshold, route, task.get_name() if task else None, stack,
+        )
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.create_task(self._run())
+
+        if self.block_threshold > 0:
+            self._stopping.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._watchdog is not None:
+            self._stopping.set()
+            self._watchdog.join()
+            self._watchdog = None
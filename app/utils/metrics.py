@@ -0,0 +1,314 @@
+"""
+Метрики сервиса в формате Prometheus.
+
+Значения хранятся в памяти воркера в обычных словарях без блокировок: все обновления
+выполняются из потока event loop'а, а запись числа в атрибут атомарна под GIL.
+
+При нескольких воркерах uvicorn (``METRICS_MULTIPROC_DIR``) каждый воркер периодически
+сохраняет свой снимок в директорию, а ``/metrics`` суммирует снимки всех живых воркеров.
+"""
+import asyncio
+import logging
+import os
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последний - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        registry.register(self)
+
+    def _new_child(self):  # noqa: ANN202
+        return _CounterValue()
+
+    def labels(self, *labelvalues: str):  # noqa: ANN201
+        """Значение метрики для набора меток (создаётся при первом обращении)."""
+        try:
+            return self._children[labelvalues]
+        except KeyError:
+            child = self._children[labelvalues] = self._new_child()
+            return child
+
+    def samples(self) -> dict[tuple, object]:
+        return {labelvalues: child.value for labelvalues, child in self._children.items()}
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """
+    Текущее значение.
+
+    :param function: функция, вычисляющая значение при сборе метрик (для метрик без меток)
+    :param multiprocess_mode: как объединять значения воркеров - ``sum`` или ``max``
+    """
+
+    type = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Iterable[str] = (),
+            function: Optional[Callable[[], float]] = None,
+            multiprocess_mode: str = "sum",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def samples(self) -> dict[tuple, object]:
+        if self.function is not None:
+            return {(): float(self.function())}
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Iterable[str] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> dict[tuple, object]:
+        return {
+            labelvalues: {"counts": list(child.counts), "sum": child.sum, "count": child.count}
+            for labelvalues, child in self._children.items()
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> None:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labelnames": metric.labelnames,
+                "buckets": getattr(metric, "buckets", None),
+                "mode": getattr(metric, "multiprocess_mode", "sum"),
+                "samples": [[list(labelvalues), value] for labelvalues, value in metric.samples().items()],
+            }
+            for name, metric in self.metrics.items()
+        }
+
+
+registry = Registry()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_float(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def render(snapshot: dict) -> str:
+    """Текстовый формат Prometheus для снимка метрик."""
+    lines = []
+    for name, metric in snapshot.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for labelvalues, value in metric["samples"]:
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{_labels(labelnames, labelvalues)} {_format_float(value)}")
+                continue
+
+            cumulative = 0
+            for bound, count in zip((*metric["buckets"], float("inf")), value["counts"]):
+                cumulative += count
+                le = f'le="{_format_float(bound)}"'
+                lines.append(f"{name}_bucket{_labels(labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labelnames, labelvalues)} {_format_float(value['sum'])}")
+            lines.append(f"{name}_count{_labels(labelnames, labelvalues)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def merge_snapshots(snapshots: Iterable[dict]) -> dict:
+    """Объединяет снимки нескольких воркеров: счётчики и гистограммы суммируются, gauge - по ``mode``."""
+    merged: dict = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for labelvalues, value in metric["samples"]:
+                key = tuple(labelvalues)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif metric["type"] == "histogram":
+                    target["samples"][key] = {
+                        "counts": [a + b for a, b in zip(current["counts"], value["counts"])],
+                        "sum": current["sum"] + value["sum"],
+                        "count": current["count"] + value["count"],
+                    }
+                elif metric["type"] == "gauge" and metric["mode"] == "max":
+                    target["samples"][key] = max(current, value)
+                else:
+                    target["samples"][key] = current + value
+
+    for metric in merged.values():
+        metric["samples"] = [[list(key), value] for key, value in metric["samples"].items()]
+    return merged
+
+
+class MultiprocessCollector:
+    """Сохранение снимков метрик воркера в общую директорию и их объединение."""
+
+    def __init__(self, directory: str, interval: float = 5.0):
+        self.directory = Path(directory)
+        self.interval = interval
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def path(self) -> Path:
+        return self.directory / f"metrics_{os.getpid()}.json"
+
+    def write(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(registry.snapshot()))
+        os.replace(tmp_path, self.path)
+
+    def collect(self) -> dict:
+        self.write()
+        snapshots = []
+        for path in self.directory.glob("metrics_*.json"):
+            pid = int(path.stem.split("_")[1])
+            if not _pid_alive(pid):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                snapshots.append(orjson.loads(path.read_bytes()))
+            except (OSError, orjson.JSONDecodeError):
+                logger.warning("Unable to read metrics snapshot %s", path, exc_info=True)
+        return merge_snapshots(snapshots)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.write()
+            except OSError:
+                logger.warning("Unable to write metrics snapshot", exc_info=True)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        self.path.unlink(missing_ok=True)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect() -> str:
+    """Метрики в текстовом формате: текущего воркера или всех воркеров в multiprocess режиме."""
+    if multiprocess_collector is not None:
+        return render(multiprocess_collector.collect())
+    return render(registry.snapshot())
+
+
+multiprocess_collector: Optional[MultiprocessCollector] = None
+
+
+def enable_multiprocess(directory: str, interval: float) -> MultiprocessCollector:
+    """Включает объединение метрик воркеров через директорию ``directory``."""
+    global multiprocess_collector
+    multiprocess_collector = MultiprocessCollector(directory, interval)
+    return multiprocess_collector
@@ -0,0 +1,125 @@
+"""
+Определение типа содержимого файла по сигнатуре (magic bytes).
+
+Работает по первым байтам файла, поэтому может вызываться на первой части
+загружаемого потока, без повторного чтения файла с диска.
+"""
+from typing import Optional
+
+from utils.images import DECODABLE_MIME_TYPES
+
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
+# минимальный размер начала файла, достаточный для всех проверок ниже (tar хранит сигнатуру по смещению 257)
+SNIFF_SIZE = 512
+
+# (смещение, сигнатура, mime тип), порядок важен: более специфичные сигнатуры раньше
+SIGNATURES: list[tuple[int, bytes, str]] = [
+    # изображения
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"\x00\x00\x01\x00", "image/vnd.microsoft.icon"),
+    # документы
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"{\\rtf", "application/rtf"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),  # doc, xls, ppt
+    # архивы
+    (0, b"Rar!\x1a\x07", "application/vnd.rar"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (0, b"\x28\xb5\x2f\xfd", "application/zstd"),
+    (257, b"ustar", "application/x-tar"),
+]
+
+# brand'ы ISO BMFF контейнера (смещение 8), относящиеся к изображениям
+FTYP_IMAGE_BRANDS = {
+    b"avif": "image/avif",
+    b"avis": "image/avif",
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"mif1": "image/heif",
+}
+
+# размеры заголовка DIB (смещение 14), от BITMAPCOREHEADER до BITMAPV5HEADER
+BMP_DIB_HEADER_SIZES = {12, 16, 40, 52, 56, 64, 108, 124}
+
+# каталоги внутри zip, по которым распознаются документы Office Open XML
+OOXML_MARKERS = {
+    b"word/": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    b"xl/": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    b"ppt/": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+
+def _sniff_zip(head: bytes) -> str:
+    # OpenDocument: первый (несжатый) файл архива - "mimetype" с типом документа
+    if head[30:38] == b"mimetype":
+        mime_type = head[38:].split(b"PK", 1)[0]
+        if mime_type.startswith(b"application/vnd.oasis.opendocument."):
+            return mime_type.decode("ascii", errors="ignore")
+
+    for marker, mime_type in OOXML_MARKERS.items():
+        if marker in head:
+            return mime_type
+    return "application/zip"
+
+
+def _is_bmp(head: bytes) -> bool:
+    # одной сигнатуры "BM" мало: с неё может начинаться и текст
+    return (
+        head[:2] == b"BM"
+        and head[6:10] == b"\x00\x00\x00\x00"
+        and int.from_bytes(head[14:18], "little") in BMP_DIB_HEADER_SIZES
+    )
+
+
+def _sniff_text(head: bytes) -> Optional[str]:
+    if b"\x00" in head:
+        return None
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # начало файла могло разрезать многобайтовый символ
+        if e.start < len(head) - 3:
+            return None
+    return "text/plain"
+
+
+def sniff_mime(head: bytes) -> str:
+    """
+    Определяет mime тип по началу файла.
+
+    :param head: первые байты файла (желательно не меньше ``SNIFF_SIZE``)
+    :return: mime тип, ``application/octet-stream`` если тип не распознан
+    """
+    if head.startswith(b"PK\x03\x04"):
+        return _sniff_zip(head)
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+
+    if head[4:8] == b"ftyp" and (mime_type := FTYP_IMAGE_BRANDS.get(head[8:12])):
+        return mime_type
+
+    if _is_bmp(head):
+        return "image/bmp"
+
+    for offset, signature, mime_type in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type
+
+    if head and (mime_type := _sniff_text(head[:SNIFF_SIZE])):
+        return mime_type
+
+    return DEFAULT_MIME_TYPE
+
+
+def is_image_mime(mime_type: Optional[str]) -> bool:
+    """Изображение, которое можно обработать (``utils.images``): только форматы, декодируемые Pillow."""
+    return mime_type in DECODABLE_MIME_TYPES
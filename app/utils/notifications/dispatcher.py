@@ -0,0 +1,156 @@
+"""
+Отправка уведомлений из outbox в сервис уведомлений.
+
+События выбираются пачками, группируются по получателю и отправляются одним
+HTTP запросом на пачку через общий keep-alive клиент::
+
+    POST {NOTIFICATION_SERVICE_URL}/notifications/batch
+    {"notifications": [{"recipientId": 1, "events": [{"id": 10, "type": "message.created", ...}]}]}
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Optional
+
+import httpx
+from sqlalchemy.engine import Row
+
+from core.config import NotificationServiceConfig
+from utils.database_connection import db_async_session_manager
+from utils.json_serialization import dumps
+from utils.notifications.outbox import claim_notifications, mark_dispatched, mark_failed, purge_notifications
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = "/notifications/batch"
+
+# интервал удаления старых уведомлений из outbox (секунды)
+PURGE_INTERVAL = 10 * 60
+
+
+def coalesce(events: list[Row]) -> list[dict]:
+    """Группирует события по получателю, сохраняя порядок их создания."""
+    by_recipient: dict[int, list[dict]] = defaultdict(list)
+    for event in sorted(events, key=lambda e: e.id):
+        by_recipient[event.recipient_id].append({
+            "id": event.id,
+            "type": event.event_type,
+            "payload": event.payload,
+            "createdAt": event.created_at,
+        })
+    return [{"recipientId": recipient_id, "events": items} for recipient_id, items in by_recipient.items()]
+
+
+class NotificationDispatcher:
+    """
+    Периодически отправляет накопившиеся в outbox уведомления.
+
+    Раз в ``PURGE_INTERVAL`` удаляет из outbox отправленные и проваленные уведомления
+    старше ``NOTIFICATION_RETENTION``.
+    """
+
+    def __init__(
+            self,
+            client: Optional[httpx.AsyncClient] = None,
+            *,
+            batch_size: int = NotificationServiceConfig.notification_batch_size,
+            poll_interval: float = NotificationServiceConfig.notification_poll_interval,
+            max_attempts: int = NotificationServiceConfig.notification_max_attempts,
+            session_manager=db_async_session_manager,  # noqa: ANN001
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.session_manager = session_manager
+        # на это время выбранные события не выдаются другим диспетчерам
+        self.lease = NotificationServiceConfig.notification_timeout * 3
+
+        self.sent = 0
+        self.failed = 0
+        self._stopping = asyncio.Event()
+        self._last_purge = float("-inf")
+
+    @staticmethod
+    def create_client() -> httpx.AsyncClient:
+        NotificationServiceConfig.ensure_configured()
+        return httpx.AsyncClient(
+            base_url=NotificationServiceConfig.notification_service_url,
+            headers={
+                "Authorization": f"Bearer {NotificationServiceConfig.notification_service_token}",
+                "Content-Type": "application/json",
+            },
+            timeout=NotificationServiceConfig.notification_timeout,
+            limits=httpx.Limits(
+                max_connections=NotificationServiceConfig.notification_max_connections,
+                max_keepalive_connections=NotificationServiceConfig.notification_max_connections,
+            ),
+            # повторное соединение при обрыве keep-alive, остальные ошибки обрабатываются через outbox
+            transport=httpx.AsyncHTTPTransport(retries=2),
+        )
+
+    async def run(self) -> None:
+        own_client = self.client is None
+        if own_client:
+            self.client = self.create_client()
+
+        try:
+            while not self._stopping.is_set():
+                await self._purge()
+                sent = await self.dispatch_batch()
+                # пачка была полной - скорее всего есть ещё события, забираем сразу
+                if sent < self.batch_size:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            if own_client:
+                await self.client.aclose()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def _purge(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            async with self.session_manager() as session:
+                purged = await purge_notifications(
+                    session, NotificationServiceConfig.notification_retention, self.max_attempts
+                )
+            if purged:
+                logger.info("Purged %s notifications from outbox", purged)
+        except Exception:
+            logger.error("Unable to purge notifications", exc_info=True)
+
+    async def dispatch_batch(self) -> int:
+        """Отправляет одну пачку событий, возвращает количество выбранных событий."""
+        try:
+            async with self.session_manager() as session:
+                events = await claim_notifications(session, self.batch_size, self.lease, self.max_attempts)
+        except Exception:
+            logger.error("Unable to claim notifications", exc_info=True)
+            return 0
+
+        if not events:
+            return 0
+
+        ids = [event.id for event in events]
+        try:
+            response = await self.client.post(BATCH_PATH, content=dumps({"notifications": coalesce(events)}, raw=True))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.failed += len(events)
+            logger.warning("Unable to send %s notifications: %r", len(events), e)
+            async with self.session_manager() as session:
+                await mark_failed(session, ids, max(event.attempts for event in events), repr(e), self.max_attempts)
+        else:
+            self.sent += len(events)
+            async with self.session_manager() as session:
+                await mark_dispatched(session, ids)
+
+        return len(events)
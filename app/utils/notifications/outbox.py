@@ -0,0 +1,155 @@
+"""
+Transactional outbox для сервиса уведомлений.
+
+Уведомления записываются в таблицу ``notification_outbox`` в той же транзакции,
+что и бизнес-изменение, поэтому запись не требует обращения к внешнему сервису
+и уведомление не теряется при откате/падении. Отправкой занимается ``NotificationDispatcher``.
+
+Если сервис уведомлений не настроен (``NOTIFICATION_SERVICE_URL``), диспетчер не запускается,
+и уведомления в outbox не записываются.
+"""
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from core.config import NotificationServiceConfig
+from models import NotificationOutbox
+from models.core import fresh_timestamp
+from utils.jobs.queue import retry_delay, seconds_from_now
+
+
+async def add_notifications(
+        session: AsyncSession,
+        recipient_ids: Iterable[int],
+        event_type: str,
+        payload: dict,
+) -> None:
+    """Добавляет уведомление для каждого из получателей."""
+    if not NotificationServiceConfig.notification_service_url:
+        return
+    rows = [
+        {"recipient_id": recipient_id, "event_type": event_type, "payload": payload}
+        for recipient_id in set(recipient_ids)
+    ]
+    if rows:
+        await session.execute(insert(NotificationOutbox), rows)
+
+
+async def add_notifications_from_select(
+        session: AsyncSession,
+        recipients: Select,
+        event_type: str,
+        payload: dict,
+) -> None:
+    """
+    Добавляет уведомление для получателей, выбранных запросом ``recipients`` (одна колонка с id пользователя).
+
+    Получатели выбираются и записываются одним запросом ``INSERT ... SELECT``, без лишнего обхода в БД.
+    """
+    if not NotificationServiceConfig.notification_service_url:
+        return
+    recipients = recipients.subquery()
+    recipient_id = list(recipients.c)[0]
+    await session.execute(
+        insert(NotificationOutbox).from_select(
+            ["recipient_id", "event_type", "payload"],
+            select(recipient_id, literal(event_type), literal(payload, JSONB)).distinct(),
+        )
+    )
+
+
+async def claim_notifications(session: AsyncSession, limit: int, lease: float, max_attempts: int) -> list[Row]:
+    """
+    Забирает до ``limit`` неотправленных уведомлений.
+
+    Вместо удержания блокировки на время HTTP запроса выбранные строки "арендуются":
+    следующая попытка переносится на ``lease`` секунд вперёд, так что другой диспетчер
+    их не возьмёт, а при падении текущего они будут отправлены повторно.
+    """
+    pending = (
+        select(NotificationOutbox.id)
+        .where(
+            NotificationOutbox.dispatched_at.is_(None),
+            NotificationOutbox.failed_at.is_(None),
+            NotificationOutbox.next_attempt_at <= fresh_timestamp(),
+            NotificationOutbox.attempts < max_attempts,
+        )
+        .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    claim = (
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(pending))
+        .values(attempts=NotificationOutbox.attempts + 1, next_attempt_at=seconds_from_now(lease))
+        .returning(
+            NotificationOutbox.id,
+            NotificationOutbox.recipient_id,
+            NotificationOutbox.event_type,
+            NotificationOutbox.payload,
+            NotificationOutbox.attempts,
+            NotificationOutbox.created_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return (await session.execute(claim)).all()
+
+
+async def mark_dispatched(session: AsyncSession, ids: list[int]) -> None:
+    await session.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(ids))
+        .values(dispatched_at=fresh_timestamp(), last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def mark_failed(session: AsyncSession, ids: list[int], attempt: int, error: str, max_attempts: int) -> None:
+    """
+    Откладывает повторную отправку с экспоненциальной задержкой.
+
+    Уведомления, исчерпавшие ``max_attempts`` попыток, помечаются проваленными и больше не отправляются.
+    """
+    await session.execute(
+        update(NotificationOutbox)
+        .where(NotificationOutbox.id.in_(ids))
+        .values(
+            next_attempt_at=seconds_from_now(retry_delay(attempt)),
+            failed_at=case((NotificationOutbox.attempts >= max_attempts, fresh_timestamp()), else_=None),
+            last_error=error,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def purge_notifications(session: AsyncSession, older_than: int, max_attempts: int) -> int:
+    """
+    Удаляет отправленные и проваленные уведомления старше ``older_than`` секунд.
+
+    Уведомления, исчерпавшие попытки без ответа (диспетчер упал во время отправки, аренда истекла),
+    помечаются проваленными.
+    :return: количество удалённых уведомлений
+    """
+    await session.execute(
+        update(NotificationOutbox)
+        .where(
+            NotificationOutbox.dispatched_at.is_(None),
+            NotificationOutbox.failed_at.is_(None),
+            NotificationOutbox.attempts >= max_attempts,
+            NotificationOutbox.next_attempt_at <= fresh_timestamp(),
+        )
+        .values(failed_at=fresh_timestamp(), last_error=func.coalesce(NotificationOutbox.last_error, "lease expired"))
+        .execution_options(synchronize_session=False)
+    )
+    expired = seconds_from_now(-older_than)
+    result = await session.execute(
+        delete(NotificationOutbox)
+        .where(or_(NotificationOutbox.dispatched_at < expired, NotificationOutbox.failed_at < expired))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
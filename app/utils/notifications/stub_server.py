@@ -0,0 +1,97 @@
+"""
+Локальная заглушка сервиса уведомлений.
+
+Принимает пачки уведомлений и сохраняет их в памяти, может отвечать ошибкой
+на первые ``fail_first`` запросов для проверки повторной отправки::
+
+    with StubNotificationServer(fail_first=1) as server:
+        dispatcher = NotificationDispatcher(httpx.AsyncClient(base_url=server.url))
+        ...
+        assert server.batches
+
+Либо отдельным процессом (адрес указывается в ``NOTIFICATION_SERVICE_URL``)::
+
+    python utils/notifications/stub_server.py --port 8099
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubNotificationServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, fail_first: int = 0, verbose: bool = False):
+        self.batches: list[dict] = []
+        self.requests = 0
+        self.authorization: Optional[str] = None
+        self.fail_first = fail_first
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def events(self) -> list[dict]:
+        return [event for batch in self.batches for item in batch["notifications"] for event in item["events"]]
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_POST(self) -> None:  # noqa: N802
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with stub._lock:
+                    stub.requests += 1
+                    failing = stub.requests <= stub.fail_first
+                    if not failing:
+                        stub.batches.append(json.loads(body))
+                        stub.authorization = self.headers.get("Authorization")
+
+                status = 503 if failing else 202
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format: str, *args) -> None:  # noqa: A002, ANN002
+                if stub.verbose:
+                    super().log_message(format, *args)
+
+        return Handler
+
+    def start(self) -> "StubNotificationServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubNotificationServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:  # noqa: ANN002
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Заглушка сервиса уведомлений")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--fail-first", type=int, default=0)
+    args = parser.parse_args()
+
+    server = StubNotificationServer(args.host, args.port, args.fail_first, verbose=True)
+    print(f"Stub notification service listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server._server.server_close()
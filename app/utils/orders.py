@@ -1,12 +1,24 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, lambda_stmt, or_
 from models.general import Order
-from schemas.order import OrderUpdate
+from schemas.order import OrderRow, OrderUpdate
+from utils.notifications.outbox import add_notifications
 from fastapi import HTTPException, status
 from datetime import datetime
 from typing import Optional
+from core.config import Config
+from utils.database_connection import db_async_session_manager
+from utils.http_cache import Fingerprint, fingerprint
+from utils.rows import columns, fetch_rows
+from utils.singleflight import SingleFlight
+from utils.tracing import traced
 
+ORDER_ROW_COLUMNS = columns(OrderRow, Order)
+
+order_reads = SingleFlight("order", Config.singleflight_ttl, Config.singleflight_max_entries)
+
+@traced("db")
 async def create_order(session: AsyncSession, order: Order):
     db_order = Order(
         author_id=order.author_id,
@@ -20,12 +32,22 @@ async def create_order(session: AsyncSession, order: Order):
     await session.refresh(db_order)  
     return db_order
 
+@traced("db")
 async def get_order(session: AsyncSession, order_id: int):
-    result = await session.execute(select(Order).filter(Order.id == order_id))
+    result = await session.execute(lambda_stmt(lambda: select(Order).where(Order.id == order_id)))
     return result.scalar_one_or_none()
 
+async def get_order_shared(order_id: int):
+    """Заказ для чтения, конкурентные запросы одного заказа выполняют один запрос к БД."""
+    async def load():
+        async with db_async_session_manager() as session:
+            return await get_order(session, order_id)
+
+    return await order_reads.do(order_id, load)
+
+@traced("db")
 async def delete_order(session: AsyncSession, order_id: int):
-    result = await session.execute(select(Order).filter(Order.id == order_id))
+    result = await session.execute(lambda_stmt(lambda: select(Order).where(Order.id == order_id)))
     db_order = result.scalar_one_or_none()
     
     if not db_order:
@@ -33,12 +55,14 @@ async def delete_order(session: AsyncSession, order_id: int):
     
     await session.delete(db_order)  
     await session.commit()
+    order_reads.invalidate(order_id)
     return db_order
 
-async def get_orders(session: AsyncSession, skip: int = 0, limit: int = 10):
-    result = await session.execute(select(Order).offset(skip).limit(limit))
-    return result.scalars().all()
+@traced("db")
+async def get_orders(session: AsyncSession, skip: int = 0, limit: int = 10) -> list[OrderRow]:
+    return await fetch_rows(session, OrderRow, select(*ORDER_ROW_COLUMNS).offset(skip).limit(limit))
 
+@traced("db")
 async def update_order(
     session: AsyncSession, 
     order_id: int, 
@@ -47,7 +71,7 @@ async def update_order(
     """
     Обновляет заказ по ID
     """
-    result = await session.execute(select(Order).filter(Order.id == order_id))
+    result = await session.execute(lambda_stmt(lambda: select(Order).where(Order.id == order_id)))
     db_order = result.scalar_one_or_none()
         
     if not db_order:
@@ -59,11 +83,42 @@ async def update_order(
     update_data = order_update.dict(exclude_unset=True)
     for field, value in update_data.items():
             setattr(db_order, field, value)
-        
+
+    await add_notifications(
+        session,
+        [db_order.author_id],
+        "order.updated",
+        {"order_id": order_id, "fields": list(update_data)},
+    )
     await session.commit()
+    order_reads.invalidate(order_id)
     await session.refresh(db_order)
     return db_order
     
+def active_orders_filters(
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    deadline_from: Optional[datetime] = None,
+    deadline_to: Optional[datetime] = None,
+) -> list:
+    """
+    Условия выборки активных заказов (общие для списка и его отпечатка)
+    """
+    filters = [Order.status_id == 1]
+    if category_id is not None:
+        filters.append(Order.category_id == category_id)
+    if min_price is not None:
+        filters.append(Order.start_price >= min_price)
+    if max_price is not None:
+        filters.append(Order.start_price <= max_price)
+    if deadline_from is not None:
+        filters.append(Order.deadline >= deadline_from)
+    if deadline_to is not None:
+        filters.append(Order.deadline <= deadline_to)
+    return filters
+
+@traced("db")
 async def get_active_orders(
     session: AsyncSession,
     category_id: Optional[int] = None,
@@ -73,37 +128,27 @@ async def get_active_orders(
     deadline_to: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 10,
-):
-    query = select(Order).where(Order.status_id == 1)
-        
-    if category_id is not None:
-        query = query.where(Order.category_id == category_id)
-        
-    if min_price is not None or max_price is not None:
-        price_filters = []
-        if min_price is not None:
-            price_filters.append(Order.start_price >= min_price)
-        if max_price is not None:
-            price_filters.append(Order.start_price <= max_price)
-        query = query.where(and_(*price_filters))
-            
-    if deadline_from is not None or deadline_to is not None:
-        deadline_filters = []
-        if deadline_from is not None:
-            deadline_filters.append(Order.deadline >= deadline_from)
-        if deadline_to is not None:
-            deadline_filters.append(Order.deadline <= deadline_to)
-        query = query.where(and_(*deadline_filters))
-        
-    query = query.offset(skip).limit(limit)
-    if result is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
-    result = await session.execute(query)
-    return result.scalars().all()
+) -> list[OrderRow]:
+    filters = active_orders_filters(category_id, min_price, max_price, deadline_from, deadline_to)
+    query = select(*ORDER_ROW_COLUMNS).where(and_(*filters)).offset(skip).limit(limit)
+    return await fetch_rows(session, OrderRow, query)
+
+@traced("db")
+async def get_active_orders_fingerprint(session: AsyncSession, **filters) -> Fingerprint:
+    return await fingerprint(session, Order, *active_orders_filters(**filters))
+
+@traced("db")
+async def get_orders_fingerprint(session: AsyncSession) -> Fingerprint:
+    return await fingerprint(session, Order)
+
+@traced("db")
+async def get_orders_by_author_fingerprint(session: AsyncSession, author_id: int) -> Fingerprint:
+    return await fingerprint(session, Order, Order.author_id == author_id)
 
+@traced("db")
 async def get_orders_by_author(
     session: AsyncSession, 
     author_id: int
 ):
-    result = await session.execute(select(Order).where(Order.author_id == author_id))
+    result = await session.execute(lambda_stmt(lambda: select(Order).where(Order.author_id == author_id)))
     return result.scalars().all()
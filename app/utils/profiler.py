@@ -0,0 +1,140 @@
+"""
+Статистический профайлер работающего воркера.
+
+Отдельный поток с заданной частотой снимает стеки потоков процесса через ``sys._current_frames()``
+и считает, сколько раз встретился каждый стек. Профилируемый код не инструментируется,
+поэтому накладные расходы ограничены временем снятия стеков - оно измеряется и возвращается
+вместе с результатом.
+
+Результат выгружается в формате collapsed stacks (flamegraph.pl, speedscope) или в формате
+speedscope (https://www.speedscope.app/file-format-schema.json).
+"""
+import sys
+import threading
+import time
+from collections import defaultdict
+from types import CodeType, FrameType
+from typing import Optional
+
+MAX_STACK_DEPTH = 128
+
+
+class Profile:
+    """Результат профилирования: количество сэмплов для каждого стека потока."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: dict[tuple[str, tuple[str, ...]], int] = defaultdict(int)
+        self.samples = 0
+        self.duration = 0.0
+        self.sampling_time = 0.0
+
+    @property
+    def effective_hz(self) -> float:
+        """Фактическая частота сэмплирования."""
+        return self.samples / self.duration if self.duration else 0.0
+
+    @property
+    def overhead(self) -> float:
+        """Доля времени, которое поток профайлера удерживал GIL."""
+        return self.sampling_time / self.duration if self.duration else 0.0
+
+    def collapsed(self) -> str:
+        """Стеки в формате ``thread;function (file:line);... count``."""
+        return "".join(
+            f"{';'.join((thread, *stack))} {count}\n" for (thread, stack), count in self.stacks.items()
+        )
+
+    def speedscope(self, name: str = "profile") -> dict:
+        """Профиль в формате speedscope (по sampled профилю на поток)."""
+        frames: list[dict] = []
+        frame_index: dict[str, int] = {}
+        profiles: dict[str, dict] = {}
+
+        for (thread, stack), count in self.stacks.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    function, _, location = frame.partition(" ")
+                    file, _, line = location.strip("()").rpartition(":")
+                    frames.append({"name": function, "file": file, "line": int(line or 0)})
+                indexes.append(frame_index[frame])
+
+            profile = profiles.setdefault(thread, {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": [],
+                "weights": [],
+            })
+            profile["samples"].append(indexes)
+            profile["weights"].append(count * self.interval)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "utils.profiler",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер потоков текущего процесса.
+
+    :param hz: частота сэмплирования
+    :param thread_ids: идентификаторы профилируемых потоков, по умолчанию - все потоки
+    """
+
+    def __init__(self, hz: float, thread_ids: Optional[set[int]] = None):
+        self.interval = 1 / hz
+        self.thread_ids = thread_ids
+        self._code_names: dict[CodeType, str] = {}
+
+    def _frame_name(self, code: CodeType) -> str:
+        try:
+            return self._code_names[code]
+        except KeyError:
+            name = self._code_names[code] = f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})"
+            return name
+
+    def _stack(self, frame: Optional[FrameType]) -> tuple[str, ...]:
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            stack.append(self._frame_name(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    def run(self, duration: float) -> Profile:
+        """Профилирует ``duration`` секунд в текущем потоке (блокирующий вызов)."""
+        profile = Profile(self.interval)
+        own_id = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        started = time.perf_counter()
+        deadline = started + duration
+        next_sample = started
+        while (now := time.perf_counter()) < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids is not None and thread_id not in self.thread_ids):
+                    continue
+                thread = thread_names.get(thread_id) or f"thread-{thread_id}"
+                profile.stacks[(thread, self._stack(frame))] += 1
+            profile.samples += 1
+            profile.sampling_time += time.perf_counter() - now
+
+            # расписание от момента старта, а не от конца сэмпла - частота не "уплывает"
+            next_sample += self.interval
+            delay = next_sample - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.perf_counter()
+
+        profile.duration = time.perf_counter() - started
+        return profile
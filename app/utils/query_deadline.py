@@ -0,0 +1,125 @@
+"""
+Ограничение времени запросов к БД по роутам и отмена запросов отключившихся клиентов.
+
+Для роутов из ``DB_ROUTE_TIMEOUTS`` каждая транзакция сессии запроса начинается с
+``set_config('statement_timeout', ..., true)`` - аналог ``SET LOCAL statement_timeout``, который
+принимает значение параметром. Таймаут действует до конца транзакции, в том числе за PgBouncer
+в режиме transaction, и не переходит на следующее использование соединения из пула. Запрос,
+превысивший таймаут, Postgres прерывает с SQLSTATE 57014, клиент получает 504.
+
+Если клиент отключился, не дождавшись ответа, обработка запроса отменяется: отмена задачи,
+ожидающей asyncpg, отправляет серверу CancelRequest, и соединение возвращается в пул, не дожидаясь
+ненужного результата. Отменяются только запросы, ответ которых ещё не отправлен, - фоновые задачи
+после ответа выполняются как обычно.
+"""
+import asyncio
+import contextlib
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.metrics import Counter
+from utils.routing import RouteResolver
+
+QUERY_CANCELLED = Counter(
+    "db_queries_cancelled_total", "Requests whose database work was cancelled", ("route", "reason")
+)
+
+# SQLSTATE query_canceled: statement_timeout или CancelRequest
+QUERY_CANCELED_SQLSTATE = "57014"
+
+# statement_timeout (мс) транзакций текущего HTTP запроса
+statement_timeout: ContextVar[Optional[int]] = ContextVar("statement_timeout", default=None)
+
+_SET_STATEMENT_TIMEOUT = text("SELECT set_config('statement_timeout', :value, true)")
+
+
+def is_query_cancelled(error: BaseException) -> bool:
+    """Ошибка SQLAlchemy/asyncpg - запрос прерван сервером (таймаут или отмена)."""
+    orig = getattr(error, "orig", error)
+    return getattr(orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE
+
+
+def _apply_statement_timeout(session: Session, transaction: Any, connection: Any) -> None:
+    timeout = statement_timeout.get()
+    if timeout:
+        connection.execute(_SET_STATEMENT_TIMEOUT, {"value": f"{timeout}ms"})
+
+
+def instrument_statement_timeout(session_class: type = Session) -> None:
+    """Подключает установку ``statement_timeout`` в начале транзакций сессий."""
+    if not event.contains(session_class, "after_begin", _apply_statement_timeout):
+        event.listen(session_class, "after_begin", _apply_statement_timeout)
+
+
+class QueryDeadlineMiddleware:
+    """
+    ASGI middleware: ``statement_timeout`` роута и отмена обработки при отключении клиента.
+
+    :param timeouts: таймауты (мс) по роутам, ключ - ``"METHOD /path/{template}"``
+    :param cancel_on_disconnect: отменять обработку запросов этих роутов при отключении клиента
+    """
+
+    def __init__(self, app: ASGIApp, router: Router, timeouts: dict[str, int], cancel_on_disconnect: bool = True):
+        self.app = app
+        self.resolve_route = RouteResolver(router)
+        self.timeouts = timeouts
+        self.cancel_on_disconnect = cancel_on_disconnect
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.timeouts:
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {self.resolve_route(scope)}"
+        timeout = self.timeouts.get(route)
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = statement_timeout.set(timeout)
+        try:
+            if self.cancel_on_disconnect:
+                await self.run_cancellable(route, scope, receive, send)
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            statement_timeout.reset(token)
+
+    async def run_cancellable(self, route: str, scope: Scope, receive: Receive, send: Send) -> None:
+        # сообщения клиента читаются здесь и передаются приложению через очередь,
+        # чтобы отключение было замечено, пока приложение ждёт БД
+        messages: asyncio.Queue = asyncio.Queue()
+        response_complete = False
+
+        async def watch_disconnect() -> None:
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_complete
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await asyncio.wait((handler, watcher), return_when=asyncio.FIRST_COMPLETED)
+            if not handler.done() and not response_complete:
+                handler.cancel()
+                QUERY_CANCELLED.labels(route, "disconnect").inc()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await handler
+                return
+            await handler
+        finally:
+            watcher.cancel()
+            handler.cancel()
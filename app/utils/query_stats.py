@@ -0,0 +1,204 @@
+"""
+Подсчёт SQL запросов и времени БД в рамках HTTP запроса и поиск N+1.
+
+Статистика текущего запроса хранится в ``ContextVar`` (как и ``session_context``) и пополняется
+обработчиками событий движка, поэтому учитываются все запросы - и явные ``session.execute``,
+и flush, и ленивые загрузки связей.
+
+Запросы группируются по "форме" - тексту без значений параметров. Если одна форма повторяется
+в запросе ``QUERY_REPEAT_THRESHOLD`` раз и больше, это почти всегда цикл с запросом на каждой
+итерации (N+1) - о нём пишется предупреждение в лог.
+"""
+import contextlib
+import logging
+import re
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.routing import Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.metrics import Counter, Histogram
+from utils.routing import RouteResolver
+
+logger = logging.getLogger(__name__)
+
+DB_QUERIES_PER_REQUEST = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request",
+    ("route",),
+    buckets=(1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statements_total", "Requests with a statement repeated over the N+1 threshold", ("route",)
+)
+
+_PARAM_LIST = re.compile(r"(?:\$\d+|%\(\w+\)s|\?)(?:\s*,\s*(?:\$\d+|%\(\w+\)s|\?))*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """Текст запроса без параметров: ``IN ($1, $2, $3)`` и ``IN ($1)`` дают одну форму."""
+    return _WHITESPACE.sub(" ", _PARAM_LIST.sub("?", statement)).strip()
+
+
+class QueryStats:
+    """
+    Статистика запросов к БД.
+
+    :param parent: внешняя статистика (например, ``assert_query_budget`` в тесте), в которую
+                   дублируются все запросы
+    """
+
+    __slots__ = ("count", "duration", "shapes", "parent")
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: dict[str, int] = defaultdict(int)
+        self.parent = parent
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+        if self.parent is not None:
+            self.parent.record(statement, duration)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Формы запросов, выполненные не менее ``threshold`` раз, по убыванию количества."""
+        return sorted(
+            ((shape, count) for shape, count in self.shapes.items() if count >= threshold),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+query_stats_context: ContextVar[Optional[QueryStats]] = ContextVar("query_stats_context", default=None)
+
+
+@contextlib.contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Собирает статистику запросов, выполненных внутри блока."""
+    stats = QueryStats(parent=query_stats_context.get())
+    token = query_stats_context.set(stats)
+    try:
+        yield stats
+    finally:
+        query_stats_context.reset(token)
+
+
+@contextlib.contextmanager
+def assert_query_budget(max_queries: int, max_repeats: Optional[int] = None) -> Iterator[QueryStats]:
+    """
+    Проверяет, что код внутри блока укладывается в бюджет запросов к БД.
+
+    Используется в тестах эндпоинтов, чтобы N+1 не возвращался незамеченным::
+
+        with assert_query_budget(3, max_repeats=1):
+            await client.get("/chats/my")
+
+    :param max_queries: максимальное количество запросов
+    :param max_repeats: максимальное количество повторов одной формы запроса
+    """
+    with track_queries() as stats:
+        yield stats
+
+    if stats.count > max_queries:
+        raise AssertionError(
+            f"Expected at most {max_queries} queries, got {stats.count}:\n" + _describe(stats.shapes.items())
+        )
+    if max_repeats is not None and (repeated := stats.repeated(max_repeats + 1)):
+        raise AssertionError(
+            f"Statements repeated more than {max_repeats} times:\n" + _describe(repeated)
+        )
+
+
+def _describe(shapes) -> str:  # noqa: ANN001
+    return "\n".join(f"  {count} x {shape}" for shape, count in shapes)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+    if query_stats_context.get() is not None:
+        conn.info.setdefault("query_stats_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+    stats = query_stats_context.get()
+    if stats is not None and conn.info.get("query_stats_started"):
+        stats.record(statement, time.perf_counter() - conn.info["query_stats_started"].pop())
+
+
+def _handle_error(context):  # noqa: ANN001
+    connection = context.connection
+    if connection is not None and connection.info.get("query_stats_started"):
+        connection.info["query_stats_started"].pop()
+
+
+def instrument_query_stats(engine: AsyncEngine) -> None:
+    """Подписывается на события движка для учёта запросов в статистике текущего контекста (один раз)."""
+    sync_engine = engine.sync_engine
+    for identifier, fn in (
+        ("before_cursor_execute", _before_cursor_execute),
+        ("after_cursor_execute", _after_cursor_execute),
+        ("handle_error", _handle_error),
+    ):
+        if not event.contains(sync_engine, identifier, fn):
+            event.listen(sync_engine, identifier, fn)
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware, собирающая статистику запросов к БД для каждого HTTP запроса.
+
+    Добавляет в ответ заголовок ``Server-Timing`` с количеством и временем запросов к БД
+    и пишет в лог предупреждение о повторяющихся запросах.
+    """
+
+    def __init__(self, app: ASGIApp, router: Router, repeat_threshold: int):
+        self.app = app
+        self.resolve_route = RouteResolver(router)
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+
+        with track_queries() as stats:
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing",
+                        f"{stats.server_timing()}, app;dur={(time.perf_counter() - started) * 1000:.1f}",
+                    )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._report(scope, stats)
+
+    def _report(self, scope: Scope, stats: QueryStats) -> None:
+        route = f"{scope['method']} {self.resolve_route(scope)}"
+        DB_QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+
+        if repeated := stats.repeated(self.repeat_threshold):
+            DB_REPEATED_STATEMENTS.labels(route).inc()
+            logger.warning(
+                "Possible N+1 in %s: %d queries in %.1fms, repeated statements:\n%s",
+                route, stats.count, stats.duration * 1000, _describe(repeated),
+            )
@@ -0,0 +1,219 @@
+"""
+Ограничение частоты запросов (token bucket).
+
+Для каждого ключа (IP, пользователь, логин) хранится bucket: ``burst`` токенов, пополняемых
+со скоростью ``rate`` токенов в секунду. Запрос забирает токен, при пустом bucket'е отклоняется
+с кодом 429 и заголовком ``Retry-After``.
+
+Проверка выполняется зависимостью роута (``dependencies=[Depends(rate_limit("login"))]``),
+поэтому отклонённые запросы не доходят ни до БД, ни до хэширования паролей.
+
+Хранилище состояний:
+ * ``memory`` - в памяти воркера, шардированные LRU словари (лимит действует на каждый воркер отдельно)
+ * ``postgres`` - общая для воркеров таблица ``rate_limit_buckets`` (атомарный upsert на запрос)
+"""
+import math
+import random
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+
+import fastapi
+import jwt
+from sqlalchemy import text
+
+from core.config import Config
+from utils.database_connection import db_async_session_manager
+from utils.metrics import Counter
+
+RATE_LIMITED = Counter(
+    "rate_limited_requests_total", "Requests rejected by rate limiter", ("limit", "key")
+)
+
+
+class Limit(NamedTuple):
+    """
+    :param count: количество запросов
+    :param period: за период (секунды)
+    :param keys: по каким ключам считается лимит: ``ip``, ``user``, ``login``
+    """
+
+    count: int
+    period: float
+    keys: tuple[str, ...]
+
+    @property
+    def rate(self) -> float:
+        return self.count / self.period
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    retry_after: float = 0.0
+
+
+class MemoryBucketStore:
+    """
+    Bucket'ы в памяти воркера.
+
+    Ключи распределены по шардам, каждый шард - LRU словарь ограниченного размера: при переполнении
+    вытесняются давно не использованные ключи (их bucket'ы считаются полными).
+    """
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10_000):
+        self._shards: list[OrderedDict[str, tuple[float, float]]] = [OrderedDict() for _ in range(shards)]
+        self.max_keys_per_shard = max_keys_per_shard
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> Decision:
+        shard = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        tokens, updated = shard.pop(key, (limit.count, now))
+        tokens = min(limit.count, tokens + (now - updated) * limit.rate)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        shard[key] = (tokens, now)
+        if len(shard) > self.max_keys_per_shard:
+            shard.popitem(last=False)
+
+        return Decision(allowed, 0.0 if allowed else (cost - tokens) / limit.rate)
+
+
+class PostgresBucketStore:
+    """
+    Bucket'ы в таблице ``rate_limit_buckets``, общие для всех воркеров.
+
+    Пополнение и списание выполняются одним ``INSERT ... ON CONFLICT DO UPDATE``, поэтому
+    конкурентные запросы разных воркеров не могут потратить один токен дважды.
+
+    Числовые параметры приводятся к ``float8`` явно: asyncpg передаёт параметры ``text()``
+    без типов, и выражение вида ``$2 - $3`` Postgres не может типизировать.
+    """
+
+    take_query = text(
+        """
+        INSERT INTO rate_limit_buckets AS bucket (key, tokens, updated_at)
+        VALUES (:key, CAST(:burst AS float8) - CAST(:cost AS float8), clock_timestamp())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = LEAST(
+                CAST(:burst AS float8),
+                bucket.tokens + EXTRACT(EPOCH FROM clock_timestamp() - bucket.updated_at) * CAST(:rate AS float8)
+            ) - CAST(:cost AS float8),
+            updated_at = clock_timestamp()
+        WHERE LEAST(
+            CAST(:burst AS float8),
+            bucket.tokens + EXTRACT(EPOCH FROM clock_timestamp() - bucket.updated_at) * CAST(:rate AS float8)
+        ) >= CAST(:cost AS float8)
+        RETURNING tokens
+        """
+    )
+    tokens_query = text(
+        """
+        SELECT LEAST(
+            CAST(:burst AS float8),
+            tokens + EXTRACT(EPOCH FROM clock_timestamp() - updated_at) * CAST(:rate AS float8)
+        )
+        FROM rate_limit_buckets
+        WHERE key = :key
+        """
+    )
+    purge_query = text(
+        "DELETE FROM rate_limit_buckets"
+        " WHERE updated_at < clock_timestamp() - make_interval(secs => CAST(:age AS float8))"
+    )
+
+    def __init__(self, session_manager: Callable = db_async_session_manager, purge_probability: float = 0.001):
+        self.session_manager = session_manager
+        self.purge_probability = purge_probability
+
+    async def take(self, key: str, limit: Limit, cost: float = 1) -> Decision:
+        params = {"key": key, "burst": limit.count, "rate": limit.rate, "cost": cost}
+        async with self.session_manager() as session:
+            if (await session.execute(self.take_query, params)).first() is not None:
+                decision = Decision(True)
+            else:
+                tokens = (await session.execute(self.tokens_query, params)).scalar() or 0.0
+                decision = Decision(False, (cost - tokens) / limit.rate)
+
+            # полные bucket'ы не нужны - периодически удаляем давно не обновлявшиеся
+            if random.random() < self.purge_probability:
+                await session.execute(self.purge_query, {"age": limit.period * 2})
+        return decision
+
+
+def create_store(backend: str) -> MemoryBucketStore | PostgresBucketStore:
+    if backend == "postgres":
+        return PostgresBucketStore()
+    return MemoryBucketStore(Config.rate_limit_shards, Config.rate_limit_max_keys_per_shard)
+
+
+store = create_store(Config.rate_limit_backend)
+
+
+def client_ip(request: fastapi.Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def token_user_id(request: fastapi.Request) -> Optional[str]:
+    """id пользователя из access токена (без обращения к БД)."""
+    token = request.cookies.get("access_token")
+    if not token:
+        return None
+    try:
+        return str(jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])["id"])
+    except (jwt.InvalidTokenError, KeyError):
+        return None
+
+
+async def request_login(request: fastapi.Request) -> Optional[str]:
+    """Логин из тела запроса (тело к этому моменту уже прочитано FastAPI и закэшировано)."""
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    login = body.get("login") if isinstance(body, dict) else None
+    return login.strip().lower() if isinstance(login, str) else None
+
+
+async def limit_keys(request: fastapi.Request, keys: tuple[str, ...]) -> list[tuple[str, str]]:
+    values = []
+    for key in keys:
+        if key == "ip":
+            value = client_ip(request)
+        elif key == "user":
+            # без токена лимит считается по IP
+            value = token_user_id(request) or f"ip:{client_ip(request)}"
+        elif key == "login":
+            value = await request_login(request)
+        else:
+            raise ValueError(f"Unknown rate limit key {key}")
+        if value is not None:
+            values.append((key, value))
+    return values
+
+
+def rate_limit(name: str) -> Callable:
+    """
+    Зависимость роута, ограничивающая частоту запросов по лимиту ``name`` из ``Config.rate_limits``.
+
+    Лимит отсутствует в конфигурации - ограничение не применяется.
+    """
+
+    limit = Limit(*Config.rate_limits[name]) if name in Config.rate_limits else None
+
+    async def dependency(request: fastapi.Request) -> None:
+        if limit is None:
+            return
+
+        for key, value in await limit_keys(request, limit.keys):
+            decision = await store.take(f"{name}:{key}:{value}", limit)
+            if not decision.allowed:
+                RATE_LIMITED.labels(name, key).inc()
+                raise fastapi.HTTPException(
+                    status_code=429,
+                    detail="Too many requests",
+                    headers={"Retry-After": str(max(1, math.ceil(decision.retry_after)))},
+                )
+
+    return dependency
@@ -1,16 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import lambda_stmt
 from sqlalchemy.future import select
 from models.general import Review
-from schemas.review import ReviewBase
+from schemas.review import ReviewBase, ReviewRow
 from fastapi import HTTPException, status
 from sqlalchemy.exc import SQLAlchemyError
 from models.general import User
+from core.config import Config
+from utils.database_connection import db_async_session_manager
+from utils.http_cache import Fingerprint, fingerprint
+from utils.query_deadline import is_query_cancelled
+from utils.rows import columns, fetch_rows
+from utils.singleflight import SingleFlight
+from utils.tracing import traced
 
+REVIEW_ROW_COLUMNS = columns(ReviewRow, Review)
 
+review_reads = SingleFlight("review", Config.singleflight_ttl, Config.singleflight_max_entries)
 
+
+
+@traced("db")
 async def get_review(session: AsyncSession, review_id: int):
     try:
-        result = await session.execute(select(Review).filter(Review.id == review_id))
+        result = await session.execute(lambda_stmt(lambda: select(Review).where(Review.id == review_id)))
         review = result.scalar_one_or_none()
         if not review:
             raise HTTPException(
@@ -24,21 +37,41 @@ async def get_review(session: AsyncSession, review_id: int):
             detail=f"Database error: {str(e)}"
         )
 
-async def get_reviews_by_reviewed_user(session: AsyncSession, user_id: int, skip: int = 0, limit: int = 10):
+async def get_review_shared(review_id: int):
+    """Отзыв для чтения, конкурентные запросы одного отзыва выполняют один запрос к БД."""
+    async def load():
+        async with db_async_session_manager() as session:
+            return await get_review(session, review_id)
+
+    return await review_reads.do(review_id, load)
+
+@traced("db")
+async def get_reviews_by_reviewed_user(
+    session: AsyncSession, user_id: int, skip: int = 0, limit: int = 10
+) -> list[ReviewRow]:
     try:
-        result = await session.execute(
-            select(Review)
+        return await fetch_rows(
+            session,
+            ReviewRow,
+            select(*REVIEW_ROW_COLUMNS)
             .filter(Review.reviewed_id == user_id)
             .offset(skip)
             .limit(limit)
         )
-        return result.scalars().all()
     except SQLAlchemyError as e:
+        if is_query_cancelled(e):
+            # 504 - обработчик в routes.exceptions
+            raise
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
         )
 
+@traced("db")
+async def get_reviews_by_reviewed_user_fingerprint(session: AsyncSession, user_id: int) -> Fingerprint:
+    return await fingerprint(session, Review, Review.reviewed_id == user_id)
+
+@traced("db")
 async def get_reviews_by_reviewer(session: AsyncSession, user_id: int, skip: int = 0, limit: int = 10):
     result = await session.execute(
         select(Review)
@@ -48,6 +81,7 @@ async def get_reviews_by_reviewer(session: AsyncSession, user_id: int, skip: int
     )
     return result.scalars().all()
 
+@traced("db")
 async def create_review(session: AsyncSession, review: Review):
     db_review = Review(
         comment=review.comment,
@@ -77,6 +111,7 @@ async def create_review(session: AsyncSession, review: Review):
         existing_review.comment = review.comment
         existing_review.rating = review.rating
         await session.commit()
+        review_reads.invalidate(existing_review.id)
         await session.refresh(existing_review)
         return existing_review
     else:
@@ -92,9 +127,10 @@ async def create_review(session: AsyncSession, review: Review):
         await session.refresh(db_review)
         return db_review
 
+@traced("db")
 async def update_review(session: AsyncSession, review_id: int, review: ReviewBase):
     try:
-        result = await session.execute(select(Review).filter(Review.id == review_id))
+        result = await session.execute(lambda_stmt(lambda: select(Review).where(Review.id == review_id)))
         db_review = result.scalar_one_or_none()
         
         if not db_review:
@@ -109,6 +145,7 @@ async def update_review(session: AsyncSession, review_id: int, review: ReviewBas
             db_review.rating = review.rating
         
         await session.commit()  
+        review_reads.invalidate(review_id)
         await session.refresh(db_review)  
         return db_review
     except SQLAlchemyError as e:
@@ -124,9 +161,10 @@ async def update_review(session: AsyncSession, review_id: int, review: ReviewBas
             detail=f"Error updating review: {str(e)}"
         )
 
+@traced("db")
 async def delete_review(session: AsyncSession, review_id: int):
     try:
-        result = await session.execute(select(Review).filter(Review.id == review_id))
+        result = await session.execute(lambda_stmt(lambda: select(Review).where(Review.id == review_id)))
         db_review = result.scalar_one_or_none()
         
         if not db_review:
@@ -137,6 +175,7 @@ async def delete_review(session: AsyncSession, review_id: int):
         
         await session.delete(db_review)  
         await session.commit()  
+        review_reads.invalidate(review_id)
         return db_review
     except SQLAlchemyError as e:
         await session.rollback()
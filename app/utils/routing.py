@@ -0,0 +1,44 @@
+"""
+Определение шаблона роута по ASGI scope до выполнения роутинга (для middleware).
+"""
+from collections import OrderedDict
+
+from starlette.routing import Match, Router
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RouteResolver:
+    """
+    Возвращает шаблон пути роута (``/orders/by-order/{order_id}``) для запроса.
+
+    Результат кэшируется по (метод, путь) в ограниченном LRU кэше, поэтому для повторяющихся
+    запросов поиск по списку роутов не выполняется.
+    """
+
+    def __init__(self, router: Router, maxsize: int = 4096):
+        self.router = router
+        self.maxsize = maxsize
+        self._cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+    def __call__(self, scope: dict) -> str:
+        key = (scope.get("method", ""), scope["path"])
+        try:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        template = UNMATCHED_ROUTE
+        for route in self.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                template = route.path
+                break
+            if match == Match.PARTIAL and template == UNMATCHED_ROUTE:
+                template = route.path
+
+        self._cache[key] = template
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return template
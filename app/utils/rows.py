@@ -0,0 +1,59 @@
+"""
+Чтение списков на уровне Core без ORM объектов.
+
+ORM запрос создаёт на каждую строку объект модели, состояние отслеживания изменений и запись
+в identity map сессии. Для списков, которые только отдаются в JSON, это лишняя работа: здесь
+выбираются только колонки, нужные ответу, строки складываются в легковесные DTO
+(``@dataclass(slots=True)``) и сериализуются orjson напрямую, без ``jsonable_encoder``.
+
+Имена полей DTO совпадают с именами колонок, поэтому ответ совпадает с прежней сериализацией
+ORM объектов: те же ключи, ``Numeric`` - числом, время - в ISO 8601.
+"""
+from dataclasses import fields
+from decimal import Decimal
+from itertools import starmap
+from typing import Any, Sequence, TypeVar
+
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.json_serialization import dumps
+
+Row = TypeVar("Row")
+
+
+def columns(dto: type, model: Any) -> tuple:
+    """Колонки таблицы ``model`` в порядке полей ``dto``."""
+    table = model.__table__
+    return tuple(table.c[field.name] for field in fields(dto))
+
+
+async def fetch_rows(session: AsyncSession, dto: type[Row], query: Any) -> list[Row]:
+    """
+    Строки запроса по колонкам из ``columns(dto, ...)`` в виде DTO.
+
+    Объекты моделей не создаются и в сессию не попадают.
+    """
+    result = await session.execute(query)
+    return list(starmap(dto, result))
+
+
+def _default(value: Any) -> Any:
+    # как decimal_encoder FastAPI: целое без дробной части, иначе float
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    raise TypeError
+
+
+class RowsResponse(Response):
+    """
+    JSON ответ из списка DTO.
+
+    Роут, вернувший ``Response``, не получает заголовки из внедрённого ``response`` (ETag,
+    Cache-Control), поэтому их нужно передать явно: ``RowsResponse(rows, headers=response.headers)``.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Sequence[Any]) -> bytes:
+        return dumps(content, default=_default, raw=True)
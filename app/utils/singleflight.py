@@ -0,0 +1,100 @@
+"""
+Объединение одинаковых конкурентных чтений (single-flight).
+
+Пока запрос к БД за ключом выполняется, остальные запросы с тем же ключом не идут в БД,
+а ждут результата уже выполняющегося. Дополнительно результат может храниться короткое время
+(micro-TTL), чтобы поглощать волны запросов, приходящие сразу после завершения чтения.
+
+Состояние хранится в памяти воркера. Записи через сервисный слой сбрасывают ключ (``invalidate``)
+в своём воркере, в остальных воркерах устаревшее значение живёт не дольше TTL.
+
+Результат один на всех ожидающих, поэтому объекты только для чтения: загружаются в отдельной
+сессии, которая закрывается до возврата результата (объекты отсоединены от сессии, атрибуты
+загружены, т.к. ``expire_on_commit=False``).
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from utils.metrics import Counter
+
+SINGLEFLIGHT_REQUESTS = Counter(
+    "singleflight_requests_total", "Coalesced reads by result source", ("name", "source")
+)
+
+
+class SingleFlight:
+    """
+    :param name: имя для метрик
+    :param ttl: время хранения результата (секунды), 0 - только объединение конкурентных чтений
+    :param max_entries: максимальное количество хранимых результатов (LRU)
+    """
+
+    def __init__(self, name: str, ttl: float = 0.0, max_entries: int = 4096):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self._results: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # счётчик сбросов: чтение, во время которого был сброс, не сохраняется
+        self._invalidations = 0
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        if self.ttl:
+            entry = self._results.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._results.move_to_end(key)
+                    SINGLEFLIGHT_REQUESTS.labels(self.name, "cache").inc()
+                    return value
+                del self._results[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            SINGLEFLIGHT_REQUESTS.labels(self.name, "load").inc()
+            task = asyncio.ensure_future(self._load(key, load))
+            task.add_done_callback(_consume_exception)
+            self._in_flight[key] = task
+        else:
+            SINGLEFLIGHT_REQUESTS.labels(self.name, "coalesced").inc()
+
+        # отмена одного из ожидающих (разрыв соединения клиентом) не отменяет чтение для остальных
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        invalidations = self._invalidations
+        try:
+            value = await load()
+        finally:
+            if self._in_flight.get(key) is asyncio.current_task():
+                del self._in_flight[key]
+
+        if self.ttl and invalidations == self._invalidations:
+            self._results[key] = (time.monotonic() + self.ttl, value)
+            self._results.move_to_end(key)
+            if len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Сброс ключа после записи.
+
+        Следующее чтение пойдёт в БД, даже если чтение, начатое до записи, ещё выполняется.
+        """
+        self._invalidations += 1
+        self._results.pop(key, None)
+        self._in_flight.pop(key, None)
+
+    def clear(self) -> None:
+        self._invalidations += 1
+        self._results.clear()
+        self._in_flight.clear()
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # ошибка получена ожидающими; если все они отменены - не логируем "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,357 @@
+"""
+Трассировка вызовов сервисного слоя.
+
+Функции ``internal/`` и ``utils/`` оборачиваются декоратором ``traced(op)``, который записывает
+вложенные спаны (БД, сериализация, хэширование, работа с файлами) в трассу текущего HTTP запроса.
+
+Трассируется не каждый запрос: ``AdaptiveSampler`` ограничивает количество трасс на роут за окно
+времени, поэтому редкие роуты попадают в выборку почти всегда, а частые - с малой вероятностью.
+
+Спаны экспортируются в Sentry (``SENTRY_URL``) либо в локальный файл JSON lines
+(``TRACING_SPAN_LOG``), который можно свернуть в формат flame graph::
+
+    python -m utils.tracing spans.jsonl > spans.folded
+"""
+import asyncio
+import contextlib
+import functools
+import itertools
+import logging
+import queue
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional
+
+import orjson
+from starlette.routing import Router
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from utils.routing import RouteResolver
+
+logger = logging.getLogger(__name__)
+
+_span_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("id", "parent_id", "op", "name", "start", "duration")
+
+    def __init__(self, op: str, name: str, parent_id: Optional[int]):
+        self.id = next(_span_ids)
+        self.parent_id = parent_id
+        self.op = op
+        self.name = name
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+
+class Trace:
+    """Спаны одного HTTP запроса."""
+
+    __slots__ = ("route", "started", "spans")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self.spans: list[Span] = []
+
+    def as_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "duration": time.perf_counter() - self.started,
+            "spans": [
+                {
+                    "id": span.id,
+                    "parent_id": span.parent_id,
+                    "op": span.op,
+                    "name": span.name,
+                    "start": span.start - self.started,
+                    "duration": span.duration,
+                }
+                for span in self.spans
+            ],
+        }
+
+
+trace_context: ContextVar[Optional[Trace]] = ContextVar("trace_context", default=None)
+current_span_id: ContextVar[Optional[int]] = ContextVar("current_span_id", default=None)
+
+
+class AdaptiveSampler:
+    """
+    Выборка трасс с ограничением количества на роут.
+
+    Вероятность выборки роута пересчитывается в конце каждого окна так, чтобы в следующем окне
+    набралось около ``per_route`` трасс, и не опускается ниже ``min_rate``.
+
+    :param per_route: желаемое количество трасс роута за окно
+    :param window: длительность окна (секунды)
+    :param min_rate: минимальная вероятность выборки
+    """
+
+    def __init__(self, per_route: int, window: float, min_rate: float = 0.001):
+        self.per_route = per_route
+        self.window = window
+        self.min_rate = min_rate
+        self._rates: dict[str, float] = {}
+        self._counts: dict[str, int] = defaultdict(int)
+        self._window_started = time.monotonic()
+
+    def _rotate(self, now: float) -> None:
+        elapsed_windows = max(1.0, (now - self._window_started) / self.window)
+        self._rates = {
+            route: max(self.min_rate, min(1.0, self.per_route * elapsed_windows / count))
+            for route, count in self._counts.items()
+        }
+        self._counts.clear()
+        self._window_started = now
+
+    def rate(self, route: str) -> float:
+        now = time.monotonic()
+        if now - self._window_started >= self.window:
+            self._rotate(now)
+        self._counts[route] += 1
+        return self._rates.get(route, 1.0)
+
+    def __call__(self, route: str) -> bool:
+        return random.random() < self.rate(route)
+
+
+class JsonSpanExporter:
+    """
+    Запись трасс в файл JSON lines (по трассе на строку).
+
+    Файл пишется отдельным потоком, а не в event loop: ``export`` только ставит трассу в очередь.
+    Поток сбрасывает накопленные трассы на диск раз в ``flush_interval`` секунд, при закрытии -
+    оставшиеся в очереди. Если поток не успевает за записью, трассы сверх ``max_queued`` отбрасываются.
+
+    :param flush_interval: интервал записи в файл (секунды)
+    :param max_queued: ограничение очереди трасс, ожидающих записи
+    """
+
+    def __init__(self, path: str, flush_interval: float = 1.0, max_queued: int = 10_000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(orjson.dumps(trace.as_dict()) + b"\n")
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        with open(self.path, "ab") as file:
+            while True:
+                deadline = time.monotonic() + self.flush_interval
+                lines: list[bytes] = []
+                closed = False
+                while not closed:
+                    try:
+                        line = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if line is None:
+                        closed = True
+                    else:
+                        lines.append(line)
+                if lines:
+                    try:
+                        file.writelines(lines)
+                        file.flush()
+                    except OSError:
+                        logger.exception(f"Unable to write spans to {self.path}")
+                if closed:
+                    return
+
+    def close(self) -> None:
+        """Записывает трассы, оставшиеся в очереди, и останавливает поток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+class Tracer:
+    def __init__(self):
+        self.sampler: Optional[AdaptiveSampler] = None
+        self.exporter: Optional[JsonSpanExporter] = None
+        self.sentry = False
+        # sentry_sdk.start_span, sentry_sdk импортируется только при включённом экспорте в Sentry
+        self.start_sentry_span: Optional[Callable] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sentry or self.exporter is not None
+
+
+tracer = Tracer()
+
+
+def configure_tracing(
+        sampler: AdaptiveSampler,
+        span_log: Optional[str] = None,
+        sentry: bool = False,
+) -> None:
+    """
+    Включает трассировку.
+
+    :param sampler: выборка трасс по роутам (для Sentry используется в ``traces_sampler``)
+    :param span_log: путь к файлу для локального экспорта спанов
+    :param sentry: экспортировать спаны в Sentry
+    """
+    tracer.sampler = sampler
+    tracer.exporter = JsonSpanExporter(span_log) if span_log else None
+    tracer.sentry = sentry
+    if sentry:
+        import sentry_sdk
+
+        tracer.start_sentry_span = sentry_sdk.start_span
+
+
+def sentry_traces_sampler(router: Router) -> Callable[[dict], float]:
+    """``traces_sampler`` для ``sentry_sdk.init`` на основе ``AdaptiveSampler``."""
+    resolve_route = RouteResolver(router)
+
+    def traces_sampler(sampling_context: dict) -> float:
+        scope = sampling_context.get("asgi_scope")
+        if tracer.sampler is None or not scope or scope.get("type") != "http":
+            return 0.0
+        return tracer.sampler.rate(f"{scope['method']} {resolve_route(scope)}")
+
+    return traces_sampler
+
+
+@contextlib.contextmanager
+def span(op: str, name: str) -> Iterator[None]:
+    """Спан внутри текущей трассы; вне выбранной трассы ничего не записывает."""
+    trace = trace_context.get()
+    if trace is None:
+        if tracer.sentry:
+            with tracer.start_sentry_span(op=op, description=name):
+                yield
+        else:
+            yield
+        return
+
+    current = Span(op, name, current_span_id.get())
+    token = current_span_id.set(current.id)
+    try:
+        yield
+    finally:
+        current.duration = time.perf_counter() - current.start
+        current_span_id.reset(token)
+        trace.spans.append(current)
+
+
+def traced(op: str, name: Optional[str] = None) -> Callable:
+    """
+    Декоратор, записывающий вызов функции как спан.
+
+    :param op: категория спана (``db``, ``serialization``, ``hashing``, ``file``, ``image``)
+    :param name: имя спана, по умолчанию - имя функции с модулем
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not tracer.enabled:
+                    return await fn(*args, **kwargs)
+                with span(op, span_name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with span(op, span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware, открывающая трассу для выбранных HTTP запросов и экспортирующая её в файл.
+
+    При экспорте в Sentry трассой управляет его интеграция, а выборка выполняется в ``traces_sampler``.
+    """
+
+    def __init__(self, app: ASGIApp, router: Router):
+        self.app = app
+        self.resolve_route = RouteResolver(router)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or tracer.exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {self.resolve_route(scope)}"
+        if not tracer.sampler(route):
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(route)
+        token = trace_context.set(trace)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            trace_context.reset(token)
+            try:
+                tracer.exporter.export(trace)
+            except OSError:
+                logger.warning("Unable to export trace", exc_info=True)
+
+
+def collapse(traces: Iterator[dict]) -> dict[str, float]:
+    """
+    Сворачивает трассы в стеки формата flame graph (``route;span;child`` -> собственное время, мкс).
+    """
+    stacks: dict[str, float] = defaultdict(float)
+    for trace in traces:
+        spans = {item["id"]: item for item in trace["spans"]}
+        children_time: dict[Optional[int], float] = defaultdict(float)
+        for item in spans.values():
+            children_time[item["parent_id"]] += item["duration"]
+
+        stacks[trace["route"]] += max(0.0, trace["duration"] - children_time[None]) * 1e6
+        for item in spans.values():
+            path = [item["name"]]
+            parent = spans.get(item["parent_id"])
+            while parent is not None:
+                path.append(parent["name"])
+                parent = spans.get(parent["parent_id"])
+            path.append(trace["route"])
+            self_time = max(0.0, item["duration"] - children_time[item["id"]])
+            stacks[";".join(reversed(path))] += self_time * 1e6
+    return stacks
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1], "rb") as span_log:
+        collapsed = collapse(orjson.loads(line) for line in span_log if line.strip())
+    for stack, microseconds in collapsed.items():
+        print(f"{stack} {int(microseconds)}")
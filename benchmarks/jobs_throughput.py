@@ -0,0 +1,100 @@
+"""
+Пропускная способность очереди фоновых задач.
+
+Заполняет очередь пустыми задачами и замеряет, сколько задач в секунду выполняют N воркеров
+(каждый воркер - отдельный ``JobWorker`` со своими соединениями с БД).
+
+Запуск (из корня репозитория, с переменными окружения БД)::
+
+    python benchmarks/jobs_throughput.py --jobs 20000 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "app/"))
+
+from sqlalchemy import delete, func, insert, select  # noqa: E402
+
+from models import Job  # noqa: E402
+from utils.database_connection import db_async_session_manager, get_async_engine  # noqa: E402
+from utils.jobs.queue import JOB_DONE  # noqa: E402
+from utils.jobs.worker import JobWorker, job_task  # noqa: E402
+
+QUEUE = "benchmark"
+TASK = "benchmark.noop"
+
+
+@job_task(TASK)
+async def noop(payload: dict) -> None:
+    pass
+
+
+async def fill_queue(jobs: int) -> None:
+    async with db_async_session_manager() as session:
+        await session.execute(delete(Job).where(Job.queue == QUEUE))
+        await session.execute(insert(Job), [{"queue": QUEUE, "task": TASK, "payload": {"n": i}} for i in range(jobs)])
+
+
+async def count_done() -> int:
+    async with db_async_session_manager() as session:
+        query = select(func.count()).select_from(Job).where(Job.queue == QUEUE, Job.status == JOB_DONE)
+        return (await session.execute(query)).scalar_one()
+
+
+async def run_case(jobs: int, workers: int, concurrency: int, batch_size: int) -> dict:
+    await fill_queue(jobs)
+
+    pool = [
+        JobWorker({QUEUE: concurrency}, batch_size=batch_size, poll_interval=0.05, worker_id=f"bench-{i}")
+        for i in range(workers)
+    ]
+    started = time.perf_counter()
+    runners = [asyncio.create_task(worker.run()) for worker in pool]
+
+    while sum(worker.processed for worker in pool) < jobs:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    for worker in pool:
+        worker.stop()
+    await asyncio.gather(*runners)
+
+    done = await count_done()
+    return {
+        "workers": workers,
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "jobs": jobs,
+        "done": done,
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round(jobs / elapsed, 1),
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    # логирование каждого запроса искажает замер
+    get_async_engine().sync_engine.echo = False
+
+    results = []
+    for workers in args.workers:
+        result = await run_case(args.jobs, workers, args.concurrency, args.batch_size)
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+
+    async with db_async_session_manager() as session:
+        await session.execute(delete(Job).where(Job.queue == QUEUE))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--concurrency", type=int, default=8, help="одновременно выполняемых задач на воркер")
+    parser.add_argument("--batch-size", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
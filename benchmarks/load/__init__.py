@@ -0,0 +1,20 @@
+"""
+Нагрузочное тестирование сервиса на подготовленном наборе данных.
+
+Запуск из корня репозитория (с переменными окружения БД, к которой применены миграции)::
+
+    # загрузка данных (манифест с диапазонами id сохраняется в benchmarks/load/manifest.json)
+    python -m benchmarks.load seed --users 20000 --orders 50000 --chats 10000 --reviews 30000
+
+    # сценарии против локально запущенного сервиса, отчёт в JSON
+    python -m benchmarks.load run --duration 30 --users 50 --output results/$(git rev-parse --short HEAD).json
+
+    # против уже запущенного сервиса
+    python -m benchmarks.load run --url http://localhost:7001 --scenarios order_feed inbox_polling
+
+    # сравнение с прошлым отчётом, код возврата 1 при регрессии больше порога
+    python -m benchmarks.load compare results/base.json results/new.json --threshold 10
+
+    # удаление загруженных данных
+    python -m benchmarks.load drop
+"""
@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import pathlib
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.load import __doc__ as usage
+from benchmarks.load.scenarios import SCENARIOS, run_scenario
+from benchmarks.load.server import running_app
+from benchmarks.load.stats import compare
+
+DEFAULT_MANIFEST = pathlib.Path(__file__).parent / "manifest.json"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True).strip()  # noqa: S603, S607
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def command_seed(args: argparse.Namespace) -> None:
+    # импорт конфигурации сервиса требует переменных окружения БД, нужен только для seed/drop
+    from benchmarks.load.seed import seed
+
+    manifest = asyncio.run(seed(
+        args.users, args.orders, args.chats, args.reviews, args.max_messages, args.seed, args.manifest,
+    ))
+    print(json.dumps(manifest, indent=2))
+
+
+def command_drop(args: argparse.Namespace) -> None:
+    from benchmarks.load.seed import drop
+
+    asyncio.run(drop(args.manifest))
+
+
+def command_run(args: argparse.Namespace) -> None:
+    manifest = json.loads(args.manifest.read_text())
+    app = contextlib.nullcontext(args.url) if args.url else running_app(args.port, args.workers)
+
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "users": args.users,
+            "duration": args.duration,
+            "workers": None if args.url else args.workers,
+            "seed": args.seed,
+            "dataset": {key: manifest[key] for key in ("users", "orders", "chats", "messages", "reviews")},
+        },
+        "scenarios": {},
+    }
+    with app as url:
+        for name in args.scenarios:
+            result = asyncio.run(run_scenario(name, url, manifest, args.users, args.duration, args.seed))
+            report["scenarios"][name] = result
+            print(f"{name}: {result['rps']} rps, {result['errors']} errors", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(output)
+    print(output)
+
+
+def command_compare(args: argparse.Namespace) -> None:
+    rows = compare(json.loads(args.baseline.read_text()), json.loads(args.current.read_text()), args.threshold)
+    for row in rows:
+        mark = "REGRESSION" if row["regression"] else ""
+        print(
+            f"{row['scenario']:<15} {row['endpoint']:<40} {row['metric']:<7} "
+            f"{row['baseline']:>10} -> {row['current']:>10} ({row['change_pct']:+.1f}%) {mark}"
+        )
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.load", description=usage, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--manifest", type=pathlib.Path, default=DEFAULT_MANIFEST)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="загрузить данные")
+    seed_parser.add_argument("--users", type=int, default=10000)
+    seed_parser.add_argument("--orders", type=int, default=30000)
+    seed_parser.add_argument("--chats", type=int, default=5000)
+    seed_parser.add_argument("--reviews", type=int, default=20000)
+    seed_parser.add_argument("--max-messages", type=int, default=5000, help="максимальная длина переписки")
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.set_defaults(handler=command_seed)
+
+    drop_parser = commands.add_parser("drop", help="удалить загруженные данные")
+    drop_parser.set_defaults(handler=command_drop)
+
+    run_parser = commands.add_parser("run", help="выполнить сценарии")
+    run_parser.add_argument("--url", help="адрес запущенного сервиса, иначе сервис запускается локально")
+    run_parser.add_argument("--port", type=int, default=7101)
+    run_parser.add_argument("--workers", type=int, default=1)
+    run_parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    run_parser.add_argument("--users", type=int, default=50, help="виртуальных пользователей")
+    run_parser.add_argument("--duration", type=float, default=30, help="длительность сценария (секунды)")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--output", type=pathlib.Path)
+    run_parser.set_defaults(handler=command_run)
+
+    compare_parser = commands.add_parser("compare", help="сравнить два отчёта")
+    compare_parser.add_argument("baseline", type=pathlib.Path)
+    compare_parser.add_argument("current", type=pathlib.Path)
+    compare_parser.add_argument("--threshold", type=float, default=10, help="допустимое ухудшение, %%")
+    compare_parser.set_defaults(handler=command_compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Сценарии нагрузки.
+
+Каждый сценарий - корутина одного виртуального пользователя, которая в цикле выполняет запросы
+до истечения времени. Латентности пишутся в ``Recorder`` под шаблоном пути эндпоинта,
+чтобы запросы к разным id агрегировались вместе.
+"""
+import asyncio
+import random
+import struct
+import time
+import zlib
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from benchmarks.load.stats import Recorder
+
+
+class VirtualUser:
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, manifest: dict, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.manifest = manifest
+        self.rng = rng
+        self.user_id: Optional[int] = None
+
+    def pick(self, key: str) -> int:
+        start, stop = self.manifest[key]
+        return self.rng.randrange(start, stop)
+
+    async def request(
+            self, endpoint: str, method: str, url: str, record: bool = True, **kwargs,  # noqa: ANN003
+    ) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            pass
+        if record:
+            self.recorder.record(endpoint, time.perf_counter() - started, response.status_code if response else None)
+        return response
+
+    async def login(self, record: bool = True) -> None:
+        """Вход случайным тестовым пользователем, токен сохраняется в cookies клиента."""
+        self.user_id = self.pick("users")
+        await self.request(
+            "POST /user/login", "POST", "/user/login", record=record,
+            json={"login": f"{self.manifest['login_prefix']}{self.user_id}", "password": self.manifest["password"]},
+        )
+
+
+async def login_storm(user: VirtualUser) -> None:
+    """Массовый вход: каждый запрос - проверка pbkdf2 хэша."""
+    await user.login()
+
+
+async def inbox_polling(user: VirtualUser) -> None:
+    """Опрос списка чатов и чтение сообщений."""
+    await user.request("POST /chats/get_my_chats", "POST", "/chats/get_my_chats")
+    await user.request("GET /chats/message/{message_id}", "GET", f"/chats/message/{user.pick('messages')}")
+    await asyncio.sleep(user.rng.uniform(0.05, 0.2))
+
+
+async def order_feed(user: VirtualUser) -> None:
+    """Просмотр ленты заказов с фильтрами и карточек заказов."""
+    params = {"skip": user.rng.randrange(0, 200), "limit": 20}
+    if user.rng.random() < 0.5:
+        params["category_id"] = user.rng.choice(user.manifest["categories"])
+    if user.rng.random() < 0.3:
+        params["min_price"] = user.rng.randint(1, 100) * 100
+    await user.request("GET /orders/active", "GET", "/orders/active", params=params)
+    await user.request("GET /orders/by-order/{order_id}", "GET", f"/orders/by-order/{user.pick('orders')}")
+    await user.request("GET /orders/by-author/{author_id}", "GET", f"/orders/by-author/{user.pick('clients')}")
+
+
+async def message_burst(user: VirtualUser) -> None:
+    """Серия сообщений в один чат."""
+    chat_id = user.pick("chats")
+    for _ in range(user.rng.randint(3, 10)):
+        await user.request(
+            "POST /chats/message/create", "POST", "/chats/message/create",
+            json={"authorId": user.user_id, "chatId": chat_id, "text": "benchmark message"},
+        )
+
+
+def png(width: int, height: int, seed: int) -> bytes:
+    """Несжимаемое RGB изображение в формате PNG (без зависимостей)."""
+    rng = random.Random(seed)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = b"".join(b"\x00" + rng.randbytes(width * 3) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows, 1))
+        + chunk(b"IEND", b"")
+    )
+
+
+async def uploads(user: VirtualUser) -> None:
+    """Загрузка изображений (генерация вариантов выполняется в фоне)."""
+    content = png(640, 480, user.rng.randrange(1 << 30))
+    await user.request(
+        "POST /files/create", "POST", "/files/create",
+        params={"path": "benchmark"},
+        files={"file": ("image.png", content, "image/png")},
+    )
+
+
+Scenario = Callable[[VirtualUser], Awaitable[None]]
+
+SCENARIOS: dict[str, tuple[Scenario, bool]] = {
+    # сценарий, нужен ли вход перед началом
+    "login_storm": (login_storm, False),
+    "inbox_polling": (inbox_polling, True),
+    "order_feed": (order_feed, False),
+    "message_burst": (message_burst, True),
+    "uploads": (uploads, True),
+}
+
+
+async def run_scenario(
+        name: str,
+        base_url: str,
+        manifest: dict,
+        users: int,
+        duration: float,
+        seed: int,
+) -> dict:
+    """Выполняет сценарий ``users`` виртуальными пользователями в течение ``duration`` секунд."""
+    scenario, needs_login = SCENARIOS[name]
+    recorder = Recorder()
+    clients = [httpx.AsyncClient(base_url=base_url, timeout=30) for _ in range(users)]
+    virtual_users = [
+        VirtualUser(client, recorder, manifest, random.Random(seed * 100_003 + n))
+        for n, client in enumerate(clients)
+    ]
+
+    try:
+        if needs_login:
+            # вход до начала замера, не учитывается в статистике сценария
+            await asyncio.gather(*(user.login(record=False) for user in virtual_users))
+
+        deadline = time.perf_counter() + duration
+
+        async def loop(user: VirtualUser) -> None:
+            while time.perf_counter() < deadline:
+                await scenario(user)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(loop(user) for user in virtual_users))
+        return recorder.summary(time.perf_counter() - started)
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients))
@@ -0,0 +1,254 @@
+"""
+Наполнение БД данными для нагрузочного тестирования.
+
+Данные генерируются детерминированно (``--seed``) и загружаются через ``COPY``
+(``asyncpg.copy_records_to_table``), поэтому сотни тысяч строк загружаются за секунды.
+Идентификаторы назначаются явно, начиная с текущего максимума таблицы, после загрузки
+последовательности сдвигаются. Диапазоны идентификаторов и логины сохраняются в манифест,
+по которому работают сценарии и удаление данных (``drop``).
+"""
+import json
+import pathlib
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import asyncpg
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent.parent / "app/"))
+
+from core.config import Config  # noqa: E402
+from utils.auth.passwwords import generate_password_hash  # noqa: E402
+
+PASSWORD = "benchmark-password"
+LOGIN_PREFIX = "bench_user_"
+
+ROLES = ("client", "executor")
+CATEGORIES = ("development", "design", "copywriting", "marketing", "translation")
+ORDER_STATUSES = ("open", "in_progress", "completed", "cancelled")
+
+WORDS = (
+    "срочно нужен сайт лендинг логотип дизайн перевод статьи бот телеграм парсер интеграция "
+    "оплата правки макет текст презентация видео монтаж база данных api мобильное приложение"
+).split()
+
+
+def connection_string() -> str:
+    return Config.db_conn_str
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def history_length(rng: random.Random, max_messages: int) -> int:
+    """Длина переписки: большинство чатов короткие, единицы - с глубокой историей (распределение Парето)."""
+    return min(max_messages, int(rng.paretovariate(1.2) * 5))
+
+
+async def next_id(conn: asyncpg.Connection, table: str) -> int:
+    return await conn.fetchval(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")  # noqa: S608
+
+
+async def ensure_dictionary(conn: asyncpg.Connection, table: str, names: tuple[str, ...]) -> dict[str, int]:
+    """Справочник (роли, категории, статусы): создаёт отсутствующие записи и возвращает id по имени."""
+    now = datetime.utcnow()
+    timestamps = ", created_at, updated_at" if table != "order_statuses" else ""
+    values = ", $2, $2" if timestamps else ""
+    for name in names:
+        await conn.execute(
+            f"INSERT INTO {table} (name{timestamps}) VALUES ($1{values}) ON CONFLICT (name) DO NOTHING",  # noqa: S608
+            name, *((now,) if timestamps else ()),
+        )
+    rows = await conn.fetch(f"SELECT id, name FROM {table} WHERE name = ANY($1)", list(names))  # noqa: S608
+    return {row["name"]: row["id"] for row in rows}
+
+
+async def copy(conn: asyncpg.Connection, table: str, columns: tuple[str, ...], records: list[tuple]) -> float:
+    started = time.perf_counter()
+    await conn.copy_records_to_table(table, records=records, columns=columns)
+    return time.perf_counter() - started
+
+
+async def seed(
+        users: int,
+        orders: int,
+        chats: int,
+        reviews: int,
+        max_messages: int,
+        seed_value: int,
+        manifest_path: pathlib.Path,
+) -> dict:
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+
+    conn = await asyncpg.connect(connection_string())
+    try:
+        roles = await ensure_dictionary(conn, "roles", ROLES)
+        categories = list((await ensure_dictionary(conn, "categories", CATEGORIES)).values())
+        statuses = await ensure_dictionary(conn, "order_statuses", ORDER_STATUSES)
+
+        first_user = await next_id(conn, "users")
+        first_order = await next_id(conn, "orders")
+        first_chat = await next_id(conn, "chats")
+        first_message = await next_id(conn, "messages")
+        first_review = await next_id(conn, "reviews")
+        timings = {}
+
+        user_ids = list(range(first_user, first_user + users))
+        # первая половина - заказчики, вторая - исполнители
+        clients, executors = user_ids[:users // 2], user_ids[users // 2:]
+        client_ids = set(clients)
+        user_rows = [
+            (
+                user_id,
+                roles["client"] if user_id in client_ids else roles["executor"],
+                f"{LOGIN_PREFIX}{user_id}",
+                f"{LOGIN_PREFIX}{user_id}@bench.example.com",
+                sentence(rng, 1),
+                sentence(rng, 1),
+                sentence(rng, 12),
+                password_hash,
+                now - timedelta(days=rng.randint(0, 365)),
+                now,
+            )
+            for user_id in user_ids
+        ]
+        timings["users"] = await copy(
+            conn, "users",
+            ("id", "role_id", "login", "email", "last_name", "first_name", "description", "password",
+             "created_at", "updated_at"),
+            user_rows,
+        )
+
+        order_ids = list(range(first_order, first_order + orders))
+        order_rows = []
+        for order_id in order_ids:
+            created = now - timedelta(hours=rng.randint(0, 24 * 180))
+            price = Decimal(rng.randint(10, 5000) * 100)
+            order_rows.append((
+                order_id,
+                sentence(rng, 4),
+                sentence(rng, 40),
+                rng.choice(clients),
+                rng.choice(categories),
+                price,
+                price + rng.randint(0, 50) * 100,
+                statuses["open"] if rng.random() < 0.6 else rng.choice(list(statuses.values())),
+                created + timedelta(days=rng.randint(1, 60)),
+                created,
+                created,
+            ))
+        timings["orders"] = await copy(
+            conn, "orders",
+            ("id", "name", "description", "author_id", "category_id", "start_price", "expected_price",
+             "status_id", "deadline", "created_at", "updated_at"),
+            order_rows,
+        )
+
+        chat_ids = list(range(first_chat, first_chat + chats))
+        chat_rows, association_rows, message_rows = [], [], []
+        message_id = first_message
+        for chat_id in chat_ids:
+            order = rng.choice(order_rows)
+            client_id, executor_id = order[3], rng.choice(executors)
+            started = order[9]
+            messages = history_length(rng, max_messages)
+            for n in range(messages):
+                message_rows.append((
+                    message_id,
+                    client_id if n % 2 == 0 else executor_id,
+                    chat_id,
+                    sentence(rng, rng.randint(3, 30)),
+                    started + timedelta(minutes=n * 7),
+                    started + timedelta(minutes=n * 7),
+                ))
+                message_id += 1
+            last_message_at = started + timedelta(minutes=max(0, messages - 1) * 7) if messages else None
+            chat_rows.append((chat_id, order[1], client_id, order[0], last_message_at, started, started))
+            association_rows.append((chat_id, client_id, executor_id, started, started))
+
+        timings["chats"] = await copy(
+            conn, "chats",
+            ("id", "name", "client_id", "order_id", "last_message_at", "created_at", "updated_at"),
+            chat_rows,
+        )
+        timings["chat_user_associations"] = await copy(
+            conn, "chat_user_associations",
+            ("chat_id", "client_id", "executor_id", "created_at", "updated_at"),
+            association_rows,
+        )
+        timings["messages"] = await copy(
+            conn, "messages",
+            ("id", "author_id", "chat_id", "text", "created_at", "updated_at"),
+            message_rows,
+        )
+
+        review_ids = list(range(first_review, first_review + reviews))
+        review_rows = [
+            (
+                review_id,
+                rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 3, 8, 12))[0],
+                sentence(rng, 15),
+                rng.choice(clients),
+                rng.choice(executors),
+                now - timedelta(days=rng.randint(0, 365)),
+                now,
+            )
+            for review_id in review_ids
+        ]
+        timings["reviews"] = await copy(
+            conn, "reviews",
+            ("id", "rating", "comment", "reviewer_id", "reviewed_id", "created_at", "updated_at"),
+            review_rows,
+        )
+
+        for table in ("users", "orders", "chats", "messages", "reviews"):
+            await conn.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"  # noqa: S608
+            )
+        await conn.execute("ANALYZE users, orders, chats, chat_user_associations, messages, reviews")
+    finally:
+        await conn.close()
+
+    manifest = {
+        "seed": seed_value,
+        "login_prefix": LOGIN_PREFIX,
+        "password": PASSWORD,
+        "users": [first_user, first_user + users],
+        "clients": [clients[0], clients[-1] + 1] if clients else [],
+        "executors": [executors[0], executors[-1] + 1] if executors else [],
+        "orders": [first_order, first_order + orders],
+        "chats": [first_chat, first_chat + chats],
+        "messages": [first_message, message_id],
+        "reviews": [first_review, first_review + reviews],
+        "categories": categories,
+        "copy_seconds": {table: round(seconds, 3) for table, seconds in timings.items()},
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+async def drop(manifest_path: pathlib.Path) -> None:
+    """Удаляет данные, загруженные по манифесту."""
+    manifest = json.loads(manifest_path.read_text())
+    conn = await asyncpg.connect(connection_string())
+    try:
+        async with conn.transaction():
+            chats = manifest["chats"]
+            await conn.execute("DELETE FROM messages WHERE chat_id >= $1 AND chat_id < $2", *chats)
+            await conn.execute("DELETE FROM chat_user_associations WHERE chat_id >= $1 AND chat_id < $2", *chats)
+            await conn.execute("DELETE FROM chats WHERE id >= $1 AND id < $2", *chats)
+            await conn.execute("DELETE FROM reviews WHERE id >= $1 AND id < $2", *manifest["reviews"])
+            users = manifest["users"]
+            # заказы и сообщения, созданные сценариями, тоже принадлежат тестовым пользователям
+            await conn.execute("DELETE FROM notification_outbox WHERE recipient_id >= $1 AND recipient_id < $2", *users)
+            await conn.execute("DELETE FROM messages WHERE author_id >= $1 AND author_id < $2", *users)
+            await conn.execute("DELETE FROM orders WHERE author_id >= $1 AND author_id < $2", *users)
+            await conn.execute("DELETE FROM users WHERE id >= $1 AND id < $2", *users)
+    finally:
+        await conn.close()
+    manifest_path.unlink()
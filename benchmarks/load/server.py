@@ -0,0 +1,52 @@
+"""
+Запуск сервиса для нагрузочного теста.
+"""
+import contextlib
+import os
+import pathlib
+import signal
+import subprocess
+import sys
+import time
+from typing import Iterator
+
+import httpx
+
+APP_DIR = pathlib.Path(__file__).parent.parent.parent / "app"
+
+
+@contextlib.contextmanager
+def running_app(port: int, workers: int, startup_timeout: float = 60) -> Iterator[str]:
+    """Запускает uvicorn с сервисом и возвращает его адрес после того, как сервис начал отвечать."""
+    env = {**os.environ, "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")}
+    process = subprocess.Popen(  # noqa: S603
+        [
+            sys.executable, "-m", "uvicorn", "--factory", "main:create_app",
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--workers", str(workers),
+            "--no-access-log",
+        ],
+        cwd=APP_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Application exited with code {process.returncode}")
+            try:
+                httpx.get(f"{url}/", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Application did not start in time") from None
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
@@ -0,0 +1,84 @@
+"""
+Сбор латентностей запросов, расчёт перцентилей и сравнение отчётов.
+"""
+import math
+from collections import defaultdict
+from typing import Optional
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Перцентиль методом nearest-rank."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+class Recorder:
+    """Латентности и ошибки запросов по эндпоинтам (шаблонам путей)."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, latency: float, status: Optional[int]) -> None:
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status or 0] += 1
+        if status is None or status >= 400:
+            self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            values = sorted(latencies)
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "statuses": {str(status): count for status, count in sorted(self.statuses[endpoint].items())},
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 2),
+                "p95_ms": round(percentile(values, 95) * 1000, 2),
+                "p99_ms": round(percentile(values, 99) * 1000, 2),
+                "max_ms": round(values[-1] * 1000, 2),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "seconds": round(elapsed, 3),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[dict]:
+    """
+    Сравнивает два отчёта по эндпоинтам каждого сценария.
+
+    Регрессия - рост p95/p99 или падение rps больше чем на ``threshold`` процентов.
+    """
+    rows = []
+    for scenario, result in current["scenarios"].items():
+        base_scenario = baseline["scenarios"].get(scenario)
+        if base_scenario is None:
+            continue
+        for endpoint, stats in result["endpoints"].items():
+            base = base_scenario["endpoints"].get(endpoint)
+            if base is None:
+                continue
+            for metric, higher_is_worse in (("p95_ms", True), ("p99_ms", True), ("rps", False)):
+                if not base[metric]:
+                    continue
+                change = (stats[metric] - base[metric]) / base[metric] * 100
+                regression = change > threshold if higher_is_worse else change < -threshold
+                rows.append({
+                    "scenario": scenario,
+                    "endpoint": endpoint,
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": stats[metric],
+                    "change_pct": round(change, 1),
+                    "regression": regression,
+                })
+    return rows
@@ -0,0 +1,270 @@
+"""
+Микробенчмарки CPU-bound операций, выполняемых на каждом запросе.
+
+Каждый бенчмарк калибруется (количество вызовов в замере подбирается так, чтобы замер длился
+около ``--target-time``), после чего выполняется ``--repeats`` замеров; результат - время одного
+вызова в каждом замере. Сравнение с прошлым запуском выполняется по медиане и U-критерию
+Манна-Уитни: регрессией считается рост медианы больше ``--threshold`` процентов
+при статистически значимом различии (p < ``--alpha``).
+
+Запуск (из корня репозитория, с переменными окружения конфигурации)::
+
+    python benchmarks/micro.py --output micro-base.json
+    # ... изменения ...
+    python benchmarks/micro.py --compare micro-base.json --threshold 5
+    python benchmarks/micro.py --filter json pydantic
+"""
+import argparse
+import gc
+import json
+import math
+import pathlib
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "app/"))
+
+import jwt  # noqa: E402
+
+from core.config import Config  # noqa: E402
+from schemas.chats import MessageCreate  # noqa: E402
+from schemas.order import OrderModel  # noqa: E402
+from schemas.users import RegisterUserIn  # noqa: E402
+from utils.auth.passwwords import create_access_token, generate_password_hash, verify_password  # noqa: E402
+from utils.json_serialization import dumps, loads  # noqa: E402
+from utils.utils import to_camel  # noqa: E402
+
+BENCHMARKS: dict[str, Callable[[], object]] = {}
+
+
+def benchmark(name: str) -> Callable:
+    def decorator(fn: Callable[[], Callable[[], object]]) -> Callable:
+        BENCHMARKS[name] = fn
+        return fn
+
+    return decorator
+
+
+# Бенчмарк - фабрика: подготавливает данные и возвращает замеряемую функцию без аргументов.
+
+ORDERS_PAGE = [
+    {
+        "id": i,
+        "name": f"Order {i}",
+        "description": "Разработка интеграции с платёжным сервисом " * 5,
+        "author_id": i % 97,
+        "category_id": i % 5,
+        "start_price": 1500.0 + i,
+        "expected_price": 2500.0 + i,
+        "status_id": 1,
+        "deadline": datetime(2025, 1, 1) + timedelta(days=i),
+        "created_at": datetime(2024, 1, 1) + timedelta(hours=i),
+        "updated_at": None,
+        "deleted_at": None,
+    }
+    for i in range(50)
+]
+
+
+@benchmark("json.dumps_orders_page")
+def bench_dumps() -> Callable[[], object]:
+    return lambda: dumps(ORDERS_PAGE)
+
+
+@benchmark("json.loads_orders_page")
+def bench_loads() -> Callable[[], object]:
+    payload = dumps(ORDERS_PAGE)
+    return lambda: loads(payload)
+
+
+@benchmark("to_camel")
+def bench_to_camel() -> Callable[[], object]:
+    fields = ["author_id", "start_price", "expected_price", "status_id", "last_message_at", "first_name"]
+    return lambda: [to_camel(field) for field in fields]
+
+
+@benchmark("pydantic.register_user_in")
+def bench_register_user_in() -> Callable[[], object]:
+    data = {
+        "login": "benchmark_user",
+        "password": "benchmark-password",
+        "email": "benchmark@example.com",
+        "lastName": "Иванов",
+        "firstName": "Иван",
+        "roleId": 1,
+    }
+    return lambda: RegisterUserIn.model_validate(data)
+
+
+@benchmark("pydantic.order_model")
+def bench_order_model() -> Callable[[], object]:
+    data = {
+        "authorId": 1,
+        "name": "Лендинг для кофейни",
+        "description": "Нужен одностраничный сайт " * 10,
+        "startPrice": 15000,
+        "deadline": "2025-06-01T12:00:00",
+        "categoryId": 2,
+    }
+    return lambda: OrderModel.model_validate(data)
+
+
+@benchmark("pydantic.message_create")
+def bench_message_create() -> Callable[[], object]:
+    data = {"authorId": 1, "chatId": 42, "text": "Здравствуйте! Когда сможете приступить?"}
+    return lambda: MessageCreate.model_validate(data)
+
+
+@benchmark("jwt.encode_access_token")
+def bench_jwt_encode() -> Callable[[], object]:
+    return lambda: create_access_token({"login": "benchmark_user", "id": 1})
+
+
+@benchmark("jwt.decode_access_token")
+def bench_jwt_decode() -> Callable[[], object]:
+    token = create_access_token({"login": "benchmark_user", "id": 1})
+    return lambda: jwt.decode(token, Config.SECRET_KEY, algorithms=[Config.ALGORITHM])
+
+
+@benchmark("pbkdf2.verify")
+def bench_pbkdf2_verify() -> Callable[[], object]:
+    password_hash = generate_password_hash("benchmark-password")
+    return lambda: verify_password("benchmark-password", password_hash)
+
+
+def calibrate(fn: Callable[[], object], target_time: float) -> int:
+    """Количество вызовов, при котором замер длится не меньше ``target_time``."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= target_time / 10:
+            return max(1, math.ceil(loops * target_time / elapsed))
+        loops *= 10
+
+
+def measure(fn: Callable[[], object], repeats: int, target_time: float) -> dict:
+    loops = calibrate(fn, target_time)
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            samples.append((time.perf_counter() - started) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        "loops": loops,
+        "median_us": statistics.median(samples) * 1e6,
+        "iqr_us": (quartiles[2] - quartiles[0]) * 1e6,
+        "stdev_us": statistics.stdev(samples) * 1e6 if len(samples) > 1 else 0.0,
+        "samples_us": [sample * 1e6 for sample in samples],
+    }
+
+
+def mann_whitney_p(a: list[float], b: list[float]) -> float:
+    """Двусторонний p-value U-критерия Манна-Уитни (нормальная аппроксимация с поправкой на связки)."""
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+    combined = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(combined)
+    ties = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = rank
+        size = j - i + 1
+        ties += size ** 3 - size
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    z = (abs(u - n1 * n2 / 2) - 0.5) / sigma
+    return math.erfc(max(0.0, z) / math.sqrt(2))
+
+
+def compare(baseline: dict, current: dict, threshold: float, alpha: float) -> list[dict]:
+    rows = []
+    for name, result in current["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        change = (result["median_us"] - base["median_us"]) / base["median_us"] * 100
+        p_value = mann_whitney_p(base["samples_us"], result["samples_us"])
+        significant = p_value < alpha
+        rows.append({
+            "name": name,
+            "baseline_us": base["median_us"],
+            "current_us": result["median_us"],
+            "change_pct": change,
+            "p_value": p_value,
+            "verdict": (
+                "regression" if significant and change > threshold
+                else "improvement" if significant and change < -threshold
+                else "same"
+            ),
+        })
+    return rows
+
+
+def main(args: argparse.Namespace) -> None:
+    selected = {
+        name: factory for name, factory in BENCHMARKS.items()
+        if not args.filter or any(pattern in name for pattern in args.filter)
+    }
+    results = {}
+    for name, factory in selected.items():
+        result = measure(factory(), args.repeats, args.target_time)
+        results[name] = result
+        print(
+            f"{name:<30} {result['median_us']:>12.3f} us  ±{result['iqr_us']:.3f} (IQR)  x{result['loops']}",
+            file=sys.stderr,
+        )
+
+    report = {"python": sys.version, "benchmarks": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        rows = compare(json.loads(args.compare.read_text()), report, args.threshold, args.alpha)
+        print(file=sys.stderr)
+        for row in rows:
+            print(
+                f"{row['name']:<30} {row['baseline_us']:>12.3f} -> {row['current_us']:>12.3f} us "
+                f"({row['change_pct']:+6.1f}%, p={row['p_value']:.4f}) {row['verdict'].upper()}",
+                file=sys.stderr,
+            )
+        if any(row["verdict"] == "regression" for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20, help="количество замеров")
+    parser.add_argument("--target-time", type=float, default=0.05, help="длительность одного замера (секунды)")
+    parser.add_argument("--filter", nargs="+", help="запускать бенчмарки, имя которых содержит подстроку")
+    parser.add_argument("--output", type=pathlib.Path, help="сохранить результаты в JSON")
+    parser.add_argument("--compare", type=pathlib.Path, help="сравнить с сохранёнными результатами")
+    parser.add_argument("--threshold", type=float, default=5, help="допустимый рост медианы, %%")
+    parser.add_argument("--alpha", type=float, default=0.01, help="уровень значимости")
+    main(parser.parse_args())
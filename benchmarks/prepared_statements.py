@@ -0,0 +1,125 @@
+"""
+Задержка горячих запросов с кэшем подготовленных запросов asyncpg и без него.
+
+Без кэша (режим PgBouncer, ``DB_PGBOUNCER=true``) каждый запрос выполняется в два обращения
+к серверу: подготовка (Parse/Describe) и выполнение, с кэшем подготовка выполняется один раз
+на соединение. Каждый режим замеряется на отдельном движке с одним соединением, запросы
+выполняются последовательно.
+
+Запуск (из корня репозитория, с переменными окружения БД, на данных ``benchmarks.load seed``)::
+
+    python benchmarks/prepared_statements.py --iterations 2000
+    python benchmarks/prepared_statements.py --modes prepared pgbouncer --output prepared.json
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import statistics
+import sys
+import time
+from typing import Callable
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "app/"))
+
+from sqlalchemy import func, or_, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from core.config import Config  # noqa: E402
+from models import Message, Order, User  # noqa: E402
+from utils.factory import asyncpg_connect_args  # noqa: E402
+
+MODES = {
+    "prepared": dict(statement_cache_size=Config.db_statement_cache_size or 100),
+    "pgbouncer": dict(pgbouncer=True),
+}
+
+# имя -> (функция, возвращающая запрос по случайному id)
+QUERIES: dict[str, Callable[[int], object]] = {
+    "user_by_id": lambda i: select(User).where(User.id == i).order_by(User.deleted_at.desc()),
+    "order_by_id": lambda i: select(Order).where(Order.id == i),
+    "active_orders_page": lambda i: (
+        select(Order).where(Order.status_id == 1, Order.category_id == i % 5 + 1).offset(i % 100).limit(20)
+    ),
+    "chat_messages": lambda i: (
+        select(Message).where(Message.chat_id == i).order_by(Message.created_at.desc()).limit(50)
+    ),
+    "users_exists": lambda i: select(User).where(
+        or_(func.lower(User.login) == f"bench_user_{i}", func.lower(User.email) == f"bench_user_{i}@example.com")
+    ),
+}
+
+
+async def max_id(connection: AsyncConnection, model: type) -> int:
+    return (await connection.execute(select(func.coalesce(func.max(model.id), 1)))).scalar()
+
+
+async def run_mode(mode: str, iterations: int, seed: int) -> dict:
+    engine = create_async_engine(
+        Config.async_db_conn_str,
+        poolclass=NullPool,
+        connect_args=asyncpg_connect_args(application_name="benchmark-prepared", **MODES[mode]),
+    )
+    results = {}
+    try:
+        async with engine.connect() as connection:
+            ranges = {
+                "user_by_id": await max_id(connection, User),
+                "order_by_id": await max_id(connection, Order),
+                "active_orders_page": 1000,
+                "chat_messages": await max_id(connection, Message),
+                "users_exists": await max_id(connection, User),
+            }
+            for name, build in QUERIES.items():
+                rng = random.Random(seed)
+                # прогрев: подготовка запроса и кэши SQLAlchemy
+                for _ in range(10):
+                    await connection.execute(build(rng.randint(1, ranges[name])))
+
+                samples = []
+                for _ in range(iterations):
+                    query = build(rng.randint(1, ranges[name]))
+                    started = time.perf_counter()
+                    (await connection.execute(query)).fetchall()
+                    samples.append((time.perf_counter() - started) * 1e6)
+
+                results[name] = {
+                    "median_us": statistics.median(samples),
+                    "p95_us": statistics.quantiles(samples, n=20)[18],
+                }
+    finally:
+        await engine.dispose()
+    return results
+
+
+async def main(args: argparse.Namespace) -> None:
+    report = {mode: await run_mode(mode, args.iterations, args.seed) for mode in args.modes}
+
+    compared = "prepared" in report and "pgbouncer" in report
+    print(
+        f"{'query':<22}" + "".join(f"{mode + ' p50/p95, us':>30}" for mode in args.modes)
+        + (f"{'pgbouncer vs prepared':>24}" if compared else "")
+    )
+    for name in QUERIES:
+        row = f"{name:<22}"
+        for mode in args.modes:
+            result = report[mode][name]
+            row += f"{result['median_us']:>20.0f} / {result['p95_us']:>7.0f}"
+        if compared:
+            change = report["pgbouncer"][name]["median_us"] / report["prepared"][name]["median_us"] - 1
+            row += f"{change * 100:>+23.1f}%"
+        print(row)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--iterations", type=int, default=1000, help="запросов каждого вида в режиме")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=pathlib.Path, help="сохранить результаты в JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,150 @@
+"""
+Чтение списков: ORM объекты против колонок Core в DTO.
+
+ORM путь - прежний путь роутов: ``select(Model)`` в сессию, ``jsonable_encoder`` и ``json.dumps``
+(так FastAPI сериализует возвращённые объекты). Core путь - ``utils.rows``: ``select`` колонок,
+``@dataclass(slots=True)`` DTO и orjson. Для каждого пути замеряются время загрузки и сериализации
+в пересчёте на 10k строк и память: пик ``tracemalloc`` за загрузку и сериализацию и память,
+удерживаемая загруженными строками (с identity map сессии для ORM), в пересчёте на строку.
+
+Запуск (из корня репозитория, с переменными окружения БД, на данных ``benchmarks.load seed``)::
+
+    python benchmarks/read_path.py --rows 10000 --repeats 5
+"""
+import argparse
+import asyncio
+import gc
+import json
+import pathlib
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "app/"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from core.config import Config  # noqa: E402
+from models import Message, Order, Review  # noqa: E402
+from schemas.chats import MessageRow  # noqa: E402
+from schemas.order import OrderRow  # noqa: E402
+from schemas.review import ReviewRow  # noqa: E402
+from utils.rows import RowsResponse, columns, fetch_rows  # noqa: E402
+
+# имя -> (модель, DTO)
+LISTS: dict[str, tuple[Any, type]] = {
+    "orders": (Order, OrderRow),
+    "reviews": (Review, ReviewRow),
+    "messages": (Message, MessageRow),
+}
+
+
+async def load_orm(session: AsyncSession, model: Any, dto: type, rows: int) -> list:
+    return (await session.execute(select(model).order_by(model.id).limit(rows))).scalars().all()
+
+
+async def load_core(session: AsyncSession, model: Any, dto: type, rows: int) -> list:
+    return await fetch_rows(session, dto, select(*columns(dto, model)).order_by(model.id).limit(rows))
+
+
+def serialize_orm(items: list) -> bytes:
+    return json.dumps(jsonable_encoder(items), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def serialize_core(items: list) -> bytes:
+    return RowsResponse(items).body
+
+
+PATHS = {
+    "orm": (load_orm, serialize_orm),
+    "core": (load_core, serialize_core),
+}
+
+
+async def measure(engine: Any, path: str, model: Any, dto: type, rows: int, repeats: int) -> dict:
+    load, serialize = PATHS[path]
+    load_s, serialize_s, peak, retained, count = [], [], [], [], 0
+    for _ in range(repeats + 1):
+        async with AsyncSession(engine) as session:
+            # соединение открывается до замера памяти
+            await session.connection()
+            gc.collect()
+            tracemalloc.start()
+            started = time.perf_counter()
+            items = await load(session, model, dto, rows)
+            loaded = time.perf_counter()
+            kept, _ = tracemalloc.get_traced_memory()
+            body = serialize(items)
+            serialized = time.perf_counter()
+            _, top = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            count = len(items)
+            load_s.append(loaded - started)
+            serialize_s.append(serialized - loaded)
+            peak.append(top)
+            retained.append(kept)
+            del items, body
+
+    count = max(count, 1)
+    per_10k = 10_000 / count
+    # первый проход - прогрев кэшей компиляции, в статистику не входит
+    return {
+        "rows": count,
+        "load_ms_per_10k": statistics.median(load_s[1:]) * 1000 * per_10k,
+        "serialize_ms_per_10k": statistics.median(serialize_s[1:]) * 1000 * per_10k,
+        "retained_bytes_per_row": statistics.median(retained[1:]) / count,
+        "peak_bytes_per_row": statistics.median(peak[1:]) / count,
+    }
+
+
+async def run(rows: int, repeats: int, lists: list[str]) -> dict:
+    engine = create_async_engine(Config.async_db_conn_str, poolclass=NullPool)
+    report: dict[str, dict] = {}
+    try:
+        for name in lists:
+            model, dto = LISTS[name]
+            report[name] = {path: await measure(engine, path, model, dto, rows, repeats) for path in PATHS}
+    finally:
+        await engine.dispose()
+    return report
+
+
+def main(args: argparse.Namespace) -> None:
+    report = asyncio.run(run(args.rows, args.repeats, args.lists))
+
+    print(
+        f"{'list':<10} {'path':<6} {'rows':>7} {'load ms/10k':>12} {'json ms/10k':>12}"
+        f" {'kept B/row':>11} {'peak B/row':>11}"
+    )
+    for name, paths in report.items():
+        for path, result in paths.items():
+            print(
+                f"{name:<10} {path:<6} {result['rows']:>7} {result['load_ms_per_10k']:>12.1f}"
+                f" {result['serialize_ms_per_10k']:>12.1f} {result['retained_bytes_per_row']:>11.0f}"
+                f" {result['peak_bytes_per_row']:>11.0f}"
+            )
+        orm, core = paths["orm"], paths["core"]
+        total = (
+            (core["load_ms_per_10k"] + core["serialize_ms_per_10k"])
+            / (orm["load_ms_per_10k"] + orm["serialize_ms_per_10k"]) - 1
+        )
+        memory = core["retained_bytes_per_row"] / max(orm["retained_bytes_per_row"], 1) - 1
+        print(f"{name:<10} core vs orm: time {total * 100:+.1f}%, memory per row {memory * 100:+.1f}%")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="строк в одной выборке")
+    parser.add_argument("--repeats", type=int, default=5, help="замеров на путь")
+    parser.add_argument("--lists", nargs="+", choices=list(LISTS), default=list(LISTS))
+    parser.add_argument("--output", type=pathlib.Path, help="сохранить результаты в JSON")
+    main(parser.parse_args())
@@ -0,0 +1,106 @@
+"""
+Время холодного старта сервиса.
+
+Каждый замер - отдельный процесс Python (``python -c "import main; main.create_app()"``), поэтому
+учитываются импорты и создание приложения без прогретого кэша модулей текущего процесса.
+Отчёт ``-X importtime`` группирует время импорта по пакетам верхнего уровня и показывает
+самые долгие модули.
+
+Запуск (из корня репозитория, с переменными окружения конфигурации)::
+
+    python benchmarks/startup.py --repeats 10
+    python benchmarks/startup.py --profile --top 30
+    # код возврата 1, если медиана превышает бюджет (секунды)
+    python benchmarks/startup.py --budget-import 0.05 --budget-app 1.5
+"""
+import argparse
+import pathlib
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+APP_DIR = pathlib.Path(__file__).parent.parent / "app"
+
+STAGES = {
+    "import": "import main",
+    "app": "import main; main.create_app()",
+}
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, *options, "-c", code],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        sys.exit(f"{code!r} failed:\n{result.stderr}")
+    return result
+
+
+def measure(code: str, repeats: int) -> list[float]:
+    # первый запуск компилирует .pyc и не учитывается
+    run_python(code)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run_python(code)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def import_profile(code: str) -> list[tuple[str, int, int]]:
+    """Строки отчёта ``-X importtime``: модуль, собственное и накопленное время (мкс)."""
+    rows = []
+    for line in run_python(code, "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, module = line.removeprefix("import time:").split("|")
+        rows.append((module.rstrip(), int(own), int(cumulative)))
+    return rows
+
+
+def print_profile(rows: list[tuple[str, int, int]], top: int) -> None:
+    packages: dict[str, int] = defaultdict(int)
+    for module, own, _ in rows:
+        packages[module.strip().split(".")[0]] += own
+
+    print(f"{'package':<40} {'self, ms':>10}")
+    for package, own in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<40} {own / 1000:>10.1f}")
+
+    print(f"\n{'module (cumulative)':<60} {'ms':>10}")
+    for module, _, cumulative in sorted(rows, key=lambda row: -row[2])[:top]:
+        print(f"{module.strip():<60} {cumulative / 1000:>10.1f}")
+
+
+def main(args: argparse.Namespace) -> None:
+    if args.profile:
+        print_profile(import_profile(STAGES["app"]), args.top)
+        print()
+
+    exceeded = False
+    for stage, budget in (("import", args.budget_import), ("app", args.budget_app)):
+        samples = measure(STAGES[stage], args.repeats)
+        median = statistics.median(samples)
+        verdict = ""
+        if budget is not None:
+            exceeded |= median > budget
+            verdict = f" budget {budget:.3f} s {'EXCEEDED' if median > budget else 'ok'}"
+        print(f"{stage:<8} median {median:.3f} s, min {min(samples):.3f} s{verdict}")
+
+    if exceeded:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="количество запусков на этап")
+    parser.add_argument("--profile", action="store_true", help="отчёт -X importtime по пакетам и модулям")
+    parser.add_argument("--top", type=int, default=20, help="строк в отчёте")
+    parser.add_argument("--budget-import", type=float, help="бюджет на import main (секунды)")
+    parser.add_argument("--budget-app", type=float, help="бюджет на import main + create_app() (секунды)")
+    main(parser.parse_args())
@@ -0,0 +1,160 @@
+"""
+Затраты CPU на горячие запросы: ``select()`` на каждый вызов против ``lambda_stmt``.
+
+``select()`` строит новое дерево выражения на каждый вызов, и SQLAlchemy обходит его целиком,
+чтобы получить ключ кэша компиляции. ``lambda_stmt`` строит выражение один раз на место вызова,
+а на следующих вызовах только извлекает значения параметров из замыкания. Замеряется время CPU
+процесса (``time.process_time``) на запрос через ORM сессию, один запрос за раз; ожидание ответа
+БД в него почти не входит. Дополнительно выводится статистика кэша компиляции движка
+(события ``after_cursor_execute``, ``context.cache_hit``).
+
+Запуск (из корня репозитория, с переменными окружения БД, на данных ``benchmarks.load seed``)::
+
+    python benchmarks/statement_cache.py --iterations 2000
+"""
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Callable
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "app/"))
+
+from sqlalchemy import event, func, lambda_stmt, or_, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from core.config import Config  # noqa: E402
+from models import Chat, Message, Order, User  # noqa: E402
+from utils.instrumentation import compiled_cache_result  # noqa: E402
+
+
+def user_by_id_select(i: int) -> object:
+    return select(User).where(User.id == i).order_by(User.deleted_at.desc())
+
+
+def user_by_id_lambda(i: int) -> object:
+    return lambda_stmt(lambda: select(User).where(User.id == i).order_by(User.deleted_at.desc()))
+
+
+def order_by_id_select(i: int) -> object:
+    return select(Order).where(Order.id == i)
+
+
+def order_by_id_lambda(i: int) -> object:
+    return lambda_stmt(lambda: select(Order).where(Order.id == i))
+
+
+def chat_by_id_select(i: int) -> object:
+    return select(Chat).where(Chat.id == i).order_by(Chat.deleted_at.desc())
+
+
+def chat_by_id_lambda(i: int) -> object:
+    return lambda_stmt(lambda: select(Chat).where(Chat.id == i).order_by(Chat.deleted_at.desc()))
+
+
+def message_by_id_select(i: int) -> object:
+    return select(Message).where(Message.id == i).order_by(Message.deleted_at.desc())
+
+
+def message_by_id_lambda(i: int) -> object:
+    return lambda_stmt(lambda: select(Message).where(Message.id == i).order_by(Message.deleted_at.desc()))
+
+
+def users_exists_select(i: int) -> object:
+    login = email = f"user_{i}"
+    return (
+        select(User)
+        .where(or_(func.lower(User.login) == func.lower(login), func.lower(User.email) == func.lower(email)))
+        .order_by(User.deleted_at.desc())
+        .where(User.deleted_at.is_(None))
+    )
+
+
+def users_exists_lambda(i: int) -> object:
+    login = email = f"user_{i}"
+    query = lambda_stmt(
+        lambda: select(User)
+        .where(or_(func.lower(User.login) == func.lower(login), func.lower(User.email) == func.lower(email)))
+        .order_by(User.deleted_at.desc())
+    )
+    query += lambda s: s.where(User.deleted_at.is_(None))
+    return query
+
+
+# имя -> {вариант: функция, возвращающая запрос по id}
+QUERIES: dict[str, dict[str, Callable[[int], object]]] = {
+    "get_user": {"select": user_by_id_select, "lambda": user_by_id_lambda},
+    "get_order": {"select": order_by_id_select, "lambda": order_by_id_lambda},
+    "get_chat": {"select": chat_by_id_select, "lambda": chat_by_id_lambda},
+    "get_message": {"select": message_by_id_select, "lambda": message_by_id_lambda},
+    "users_exists": {"select": users_exists_select, "lambda": users_exists_lambda},
+}
+
+
+async def run(iterations: int, seed: int) -> dict:
+    engine = create_async_engine(Config.async_db_conn_str, poolclass=NullPool)
+    cache_stats: Counter = Counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+        cache_stats[(conn.info.get("benchmark_variant"), compiled_cache_result(context))] += 1
+
+    report = {}
+    try:
+        async with AsyncSession(engine) as session:
+            connection = await session.connection()
+            for name, variants in QUERIES.items():
+                report[name] = {}
+                for variant, build in variants.items():
+                    connection.info["benchmark_variant"] = variant
+                    rng = random.Random(seed)
+                    # прогрев: первая компиляция и анализ lambda
+                    for _ in range(10):
+                        await session.execute(build(rng.randint(1, 1000)))
+
+                    samples = []
+                    for _ in range(iterations):
+                        started = time.process_time()
+                        (await session.execute(build(rng.randint(1, 1000)))).scalars().all()
+                        samples.append((time.process_time() - started) * 1e6)
+                        session.expunge_all()
+
+                    report[name][variant] = {
+                        "cpu_mean_us": statistics.fmean(samples),
+                        "cpu_median_us": statistics.median(samples),
+                    }
+    finally:
+        await engine.dispose()
+
+    report["compiled_cache"] = {f"{variant}.{result}": count for (variant, result), count in cache_stats.items()}
+    report["compiled_cache_size"] = len(engine.sync_engine._compiled_cache or ())
+    return report
+
+
+def main(args: argparse.Namespace) -> None:
+    report = asyncio.run(run(args.iterations, args.seed))
+
+    print(f"{'query':<15} {'select, us CPU':>15} {'lambda, us CPU':>15} {'change':>9}")
+    for name in QUERIES:
+        plain, cached = report[name]["select"]["cpu_mean_us"], report[name]["lambda"]["cpu_mean_us"]
+        print(f"{name:<15} {plain:>15.1f} {cached:>15.1f} {(cached / plain - 1) * 100:>+8.1f}%")
+
+    print("\ncompiled cache:", ", ".join(f"{key}={count}" for key, count in sorted(report["compiled_cache"].items())))
+    print(f"compiled cache size: {report['compiled_cache_size']}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000, help="запросов каждого вида и варианта")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=pathlib.Path, help="сохранить результаты в JSON")
+    main(parser.parse_args())
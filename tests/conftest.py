@@ -0,0 +1,16 @@
+import os
+import pathlib
+import sys
+
+# модули приложения импортируются от app/ (как в run.py и Dockerfile)
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent / "app"))
+
+# обязательные переменные core.config; тесты к БД не подключаются
+for name, value in {
+    "DB_NAME": "test",
+    "DB_PASSWORD": "test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+}.items():
+    os.environ.setdefault(name, value)
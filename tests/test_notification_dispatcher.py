@@ -0,0 +1,134 @@
+"""
+Отправка уведомлений диспетчером в локальную заглушку сервиса (``utils.notifications.stub_server``).
+
+Outbox заменён списком в памяти, поэтому БД для тестов не нужна.
+"""
+import asyncio
+import contextlib
+import datetime
+from typing import NamedTuple
+
+import httpx
+import pytest
+
+from utils.notifications import dispatcher as dispatcher_module
+from utils.notifications.dispatcher import NotificationDispatcher
+from utils.notifications.stub_server import StubNotificationServer
+
+
+class Event(NamedTuple):
+    id: int
+    recipient_id: int
+    event_type: str
+    payload: dict
+    attempts: int = 0
+    created_at: datetime.datetime = datetime.datetime(2025, 1, 1)
+
+
+class MemoryOutbox:
+    """``claim_notifications``/``mark_*`` поверх списка: выбранные события возвращаются при ошибке."""
+
+    def __init__(self, events: list[Event]):
+        self.pending = list(events)
+        self.claimed: dict[int, Event] = {}
+        self.dispatched: list[int] = []
+        self.failed: list[tuple[list[int], int]] = []
+
+    async def claim(self, session, limit: int, lease: float, max_attempts: int) -> list[Event]:
+        available = [event for event in self.pending if event.attempts < max_attempts][:limit]
+        for event in available:
+            self.pending.remove(event)
+            self.claimed[event.id] = event._replace(attempts=event.attempts + 1)
+        return [self.claimed[event.id] for event in available]
+
+    async def mark_dispatched(self, session, ids: list[int]) -> None:
+        for event_id in ids:
+            del self.claimed[event_id]
+        self.dispatched.extend(ids)
+
+    async def mark_failed(self, session, ids: list[int], attempt: int, error: str, max_attempts: int) -> None:
+        self.failed.append((ids, attempt))
+        self.pending.extend(self.claimed.pop(event_id) for event_id in ids)
+
+
+@contextlib.asynccontextmanager
+async def no_session():
+    yield None
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    def install(events: list[Event]) -> MemoryOutbox:
+        memory = MemoryOutbox(events)
+        monkeypatch.setattr(dispatcher_module, "claim_notifications", memory.claim)
+        monkeypatch.setattr(dispatcher_module, "mark_dispatched", memory.mark_dispatched)
+        monkeypatch.setattr(dispatcher_module, "mark_failed", memory.mark_failed)
+        return memory
+
+    return install
+
+
+def dispatch(server: StubNotificationServer, batches: int, **kwargs) -> tuple[NotificationDispatcher, list[int]]:
+    """Выполняет ``batches`` вызовов ``dispatch_batch``, возвращает диспетчер и их результаты."""
+
+    async def run() -> tuple[NotificationDispatcher, list[int]]:
+        async with httpx.AsyncClient(base_url=server.url) as client:
+            dispatcher = NotificationDispatcher(client, session_manager=no_session, **kwargs)
+            return dispatcher, [await dispatcher.dispatch_batch() for _ in range(batches)]
+
+    return asyncio.run(run())
+
+
+def batch_events(batch: dict) -> list[dict]:
+    return [event for item in batch["notifications"] for event in item["events"]]
+
+
+def test_events_sent_in_batches(outbox):
+    memory = outbox([Event(i, recipient_id=i, event_type="order.updated", payload={"n": i}) for i in range(1, 6)])
+
+    with StubNotificationServer() as server:
+        dispatcher, results = dispatch(server, 3, batch_size=3)
+
+    assert results == [3, 2, 0]
+    # пустой outbox не вызывает запроса к сервису
+    assert server.requests == 2
+    assert [[event["id"] for event in batch_events(batch)] for batch in server.batches] == [[1, 2, 3], [4, 5]]
+    assert memory.dispatched == [1, 2, 3, 4, 5]
+    assert dispatcher.sent == 5
+
+
+def test_events_coalesced_per_recipient(outbox):
+    outbox([
+        Event(1, recipient_id=10, event_type="message.created", payload={"chat": 1}),
+        Event(2, recipient_id=20, event_type="message.created", payload={"chat": 1}),
+        Event(3, recipient_id=10, event_type="order.updated", payload={"order": 7}),
+    ])
+
+    with StubNotificationServer() as server:
+        dispatch(server, 1)
+
+    assert len(server.batches) == 1
+    notifications = server.batches[0]["notifications"]
+    assert [item["recipientId"] for item in notifications] == [10, 20]
+    assert [event["id"] for event in notifications[0]["events"]] == [1, 3]
+    assert notifications[0]["events"][1] == {
+        "id": 3,
+        "type": "order.updated",
+        "payload": {"order": 7},
+        "createdAt": "2025-01-01T00:00:00",
+    }
+
+
+def test_failed_batch_retried_after_server_error(outbox):
+    memory = outbox([Event(1, recipient_id=1, event_type="order.updated", payload={})])
+
+    with StubNotificationServer(fail_first=1) as server:
+        dispatcher, results = dispatch(server, 2)
+
+    assert results == [1, 1]
+    assert server.requests == 2
+    # первая попытка получила 503 и вернула событие в outbox, вторая доставила его
+    assert memory.failed == [([1], 1)]
+    assert memory.dispatched == [1]
+    assert [event["id"] for event in server.events] == [1]
+    assert (dispatcher.failed, dispatcher.sent) == (1, 1)